@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark single games with large lobbies ("mega games").
+
+For each lobby size, one game is filled, started with a role set and played
+through a night and a day in process (no HTTP): every werewolf votes, the
+seer investigates, every living player votes by day. Reports the cost of
+each step per operation and the size of the stored record. Runs in a
+scratch directory against its own shared-memory segment.
+
+Usage:
+    python benchmark_lobby.py
+    python benchmark_lobby.py --sizes 100 500 1000 --role-set scaled
+"""
+
+import argparse
+import contextlib
+import os
+import random
+import shutil
+import tempfile
+import time
+from typing import Dict, List
+
+
+def timed(results: Dict[str, List[float]], name: str, fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    results.setdefault(name, []).append(time.perf_counter() - start)
+    return result
+
+
+def play(size: int, role_set: str, state_manager, logic, timer) -> Dict[str, List[float]]:
+    """One game of ``size`` players through a night and a day. Returns seconds per step."""
+    results: Dict[str, List[float]] = {}
+    game_id = state_manager.create_game()
+    for i in range(size):
+        timed(results, 'join', state_manager.add_player, game_id, f"Player {i}")
+    timed(results, 'start', logic.assign_roles, game_id, role_set)
+    timer.start_night_phase(game_id)
+
+    game = state_manager.get_game_state(game_id)
+    players = game['players']
+    werewolves = [pid for pid, p in players.items() if p['role'] == 'werewolf']
+    seer = next(pid for pid, p in players.items() if p['role'] == 'seer')
+    prey = [pid for pid, p in players.items() if p['role'] != 'werewolf']
+
+    for werewolf in werewolves:
+        timed(results, 'role_info', logic.get_player_role_info, game_id, werewolf)
+        timed(results, 'night_vote', logic.perform_action, game_id, werewolf, 'werewolf_vote', random.choice(prey))
+    timed(results, 'investigate', logic.perform_action, game_id, seer, 'seer_investigate', random.choice(prey))
+    timed(results, 'end_night', timer.end_phase, game_id, 'night')
+
+    game = state_manager.get_game_state(game_id)
+    alive = [pid for pid, p in game['players'].items() if p['alive']]
+    for voter in alive:
+        target = random.choice(alive)
+        while target == voter:
+            target = random.choice(alive)
+        timed(results, 'day_vote', logic.perform_action, game_id, voter, 'day_vote', target)
+    for viewer in (None, random.choice(alive)):
+        logic.render_cache.entries.clear()
+        timed(results, 'render_cold', logic.render_game_summary, game_id, viewer)
+        timed(results, 'render_cached', logic.render_game_summary, game_id, viewer)
+    timed(results, 'end_day', timer.end_phase, game_id, 'day')
+
+    record = state_manager.store.read(game_id)
+    results['record_kib'] = [len(record[1]) / 1024]
+    results['werewolves'] = [len(werewolves)]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Large-lobby game benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 500, 1000])
+    parser.add_argument('--role-set', default='scaled')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    workdir = tempfile.mkdtemp(prefix='wwlobby_')
+    os.chdir(workdir)
+
+    from game.game_state import GameStateManager
+    GameStateManager._shared_memory_name = f"wwlobby_{os.getpid()}"
+    GameStateManager._shared_memory_size = 64 * 1024 * 1024
+    # Imported after the configuration, since it builds the state manager
+    from game.game_logic import GameLogic
+    from game.phase_timer import PhaseTimer
+
+    class ManualPhaseTimer(PhaseTimer):
+        """Phases end when the benchmark says so, not on a timer thread."""
+
+        def _schedule(self, game_id: str, phase: str, duration: float):
+            pass
+
+    state_manager = GameStateManager()
+    logic = GameLogic()
+    timer = ManualPhaseTimer()
+
+    rows = []
+    try:
+        for size in args.sizes:
+            # The engine prints every phase change
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                rows.append((size, play(size, args.role_set, state_manager, logic, timer)))
+    finally:
+        state_manager.shutdown_flusher()
+        state_manager.cleanup_shared_memory()
+        os.chdir(os.path.dirname(workdir))
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    steps = ['join', 'start', 'role_info', 'night_vote', 'investigate', 'end_night',
+             'day_vote', 'render_cold', 'render_cached', 'end_day']
+    print(f"\nMean milliseconds per operation, {args.role_set} role set")
+    print(f"  {'step':<14}" + ''.join(f"{size:>12}" for size, _ in rows))
+    for step in steps:
+        print(f"  {step:<14}" + ''.join(f"{sum(r[step]) / len(r[step]) * 1000:>12.3f}" for _, r in rows))
+    print(f"  {'werewolves':<14}" + ''.join(f"{r['werewolves'][0]:>12}" for _, r in rows))
+    print(f"  {'record KiB':<14}" + ''.join(f"{r['record_kib'][0]:>12.1f}" for _, r in rows))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Benchmark the game storage backends against each other.
+
+Runs the same workload (create games, optimistic updates, reads, header
+listings) against the shared-memory store and the SQLite store, optionally
+from several processes at once. The remote backend needs a running state
+service (python main.py --type state).
+
+Usage:
+    python benchmark_storage.py
+    python benchmark_storage.py --games 200 --updates 2000 --processes 4
+    python benchmark_storage.py --backends remote --service 127.0.0.1:7000
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+import uuid
+from game.codec import encode_game, decode_game
+from game.storage import create_storage
+from game.votes import new_vote_book, cast_vote
+
+
+def new_game(players: int) -> dict:
+    now = time.time()
+    return {
+        'phase': 'day',
+        'phase_end': now + 300,
+        'players': {
+            f"p{i:07d}": {'name': f"Player {i}", 'role': 'villager', 'alive': True, 'vote': None, 'joined_at': now}
+            for i in range(players)
+        },
+        'actions': {'werewolf_votes': new_vote_book(), 'seer_target': None, 'day_votes': new_vote_book()},
+        'seer_history': [],
+        'chat': [],
+        'chat_seq': 0,
+        'chat_buckets': {},
+        'created_at': now,
+        'updated_at': now,
+        'started': True,
+        'ended': False,
+        'winner': None,
+        'version': 1
+    }
+
+
+SERVICE_ADDRESS = ('127.0.0.1', 7000)
+
+
+def open_store(backend: str, target: str):
+    return create_storage(backend, name=target, size=32 * 1024 * 1024, path=target, address=SERVICE_ADDRESS)
+
+
+def update(store, game_id: str) -> int:
+    """One optimistic update (a day vote plus a chat line). Returns the attempts needed."""
+    attempts = 0
+    while True:
+        attempts += 1
+        with store.lock(game_id, shared=True):
+            version, data = store.read(game_id)
+        game = decode_game(data)
+        voter, target = random.sample(list(game['players']), 2)
+        cast_vote(game['actions']['day_votes'], voter, target)
+        game['players'][voter]['vote'] = target
+        game['chat'] = (game['chat'] + [{'player': voter, 'message': 'I vote ' + target,
+                                         'time': time.time(), 'seq': game['chat_seq']}])[-50:]
+        game['chat_seq'] += 1
+        game['version'] = version + 1
+        if store.compare_and_swap(game_id, version, encode_game(game), version + 1):
+            return attempts
+
+
+def worker(backend: str, target: str, game_ids: list, updates: int, seed: int, results):
+    random.seed(seed)
+    store = open_store(backend, target)
+    latencies = []
+    attempts = 0
+    for _ in range(updates):
+        start = time.perf_counter()
+        attempts += update(store, random.choice(game_ids))
+        latencies.append(time.perf_counter() - start)
+    store.close()
+    results.put((latencies, attempts))
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(backend: str, games: int, players: int, updates: int, processes: int):
+    tag = f"wwbench_{os.getpid()}_{uuid.uuid4().hex[:6]}"
+    target = tag if backend == 'shared_memory' else os.path.join(tempfile.gettempdir(), tag + '.db')
+    store = open_store(backend, target)
+    try:
+        game_ids = [uuid.uuid4().hex[:8] for _ in range(games)]
+
+        start = time.perf_counter()
+        for game_id in game_ids:
+            with store.lock(game_id):
+                store.write(game_id, encode_game(new_game(players)), 1)
+        create_time = time.perf_counter() - start
+
+        results = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(target=worker, args=(backend, target, game_ids, updates // processes, i, results))
+            for i in range(processes)
+        ]
+        start = time.perf_counter()
+        for p in workers:
+            p.start()
+        collected = [results.get() for _ in workers]
+        for p in workers:
+            p.join()
+        update_time = time.perf_counter() - start
+        latencies = [value for lat, _ in collected for value in lat]
+        attempts = sum(a for _, a in collected)
+
+        start = time.perf_counter()
+        for game_id in game_ids:
+            with store.lock(game_id, shared=True):
+                decode_game(store.read(game_id)[1])
+        read_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(10):
+            store.headers()
+        headers_time = (time.perf_counter() - start) / 10
+
+        print(f"{backend}:")
+        print(f"  create   {games / create_time:10.0f} games/s")
+        print(f"  update   {len(latencies) / update_time:10.0f} updates/s across {processes} processes "
+              f"(p50 {percentile(latencies, 0.5) * 1000:.2f} ms, p99 {percentile(latencies, 0.99) * 1000:.2f} ms, "
+              f"{attempts - len(latencies)} retries)")
+        print(f"  read     {games / read_time:10.0f} full reads/s")
+        print(f"  headers  {headers_time * 1000:10.2f} ms to list {games} game headers")
+        stats = store.stats()
+        print(f"  storage  {stats.get('data_bytes', 0)} bytes of records"
+              + (f", database {stats['db_size'] + stats['wal_size']} bytes incl. WAL" if 'db_size' in stats else ''))
+    finally:
+        store.unlink()
+        if backend == 'sqlite':
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(target + suffix):
+                    os.remove(target + suffix)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare game storage backends")
+    parser.add_argument('--backends', nargs='+', default=['shared_memory', 'sqlite'],
+                        choices=['shared_memory', 'sqlite', 'remote'])
+    parser.add_argument('--games', type=int, default=100, help="Games to create")
+    parser.add_argument('--players', type=int, default=12, help="Players per game")
+    parser.add_argument('--updates', type=int, default=2000, help="Total updates across all processes")
+    parser.add_argument('--processes', type=int, default=4, help="Concurrent updating processes")
+    parser.add_argument('--service', default='127.0.0.1:7000', help="State service address for the remote backend")
+    args = parser.parse_args()
+
+    host, port = args.service.rsplit(':', 1)
+    SERVICE_ADDRESS = (host, int(port))
+
+    for backend in args.backends:
+        run(backend, args.games, args.players, args.updates, args.processes)
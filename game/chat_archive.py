@@ -0,0 +1,64 @@
+import json
+import os
+import logging
+from typing import Dict, List
+
+try:
+    import fcntl  # Cross-process file locking (POSIX only)
+except ImportError:
+    fcntl = None
+
+
+class ChatArchive:
+    """
+    On-disk archive for chat messages that have left a game's hot record.
+
+    Each game gets its own JSON-lines file, appended to in sequence order,
+    so the shared-memory record only keeps the most recent messages.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, game_id: str) -> str:
+        return os.path.join(self.directory, f"{game_id}.jsonl")
+
+    def append(self, game_id: str, messages: List[Dict]):
+        """Append messages evicted from a game's chat buffer."""
+        if not messages:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        data = ''.join(json.dumps(message, separators=(',', ':')) + '\n' for message in messages).encode('utf-8')
+        fd = os.open(self._path(game_id), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def read(self, game_id: str, since_seq: int = 0) -> List[Dict]:
+        """Archived messages of a game with a sequence number >= ``since_seq``."""
+        path = self._path(game_id)
+        if not os.path.exists(path):
+            return []
+
+        messages = []
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    logging.warning(f"Skipping torn chat archive entry for game {game_id}")
+                    continue
+                if message.get('seq', 0) >= since_seq:
+                    messages.append(message)
+        return messages
+
+    def delete(self, game_id: str):
+        """Remove a game's archive."""
+        try:
+            os.remove(self._path(game_id))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,412 @@
+import json
+import math
+import struct
+import logging
+from typing import Dict, List, Tuple
+from game.roster import tally_alive
+from game.votes import as_vote_book, rebuild_vote_book
+
+# Compact binary encoding of a game record.
+#
+#   header       fixed 48 bytes: phase, flags, winner, player count, version,
+#                phase_end, created_at, updated_at, alive counts (total and
+#                per role, see roster.py)
+#   player rows  fixed 12 bytes per player: role, alive, vote ref, joined_at
+#   refs         length-prefixed player IDs (players first, then any other
+#                referenced IDs); everything below refers to players by index
+#   body         names, actions, seer history, chat buffer and rate-limit
+#                buckets, then JSON for extra keys
+#
+# Phase, role and winner are interned as enum indexes. The header and rows sit
+# at fixed offsets so single fields can be read without decoding the record.
+# Records that don't fit the schema are stored as format 0: the magic and
+# format byte followed by the game as JSON.
+
+MAGIC = b'WR'
+FORMAT_VERSION = 5
+FORMAT_JSON = 0
+
+HEADER = struct.Struct('<2sBBBBHQdddHHHH')  # magic, format, phase, flags, winner, players, version, phase_end,
+                                             # created_at, updated_at, alive, alive werewolves, seers, villagers
+HEADER_V4 = struct.Struct('<2sBBBBHQddd')  # Format 4: no alive counts
+HEADER_V1 = struct.Struct('<2sBBBBHQdd')  # Formats 1-3: no updated_at either
+PLAYER_ROW = struct.Struct('<BBhd')    # role, alive, vote ref, joined_at
+U8 = struct.Struct('<B')
+U16 = struct.Struct('<H')
+U32 = struct.Struct('<I')
+I16 = struct.Struct('<h')
+VOTE_COUNT = struct.Struct('<hI')      # target ref, votes
+VOTER_ENTRY = struct.Struct('<hh')     # voter ref, target ref
+SEER_ENTRY = struct.Struct('<hBd')     # target ref, role, timestamp
+CHAT_ENTRY = struct.Struct('<hdI')     # player ref, time, seq
+CHAT_ENTRY_V1 = struct.Struct('<hd')   # player ref, time
+CHAT_BUCKET = struct.Struct('<hdd')    # player ref, tokens, updated
+
+PHASES = ('setup', 'night', 'day', 'ended')
+ROLES = (None, 'werewolf', 'seer', 'villager')
+WINNERS = (None, 'villagers', 'werewolves')
+
+FLAG_STARTED = 1
+FLAG_ENDED = 2
+
+NO_REF = -1
+
+GAME_KEYS = ('phase', 'phase_end', 'players', 'actions', 'seer_history', 'chat', 'chat_seq', 'chat_buckets',
+             'created_at', 'updated_at', 'started', 'ended', 'winner', 'version', 'alive_count', 'alive_by_role')
+DERIVED_KEYS = ('role_players',)  # Rebuilt from the player rows on decode, never stored
+PLAYER_KEYS = {'name', 'role', 'alive', 'vote', 'joined_at'}
+ACTION_KEYS = {'werewolf_votes', 'seer_target', 'day_votes'}
+SEER_KEYS = {'target_id', 'target_role', 'timestamp'}
+CHAT_KEYS = {'player', 'message', 'time', 'seq'}
+
+
+def _put_str(out: bytearray, value: str):
+    data = value.encode('utf-8')
+    out += U16.pack(len(data))
+    out += data
+
+
+def _get_str(data: bytes, pos: int) -> Tuple[str, int]:
+    (length,) = U16.unpack_from(data, pos)
+    pos += U16.size
+    return data[pos:pos + length].decode('utf-8'), pos + length
+
+
+def _collect_refs(game: Dict) -> List[str]:
+    """Player IDs first, then any other IDs the record refers to."""
+    refs = list(game['players'])
+    known = set(refs)
+
+    def add(player_id):
+        if player_id is not None and player_id not in known:
+            known.add(player_id)
+            refs.append(player_id)
+
+    for player in game['players'].values():
+        add(player['vote'])
+    actions = game['actions']
+    for key in ('werewolf_votes', 'day_votes'):
+        book = as_vote_book(actions[key])
+        for voter_id, target_id in book['voters'].items():
+            add(voter_id)
+            add(target_id)
+        for target_id in book['tally']:
+            add(target_id)
+    add(actions['seer_target'])
+    for entry in game['seer_history']:
+        add(entry['target_id'])
+    for message in game['chat']:
+        add(message['player'])
+    for player_id in game.get('chat_buckets', {}):
+        add(player_id)
+    return refs
+
+
+def _encode(game: Dict) -> bytes:
+    players = game['players']
+    actions = game['actions']
+    if set(actions) - ACTION_KEYS:
+        raise ValueError('Unknown action keys')
+
+    refs = _collect_refs(game)
+    index = {player_id: i for i, player_id in enumerate(refs)}
+
+    def ref(player_id):
+        return NO_REF if player_id is None else index[player_id]
+
+    flags = (FLAG_STARTED if game['started'] else 0) | (FLAG_ENDED if game['ended'] else 0)
+    phase_end = game['phase_end']
+    if 'alive_count' in game and 'alive_by_role' in game:
+        alive, by_role = game['alive_count'], game['alive_by_role']
+    else:
+        # Records from before the counts were kept
+        alive, by_role = tally_alive(players)
+    out = bytearray(HEADER.pack(
+        MAGIC, FORMAT_VERSION, PHASES.index(game['phase']), flags, WINNERS.index(game['winner']),
+        len(players), game.get('version', 0),
+        math.nan if phase_end is None else phase_end, game['created_at'],
+        game.get('updated_at', game['created_at']),
+        alive, by_role['werewolf'], by_role['seer'], by_role['villager']
+    ))
+
+    for player in players.values():
+        if set(player) - PLAYER_KEYS:
+            raise ValueError('Unknown player keys')
+        out += PLAYER_ROW.pack(ROLES.index(player['role']), bool(player['alive']),
+                               ref(player['vote']), player['joined_at'])
+
+    out += U16.pack(len(refs))
+    for player_id in refs:
+        _put_str(out, player_id)
+    for player in players.values():
+        _put_str(out, player['name'])
+
+    def put_votes(votes):
+        # Buckets are derived, so only the tally and the voters are stored. The
+        # tally is written bucket by bucket, so the rebuilt buckets keep the
+        # order ties were reached in and replayed games pick the same leader
+        book = as_vote_book(votes)
+        tally = book['tally']
+        out.extend(U16.pack(len(tally)))
+        for bucket in book['buckets']:
+            for target_id in bucket:
+                out.extend(VOTE_COUNT.pack(ref(target_id), tally[target_id]))
+        out.extend(U16.pack(len(book['voters'])))
+        for voter_id, target_id in book['voters'].items():
+            out.extend(VOTER_ENTRY.pack(ref(voter_id), ref(target_id)))
+
+    put_votes(actions['werewolf_votes'])
+    out += I16.pack(ref(actions['seer_target']))
+    put_votes(actions['day_votes'])
+
+    out += U16.pack(len(game['seer_history']))
+    for entry in game['seer_history']:
+        if set(entry) - SEER_KEYS:
+            raise ValueError('Unknown seer history keys')
+        out += SEER_ENTRY.pack(ref(entry['target_id']), ROLES.index(entry['target_role']), entry['timestamp'])
+
+    chat = game['chat']
+    chat_seq = game.get('chat_seq', len(chat))
+    first_seq = chat_seq - len(chat)
+    out += U32.pack(len(chat))
+    for i, message in enumerate(chat):
+        if set(message) - CHAT_KEYS:
+            raise ValueError('Unknown chat keys')
+        out += CHAT_ENTRY.pack(ref(message['player']), message['time'], message.get('seq', first_seq + i))
+        _put_str(out, message['message'])
+    out += U32.pack(chat_seq)
+    buckets = game.get('chat_buckets', {})
+    out += U16.pack(len(buckets))
+    for player_id, (tokens, updated) in buckets.items():
+        out += CHAT_BUCKET.pack(ref(player_id), tokens, updated)
+
+    # Keys outside the schema travel as JSON so new fields never get lost
+    extras = {key: value for key, value in game.items() if key not in GAME_KEYS and key not in DERIVED_KEYS}
+    extra_data = json.dumps(extras, separators=(',', ':')).encode('utf-8') if extras else b''
+    out += U32.pack(len(extra_data))
+    out += extra_data
+    return bytes(out)
+
+
+def encode_game(game: Dict) -> bytes:
+    """Encode a game record, falling back to JSON for records outside the schema."""
+    try:
+        return _encode(game)
+    except (KeyError, ValueError, TypeError, struct.error) as e:
+        logging.warning(f"Game record doesn't fit the binary schema, storing it as JSON: {e}")
+        return MAGIC + U8.pack(FORMAT_JSON) + json.dumps(game, separators=(',', ':')).encode('utf-8')
+
+
+def is_compact(data: bytes) -> bool:
+    """Whether ``data`` is a game record in a format this codec reads."""
+    return len(data) > 2 and data[:2] == MAGIC and data[2] <= FORMAT_VERSION
+
+
+def _json_game(data: bytes) -> Dict:
+    """The game of a format 0 record. Raises ValueError for anything that isn't a record."""
+    if not is_compact(data):
+        raise ValueError("Not a game record")
+    return json.loads(data[3:])
+
+
+def _unpack_header(data: bytes) -> Tuple[Tuple, int]:
+    """
+    Header fields and the body offset. Before format 4 updated_at falls back
+    to created_at; before format 5 the alive counts come from the player rows.
+    """
+    format_version = data[2]
+    if format_version >= 5:
+        return HEADER.unpack_from(data, 0), HEADER.size
+    if format_version == 4:
+        fields = HEADER_V4.unpack_from(data, 0)
+        pos = HEADER_V4.size
+    else:
+        fields = HEADER_V1.unpack_from(data, 0)
+        fields += (fields[-1],)
+        pos = HEADER_V1.size
+
+    counts = [0, 0, 0, 0]  # Alive, then per role in ROLES order
+    player_count = fields[5]
+    for role, alive, _, _ in struct.iter_unpack(PLAYER_ROW.format, data[pos:pos + player_count * PLAYER_ROW.size]):
+        if alive:
+            counts[0] += 1
+            if role:
+                counts[role] += 1
+    return fields + tuple(counts), pos
+
+
+def decode_game(data: bytes) -> Dict:
+    """Decode a full game record."""
+    if not is_compact(data) or data[2] == FORMAT_JSON:
+        return _json_game(data)
+
+    (_, format_version, phase, flags, winner, player_count, version,
+     phase_end, created_at, updated_at, alive_count, *alive_by_role), pos = _unpack_header(data)
+    rows = list(struct.iter_unpack(PLAYER_ROW.format, data[pos:pos + player_count * PLAYER_ROW.size]))
+    pos += player_count * PLAYER_ROW.size
+
+    (ref_count,) = U16.unpack_from(data, pos)
+    pos += U16.size
+    refs = []
+    for _ in range(ref_count):
+        player_id, pos = _get_str(data, pos)
+        refs.append(player_id)
+
+    def deref(i):
+        return None if i == NO_REF else refs[i]
+
+    players = {}
+    role_players = {role: [] for role in ROLES[1:]}
+    for i, (role, alive, vote, joined_at) in enumerate(rows):
+        name, pos = _get_str(data, pos)
+        players[refs[i]] = {
+            'name': name,
+            'role': ROLES[role],
+            'alive': bool(alive),
+            'vote': deref(vote),
+            'joined_at': joined_at
+        }
+        if role:
+            role_players[ROLES[role]].append(refs[i])
+
+    def get_votes(pos, voters_listed):
+        tally = {}
+        voters = {}
+        (count,) = U16.unpack_from(data, pos)
+        pos += U16.size
+        for _ in range(count):
+            target, votes = VOTE_COUNT.unpack_from(data, pos)
+            pos += VOTE_COUNT.size
+            if voters_listed:
+                # Format 1 and 2 day votes: each target followed by its voters
+                for (voter,) in struct.iter_unpack(I16.format, data[pos:pos + votes * I16.size]):
+                    voters[deref(voter)] = deref(target)
+                pos += votes * I16.size
+            tally[deref(target)] = votes
+        if format_version >= 3:
+            (count,) = U16.unpack_from(data, pos)
+            pos += U16.size
+            for voter, target in struct.iter_unpack(VOTER_ENTRY.format, data[pos:pos + count * VOTER_ENTRY.size]):
+                voters[deref(voter)] = deref(target)
+            pos += count * VOTER_ENTRY.size
+        return rebuild_vote_book(voters, tally), pos
+
+    werewolf_votes, pos = get_votes(pos, False)
+
+    (seer_target,) = I16.unpack_from(data, pos)
+    pos += I16.size
+
+    day_votes, pos = get_votes(pos, format_version < 3)
+
+    seer_history = []
+    (count,) = U16.unpack_from(data, pos)
+    pos += U16.size
+    for _ in range(count):
+        target, role, timestamp = SEER_ENTRY.unpack_from(data, pos)
+        pos += SEER_ENTRY.size
+        seer_history.append({'target_id': deref(target), 'target_role': ROLES[role], 'timestamp': timestamp})
+
+    chat = []
+    chat_buckets = {}
+    (count,) = U32.unpack_from(data, pos)
+    pos += U32.size
+    if format_version == 1:
+        # Records written before chat had sequence numbers and buckets
+        for seq in range(count):
+            player, sent_at = CHAT_ENTRY_V1.unpack_from(data, pos)
+            pos += CHAT_ENTRY_V1.size
+            message, pos = _get_str(data, pos)
+            chat.append({'player': deref(player), 'message': message, 'time': sent_at, 'seq': seq})
+        chat_seq = count
+    else:
+        for _ in range(count):
+            player, sent_at, seq = CHAT_ENTRY.unpack_from(data, pos)
+            pos += CHAT_ENTRY.size
+            message, pos = _get_str(data, pos)
+            chat.append({'player': deref(player), 'message': message, 'time': sent_at, 'seq': seq})
+        (chat_seq,) = U32.unpack_from(data, pos)
+        pos += U32.size
+        (count,) = U16.unpack_from(data, pos)
+        pos += U16.size
+        for _ in range(count):
+            player, tokens, updated = CHAT_BUCKET.unpack_from(data, pos)
+            pos += CHAT_BUCKET.size
+            chat_buckets[deref(player)] = [tokens, updated]
+
+    game = {
+        'phase': PHASES[phase],
+        'phase_end': None if math.isnan(phase_end) else phase_end,
+        'players': players,
+        'actions': {
+            'werewolf_votes': werewolf_votes,
+            'seer_target': deref(seer_target),
+            'day_votes': day_votes
+        },
+        'seer_history': seer_history,
+        'chat': chat,
+        'chat_seq': chat_seq,
+        'chat_buckets': chat_buckets,
+        'created_at': created_at,
+        'updated_at': updated_at,
+        'started': bool(flags & FLAG_STARTED),
+        'ended': bool(flags & FLAG_ENDED),
+        'winner': WINNERS[winner],
+        'version': version,
+        'alive_count': alive_count,
+        'alive_by_role': dict(zip(ROLES[1:], alive_by_role)),
+        'role_players': role_players
+    }
+
+    (extra_length,) = U32.unpack_from(data, pos)
+    if extra_length:
+        pos += U32.size
+        game.update(json.loads(data[pos:pos + extra_length]))
+    return game
+
+
+def peek_header(data: bytes) -> Dict:
+    """Read the fixed header fields without decoding players, chat or actions."""
+    if not is_compact(data) or data[2] == FORMAT_JSON:
+        game = _json_game(data)
+        return {
+            'phase': game['phase'],
+            'phase_end': game['phase_end'],
+            'started': game['started'],
+            'ended': game['ended'],
+            'winner': game['winner'],
+            'version': game.get('version', 0),
+            'created_at': game['created_at'],
+            'updated_at': game.get('updated_at', game['created_at']),
+            'player_count': len(game['players'])
+        }
+
+    (_, _, phase, flags, winner, player_count, version,
+     phase_end, created_at, updated_at, *_), _ = _unpack_header(data)
+    return {
+        'phase': PHASES[phase],
+        'phase_end': None if math.isnan(phase_end) else phase_end,
+        'started': bool(flags & FLAG_STARTED),
+        'ended': bool(flags & FLAG_ENDED),
+        'winner': WINNERS[winner],
+        'version': version,
+        'created_at': created_at,
+        'updated_at': updated_at,
+        'player_count': player_count
+    }
+
+
+def peek_alive(data: bytes) -> Dict[str, bool]:
+    """Map of player ID to alive flag, read from the fixed player rows."""
+    if not is_compact(data) or data[2] == FORMAT_JSON:
+        return {pid: p['alive'] for pid, p in _json_game(data)['players'].items()}
+
+    header, pos = _unpack_header(data)
+    player_count = header[5]
+    alive = [row[1] for row in struct.iter_unpack(PLAYER_ROW.format, data[pos:pos + player_count * PLAYER_ROW.size])]
+    pos += player_count * PLAYER_ROW.size + U16.size
+
+    flags = {}
+    for i in range(player_count):
+        player_id, pos = _get_str(data, pos)
+        flags[player_id] = bool(alive[i])
+    return flags
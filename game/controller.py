@@ -5,6 +5,7 @@ import logging
 from server.http import HttpServer
 from game.game_state import GameStateManager
 from game.game_logic import GameLogic
+from game.roles import ROLE_SETS
 from game.phase_timer import phase_timer
 
 
@@ -39,9 +40,11 @@ class WerewolfApp:
                     'POST /games/{id}/action - Perform action',
                     'POST /games/{id}/vote - Vote',
                     'POST /games/{id}/chat - Send chat',
+                    'GET /games/{id}/chat?since={seq} - Chat history',
                     'GET /games/{id}/state - Get game state',
                     'GET /games/{id}/player/{pid} - Get player info',
                     'GET /admin/games - List all games (debug)',
+                    'GET /admin/timers - Phase timer lag and timing histograms',
                     'GET /swagger-ui - Interactive API documentation',
                     'GET /api-docs - OpenAPI specification (JSON)',
                     'GET /api-docs.yaml - OpenAPI specification (YAML)'
@@ -102,8 +105,13 @@ class WerewolfApp:
                 if len(game['players']) < 3:
                     return self.json_response(400, {'error': 'Need at least 3 players'})
                 
+                # Optional {"role_set": ...}; large lobbies use 'scaled' to get several werewolves
+                role_set = self.parse_json_body(req).get('role_set')
+                if role_set is not None and role_set not in ROLE_SETS:
+                    return self.json_response(400, {'error': f"Unknown role set, use one of: {', '.join(ROLE_SETS)}"})
+                
                 # Assign roles
-                if not self.game_logic.assign_roles(game_id):
+                if not self.game_logic.assign_roles(game_id, role_set):
                     return self.json_response(500, {'error': 'Failed to start game'})
                 
                 # Start night phase
@@ -130,16 +138,18 @@ class WerewolfApp:
                 player_id = body['player_id']
                 action_type = body['action_type']
                 target_id = body.get('target_id')
+                message = body.get('message')
+                if action_type == 'chat' and not isinstance(message, str):
+                    return self.json_response(400, {'error': 'message required for chat'})
                 
-                # Validate action
-                valid, error_msg = self.game_logic.validate_action(
-                    game_id, player_id, action_type, target_id
+                # Validate and record against one load of the game
+                valid, error_msg, recorded = self.game_logic.perform_action(
+                    game_id, player_id, action_type, target_id, message
                 )
                 if not valid:
                     return self.json_response(403, {'error': error_msg})
                 
-                # Record action
-                if self.state_manager.record_action(game_id, action_type, player_id, target_id):
+                if recorded:
                     return self.json_response(200, {'status': 'recorded'})
                 else:
                     return self.json_response(500, {'error': 'Failed to record action'})
@@ -163,15 +173,14 @@ class WerewolfApp:
                 player_id = body['player_id']
                 target_id = body['target_id']
                 
-                # Validate vote
-                valid, error_msg = self.game_logic.validate_action(
+                # Validate and record against one load of the game
+                valid, error_msg, recorded = self.game_logic.perform_action(
                     game_id, player_id, 'day_vote', target_id
                 )
                 if not valid:
                     return self.json_response(403, {'error': error_msg})
                 
-                # Record vote
-                if self.state_manager.record_action(game_id, 'day_vote', player_id, target_id):
+                if recorded:
                     return self.json_response(200, {'status': 'voted'})
                 else:
                     return self.json_response(500, {'error': 'Failed to record vote'})
@@ -194,16 +203,17 @@ class WerewolfApp:
                 
                 player_id = body['player_id']
                 message = body['message']
+                if not isinstance(message, str):
+                    return self.json_response(400, {'error': 'message must be a string'})
                 
-                # Validate chat
-                valid, error_msg = self.game_logic.validate_action(
-                    game_id, player_id, 'chat'
+                # Validate and post against one load of the game
+                valid, error_msg, recorded = self.game_logic.perform_action(
+                    game_id, player_id, 'chat', message=message
                 )
                 if not valid:
                     return self.json_response(403, {'error': error_msg})
                 
-                # Add chat message
-                if self.state_manager.add_chat_message(game_id, player_id, message):
+                if recorded:
                     return self.json_response(200, {'status': 'sent'})
                 else:
                     return self.json_response(429, {'error': 'Rate limited or invalid message'})
@@ -211,6 +221,31 @@ class WerewolfApp:
             except Exception as e:
                 return self.json_response(500, {'error': str(e)})
         
+        @self.app.route('GET', '/games/<game_id>/chat')
+        def get_chat_history(req):
+            """Get chat messages from sequence number ?since= on, including archived ones."""
+            try:
+                game_id = req.get('path_params', {}).get('game_id')
+                if not game_id:
+                    return self.json_response(400, {'error': 'Invalid game ID'})
+                
+                query_params = self.parse_query_params(req['path'])
+                try:
+                    since = int(query_params.get('since', 0))
+                except ValueError:
+                    return self.json_response(400, {'error': 'since must be an integer'})
+                
+                messages = self.state_manager.get_chat_history(game_id, max(0, since))
+                if messages is None:
+                    return self.json_response(404, {'error': 'Game not found'})
+                
+                # Clients poll with next_since to get only what's new
+                next_since = messages[-1]['seq'] + 1 if messages else since
+                return self.json_response(200, {'messages': messages, 'next_since': next_since})
+                
+            except Exception as e:
+                return self.json_response(500, {'error': str(e)})
+        
         @self.app.route('GET', '/games/<game_id>/state')
         def get_game_state(req):
             """Get the current game state."""
@@ -223,11 +258,12 @@ class WerewolfApp:
                 query_params = self.parse_query_params(req['path'])
                 player_id = query_params.get('player_id')
                 
-                summary = self.game_logic.get_game_summary(game_id, player_id)
-                if 'error' in summary:
-                    return self.json_response(404, summary)
+                # Pre-encoded and cached per game version and viewer
+                body = self.game_logic.render_game_summary(game_id, player_id)
+                if body is None:
+                    return self.json_response(404, {'error': 'Game not found'})
                 
-                return self.json_response(200, summary)
+                return self.app.response(200, self.get_status_message(200), body, {'Content-Type': 'application/json'})
                 
             except Exception as e:
                 return self.json_response(500, {'error': str(e)})
@@ -255,18 +291,34 @@ class WerewolfApp:
         # Admin/Debug endpoints
         @self.app.route('GET', '/admin/games')
         def list_all_games(req):
-            """List all games (debug endpoint)."""
+            """List all games, optionally filtered by ?state= and ?phase= (debug endpoint)."""
             try:
-                games = self.state_manager.get_all_games()
+                query_params = self.parse_query_params(req['path'])
+                state = query_params.get('state', 'all')
+                if state not in ('all', 'live', 'ended', 'lobby'):
+                    return self.json_response(400, {'error': 'state must be one of all, live, ended, lobby'})
+                
+                games = self.state_manager.get_all_games(state, query_params.get('phase'))
                 active_timers = phase_timer.get_active_timers()
                 
                 return self.json_response(200, {
                     'games': games,
-                    'active_timers': active_timers
+                    'active_timers': active_timers,
+                    'timer_owners': self.state_manager.store.timer_owners(),
+                    'index': self.state_manager.index.counts(),
+                    'render_cache': self.game_logic.render_cache.stats()
                 })
             except Exception as e:
                 return self.json_response(500, {'error': str(e)})
         
+        @self.app.route('GET', '/admin/timers')
+        def timer_metrics(req):
+            """How late this backend's phase transitions fire, with timing histograms (debug endpoint)."""
+            try:
+                return self.json_response(200, phase_timer.get_metrics())
+            except Exception as e:
+                return self.json_response(500, {'error': str(e)})
+        
         @self.app.route('POST', '/admin/games/<game_id>/force-end-phase')
         def force_end_phase(req):
             """Force end the current phase (admin endpoint)."""
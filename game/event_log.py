@@ -0,0 +1,212 @@
+import json
+import os
+import queue
+import threading
+import time
+import logging
+from typing import Callable, Dict, List, Tuple
+from game.journal import FSYNC_POLICIES
+
+try:
+    import fcntl  # Cross-process file locking (POSIX only)
+except ImportError:
+    fcntl = None
+
+Commit = Tuple[int, float, List[Dict]]  # version, commit time, events
+
+
+class GameEventLog:
+    """
+    Append-only log of every game's committed events (see events.py).
+
+    Each commit queues one JSON line ``{"g": game ID, "v": version,
+    "t": commit time, "e": [events]}`` right after it succeeds, and an
+    appender thread writes whatever is queued in one write. Committing
+    never waits on the file lock, the disk or fsync, unless the appender
+    has fallen ``max_pending`` lines behind. The journal is written behind
+    too, but the log trails commits by only the appender's last write, so
+    after a crash recovery replays the commits the journal never saw on
+    top of the snapshot and journal.
+
+    Loss bound: a process crash loses the lines still queued, at most
+    ``max_pending``. An OS crash also loses what was written but not yet
+    fsynced: ``fsync_interval`` seconds under 'interval', nothing under
+    'always'. Lines already covered by the snapshot are dropped when the
+    journal is compacted.
+    """
+
+    def __init__(self, path: str, fsync_policy: str = 'interval', fsync_interval: float = 1.0,
+                 max_pending: int = 10000):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+
+        self.path = path
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.last_fsync = time.time()
+        self.fd = None
+        # flock only excludes other processes; the appender and compaction share this fd
+        self.thread_lock = threading.Lock()
+        self.max_pending = max_pending
+        self.pending = None  # Queue of lines for the appender thread
+        self.appender_pid = None
+        self.start_lock = threading.Lock()
+        self.unsynced = False
+
+    def _open(self):
+        if self.fd is None:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        return self.fd
+
+    def _lock(self, fd: int):
+        self.thread_lock.acquire()
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+
+    def _unlock(self, fd: int):
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self.thread_lock.release()
+
+    def append(self, game_id: str, version: int, committed_at: float, events: List[Dict]):
+        """Queue the events of one commit for the appender thread."""
+        try:
+            line = json.dumps({'g': game_id, 'v': version, 't': committed_at, 'e': events}, separators=(',', ':'))
+        except (TypeError, ValueError) as e:
+            # Replay of this game stops at the resulting gap; the journal still has the state
+            logging.error(f"Events of game {game_id} version {version} can't be logged: {e}")
+            return
+
+        # Blocks only when the appender is max_pending lines behind
+        self._appender().put((line + '\n').encode('utf-8'))
+
+    def _appender(self) -> queue.Queue:
+        # Forked children don't inherit the thread, start one (with its own queue) per process
+        if self.appender_pid != os.getpid():
+            with self.start_lock:
+                if self.appender_pid != os.getpid():
+                    self.pending = queue.Queue(self.max_pending)
+                    threading.Thread(target=self._appender_loop, args=(self.pending,),
+                                     name='event-log-appender', daemon=True).start()
+                    self.appender_pid = os.getpid()
+        return self.pending
+
+    def _appender_loop(self, pending: queue.Queue):
+        while True:
+            try:
+                # With nothing queued, fsync what the last write left unsynced once it's due
+                lines = [pending.get(timeout=self.fsync_interval if self.unsynced else None)]
+            except queue.Empty:
+                self._sync_due(force=True)
+                continue
+            try:
+                while len(lines) < 1000:
+                    lines.append(pending.get_nowait())
+            except queue.Empty:
+                pass
+
+            try:
+                self._write(b''.join(lines))
+            except OSError as e:
+                logging.error(f"Failed to write {len(lines)} event log entries: {e}")
+            finally:
+                for _ in lines:
+                    pending.task_done()
+
+    def _write(self, data: bytes):
+        with self.thread_lock:
+            fd = self._open()
+        self._lock(fd)
+        try:
+            os.write(fd, data)
+            self.unsynced = self.fsync_policy != 'never'
+            self._sync_due(fd)
+        finally:
+            self._unlock(fd)
+
+    def _sync_due(self, fd: int = None, force: bool = False):
+        if not self.unsynced:
+            return
+        now = time.time()
+        if (force or self.fsync_policy == 'always'
+                or now - self.last_fsync >= self.fsync_interval):
+            if fd is None:
+                with self.thread_lock:
+                    if self.fd is not None:
+                        os.fsync(self.fd)
+            else:
+                os.fsync(fd)
+            self.last_fsync = now
+            self.unsynced = False
+
+    def drain(self):
+        """Wait until every queued line is written."""
+        if self.appender_pid == os.getpid():
+            self.pending.join()
+
+    @staticmethod
+    def parse(lines) -> Dict[str, List[Commit]]:
+        """Commits per game, in version order, from log lines."""
+        games: Dict[str, List[Commit]] = {}
+        for line_no, line in enumerate(lines, 1):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Only a crash mid-append can leave a torn line behind
+                logging.warning("Skipping torn event log entry at line %d", line_no)
+                continue
+            games.setdefault(entry['g'], []).append((entry['v'], entry['t'], entry['e']))
+
+        # Processes append concurrently, so one game's commits may land out of order
+        for commits in games.values():
+            commits.sort(key=lambda commit: commit[0])
+        return games
+
+    def read_all(self) -> Dict[str, List[Commit]]:
+        """Every logged commit, grouped by game in version order."""
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'rb') as f:
+            return self.parse(f)
+
+    def compact(self, needed: Callable[[str, int], bool]) -> int:
+        """
+        Drop the commits ``needed(game_id, version)`` says recovery can do
+        without. Rewritten in place under the log lock, so commits appended
+        by other processes meanwhile are never lost. Returns the lines kept.
+        """
+        with self.thread_lock:
+            fd = self._open()
+        self._lock(fd)
+        try:
+            with open(self.path, 'rb') as f:
+                lines = f.readlines()
+            kept = []
+            for line in lines:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if needed(entry['g'], entry['v']):
+                    kept.append(line)
+            os.ftruncate(fd, 0)
+            if kept:
+                os.write(fd, b''.join(kept))
+            if self.fsync_policy != 'never':
+                os.fsync(fd)
+            return len(kept)
+        finally:
+            self._unlock(fd)
+
+    def sync(self):
+        self.drain()
+        with self.thread_lock:
+            if self.fd is not None and self.fsync_policy != 'never':
+                os.fsync(self.fd)
+
+    def close(self):
+        self.sync()
+        with self.thread_lock:
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
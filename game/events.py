@@ -0,0 +1,130 @@
+import random
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from game import rules
+
+# Game events.
+#
+# Every change GameLogic makes to a game is an event, applied by
+# ``apply_event``: a reducer over the game dict built on rules.py. The live
+# path and replay run the same code. Anything random or time-dependent is
+# decided before the event is made and travels in it, so replaying a game's
+# events rebuilds it exactly.
+#
+#   created         time
+#   joined          player_id, name, time
+#   roles_assigned  role_set, seed (for the shuffle)
+#   phase_started   phase, phase_end
+#   phase_shortened phase_end (moved up once everyone the phase waits on has acted)
+#   vote_cast       action_type (werewolf_vote, seer_investigate or day_vote), player_id, target_id
+#   chat_posted     player_id, message, time, tokens (left in the sender's bucket), evict
+#   night_resolved  time (of the seer reading)
+#   day_resolved    seed (for tie-breaks)
+#   win_checked
+#   state_updated   updates (raw key updates, see GameStateManager.update_game_state)
+#
+# Events are committed in groups: one unit of work's events move the game
+# from version v - 1 to v (see event_log.py).
+
+
+def new_seed() -> int:
+    return random.getrandbits(32)
+
+
+def created(created_at: float) -> Dict:
+    return {'type': 'created', 'time': created_at}
+
+
+def joined(player_id: str, name: str, joined_at: float) -> Dict:
+    return {'type': 'joined', 'player_id': player_id, 'name': name, 'time': joined_at}
+
+
+def roles_assigned(role_set: str, seed: int) -> Dict:
+    return {'type': 'roles_assigned', 'role_set': role_set, 'seed': seed}
+
+
+def phase_started(phase: str, phase_end: Optional[float]) -> Dict:
+    return {'type': 'phase_started', 'phase': phase, 'phase_end': phase_end}
+
+
+def phase_shortened(phase_end: float) -> Dict:
+    return {'type': 'phase_shortened', 'phase_end': phase_end}
+
+
+def vote_cast(action_type: str, player_id: str, target_id: Optional[str]) -> Dict:
+    return {'type': 'vote_cast', 'action_type': action_type, 'player_id': player_id, 'target_id': target_id}
+
+
+def chat_posted(player_id: str, message: str, sent_at: float, tokens: float, evict: int) -> Dict:
+    return {'type': 'chat_posted', 'player_id': player_id, 'message': message, 'time': sent_at,
+            'tokens': tokens, 'evict': evict}
+
+
+def night_resolved(now: float) -> Dict:
+    return {'type': 'night_resolved', 'time': now}
+
+
+def day_resolved(seed: int) -> Dict:
+    return {'type': 'day_resolved', 'seed': seed}
+
+
+def win_checked() -> Dict:
+    return {'type': 'win_checked'}
+
+
+def state_updated(updates: Dict[str, Any]) -> Dict:
+    return {'type': 'state_updated', 'updates': updates}
+
+
+def apply_event(game: Dict, event: Dict) -> Any:
+    """Apply one event to a loaded game and return the rule's result."""
+    kind = event['type']
+    if kind == 'joined':
+        return rules.add_player(game, event['player_id'], event['name'], event['time'])
+    if kind == 'roles_assigned':
+        return rules.apply_roles(game, event['role_set'], random.Random(event['seed']))
+    if kind == 'phase_started':
+        return rules.start_phase(game, event['phase'], event['phase_end'])
+    if kind == 'phase_shortened':
+        return rules.shorten_phase(game, event['phase_end'])
+    if kind == 'vote_cast':
+        return rules.apply_action(game, event['action_type'], event['player_id'], event['target_id'])
+    if kind == 'chat_posted':
+        return rules.post_chat(game, event['player_id'], event['message'], event['time'],
+                               event['tokens'], event['evict'])
+    if kind == 'night_resolved':
+        return rules.resolve_night(game, event['time'])
+    if kind == 'day_resolved':
+        return rules.resolve_day(game, random.Random(event['seed']))
+    if kind == 'win_checked':
+        return rules.apply_win_condition(game)
+    if kind == 'state_updated':
+        return rules.update_keys(game, event['updates'])
+    raise ValueError(f"Unknown event type: {kind}")
+
+
+def replay(game: Optional[Dict], commits: Iterable[Tuple[int, float, List[Dict]]]) -> Tuple[Optional[Dict], int]:
+    """
+    Apply commits of (version, commit time, events) in order to ``game``
+    (None to start from its ``created`` event). Commits the game already has
+    are skipped; replay stops at a gap in the versions, since a change that
+    wasn't recorded as events can't be reproduced. Returns the game and how
+    many commits were applied.
+    """
+    applied = 0
+    for version, committed_at, events in commits:
+        if game is None:
+            if version != 1 or not events or events[0]['type'] != 'created':
+                break
+            game = rules.new_game(events[0]['time'])
+            events = events[1:]
+        elif version <= game.get('version', 0):
+            continue
+        elif version != game.get('version', 0) + 1:
+            break
+
+        for event in events:
+            apply_event(game, event)
+        game['version'] = version
+        game['updated_at'] = committed_at
+        applied += 1
+    return game, applied
@@ -0,0 +1,57 @@
+import gzip
+import json
+import os
+from typing import Dict, List, Optional
+
+
+class GameArchive:
+    """
+    Compressed on-disk store for games evicted from the hot working set.
+
+    Each game is one gzip-compressed JSON file, written to a temporary file
+    and renamed into place so a reader never sees a partial archive.
+    """
+
+    def __init__(self, directory: str, compress_level: int = 6):
+        self.directory = directory
+        self.compress_level = compress_level
+
+    def _path(self, game_id: str) -> str:
+        return os.path.join(self.directory, f"{game_id}.json.gz")
+
+    def put(self, game_id: str, game: Dict):
+        """Archive a game, replacing any earlier copy."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(game_id)
+        temp_file = f"{path}.{os.getpid()}.tmp"
+        try:
+            with gzip.open(temp_file, 'wb', compresslevel=self.compress_level) as f:
+                f.write(json.dumps(game, separators=(',', ':')).encode('utf-8'))
+            os.replace(temp_file, path)
+        except Exception:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            raise
+
+    def get(self, game_id: str) -> Optional[Dict]:
+        """Load an archived game, or None if it isn't archived."""
+        try:
+            with gzip.open(self._path(game_id), 'rb') as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return None
+
+    def contains(self, game_id: str) -> bool:
+        return os.path.exists(self._path(game_id))
+
+    def delete(self, game_id: str):
+        try:
+            os.remove(self._path(game_id))
+        except FileNotFoundError:
+            pass
+
+    def game_ids(self) -> List[str]:
+        """IDs of all archived games."""
+        if not os.path.isdir(self.directory):
+            return []
+        return [name[:-len('.json.gz')] for name in os.listdir(self.directory) if name.endswith('.json.gz')]
@@ -0,0 +1,167 @@
+import heapq
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class GameIndex:
+    """
+    Secondary indexes over game headers, by lifecycle state.
+
+    Kept in step with every commit this process makes and refreshed from the
+    store in the background, so entries written by other processes may lag
+    by up to one refresh. Callers treat results as candidates and re-check
+    the game's header before acting on it.
+
+    Deadlines and creation times are heaps with lazy deletion: an entry is
+    only valid while it matches the game's current header.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.headers: Dict[str, Dict] = {}
+        self.live_by_phase: Dict[str, Set[str]] = {}
+        self.ended: Set[str] = set()
+        self.open_lobbies: Set[str] = set()
+        self.deadlines: List[Tuple[float, str]] = []
+        self.created: List[Tuple[float, str]] = []
+
+    def _unlink(self, game_id: str, header: Dict):
+        """Drop a game from the set indexes (heap entries expire lazily)."""
+        if header['ended']:
+            self.ended.discard(game_id)
+        else:
+            games = self.live_by_phase.get(header['phase'])
+            if games is not None:
+                games.discard(game_id)
+                if not games:
+                    del self.live_by_phase[header['phase']]
+        self.open_lobbies.discard(game_id)
+
+    def update(self, game_id: str, header: Dict):
+        """Index a game's current header."""
+        with self.lock:
+            previous = self.headers.get(game_id)
+            if previous is not None:
+                if previous.get('version', 0) > header.get('version', 0):
+                    return  # A newer commit already got here
+                self._unlink(game_id, previous)
+            self.headers[game_id] = header
+
+            if header['ended']:
+                self.ended.add(game_id)
+            else:
+                self.live_by_phase.setdefault(header['phase'], set()).add(game_id)
+                if not header['started']:
+                    self.open_lobbies.add(game_id)
+
+            if header['phase_end'] is not None and (previous is None or previous['phase_end'] != header['phase_end']):
+                heapq.heappush(self.deadlines, (header['phase_end'], game_id))
+            if previous is None:
+                heapq.heappush(self.created, (header['created_at'], game_id))
+
+    def remove(self, game_id: str):
+        with self.lock:
+            previous = self.headers.pop(game_id, None)
+            if previous is not None:
+                self._unlink(game_id, previous)
+
+    def rebuild(self, headers: Dict[str, Dict]):
+        """
+        Replace the whole index with a fresh set of headers. The new indexes
+        are built aside and swapped in at once, so lookups meanwhile see the
+        old ones rather than a partial index. Headers this process committed
+        after ``headers`` was read are kept.
+        """
+        fresh = GameIndex()
+        for game_id, header in headers.items():
+            fresh.update(game_id, header)
+        with self.lock:
+            for game_id, header in self.headers.items():
+                if game_id in fresh.headers:
+                    fresh.update(game_id, header)
+            self.headers = fresh.headers
+            self.live_by_phase = fresh.live_by_phase
+            self.ended = fresh.ended
+            self.open_lobbies = fresh.open_lobbies
+            self.deadlines = fresh.deadlines
+            self.created = fresh.created
+
+    def header(self, game_id: str) -> Optional[Dict]:
+        with self.lock:
+            return self.headers.get(game_id)
+
+    def is_live(self, game_id: str) -> bool:
+        with self.lock:
+            header = self.headers.get(game_id)
+            return header is not None and not header['ended']
+
+    def live_games(self, phase: Optional[str] = None) -> Set[str]:
+        """Games that haven't ended, optionally only those in ``phase``."""
+        with self.lock:
+            if phase is not None:
+                return set(self.live_by_phase.get(phase, ()))
+            return set().union(*self.live_by_phase.values()) if self.live_by_phase else set()
+
+    def ended_games(self) -> Set[str]:
+        with self.lock:
+            return set(self.ended)
+
+    def lobbies(self) -> Set[str]:
+        """Games still accepting players."""
+        with self.lock:
+            return set(self.open_lobbies)
+
+    @staticmethod
+    def _walk(heap: List[Tuple[float, str]], limit: Optional[float]) -> List[Tuple[float, str]]:
+        """
+        Entries of ``heap`` below ``limit`` in ascending order, without popping:
+        a frontier of candidate positions is expanded only below the limit,
+        so the cost follows the number of matches rather than the heap size.
+        """
+        result = []
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier:
+            entry, i = heapq.heappop(frontier)
+            if limit is not None and entry[0] > limit:
+                continue
+            result.append(entry)
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+        return result
+
+    def _valid_deadline(self, phase_end: float, game_id: str) -> bool:
+        header = self.headers.get(game_id)
+        return header is not None and not header['ended'] and header['phase_end'] == phase_end
+
+    def deadlines_until(self, until: Optional[float] = None) -> List[Tuple[float, str]]:
+        """Live games' (phase_end, game ID) deadlines up to ``until``, earliest first."""
+        with self.lock:
+            # Drop stale entries from the top so the heap doesn't keep growing
+            while self.deadlines and not self._valid_deadline(*self.deadlines[0]):
+                heapq.heappop(self.deadlines)
+            return [entry for entry in self._walk(self.deadlines, until) if self._valid_deadline(*entry)]
+
+    def created_before(self, cutoff: float) -> List[str]:
+        """Games created before ``cutoff``, oldest first."""
+        with self.lock:
+            while self.created and self.created[0][1] not in self.headers:
+                heapq.heappop(self.created)
+            result = []
+            seen = set()
+            for created_at, game_id in self._walk(self.created, cutoff):
+                # A game removed and indexed again has two entries
+                if created_at < cutoff and game_id in self.headers and game_id not in seen:
+                    seen.add(game_id)
+                    result.append(game_id)
+            return result
+
+    def counts(self) -> Dict:
+        with self.lock:
+            return {
+                'games': len(self.headers),
+                'live_by_phase': {phase: len(games) for phase, games in self.live_by_phase.items()},
+                'ended': len(self.ended),
+                'open_lobbies': len(self.open_lobbies),
+                'pending_deadlines': len(self.deadlines)
+            }
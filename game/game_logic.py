@@ -1,114 +1,46 @@
-import random
+import json
 import time
 from typing import Dict, List, Optional, Tuple
 from game.game_state import GameStateManager
+from game.render_cache import RenderCache, RenderedGame, PUBLIC, ENDED
+from game import events
+from game.roster import role_players, alive_count, dead_count
 
 class GameLogic:
     """
     Handles all game rules, role assignments, and phase transitions.
+    Validates requests and decides what happens; every change is made by
+    emitting an event (events.py) against a unit of work.
     """
     
+    _role_set = 'classic'  # Role set for games started without one (see roles.py)
+    
     def __init__(self):
         self.state_manager = GameStateManager()
+        self.render_cache = RenderCache()
     
-    def assign_roles(self, game_id: str) -> bool:
+    def assign_roles(self, game_id: str, role_set: Optional[str] = None) -> bool:
         """
-        Randomly assign roles to players in the game.
-        1 werewolf, 1 seer, rest villagers (minimum 3 players required).
+        Randomly assign roles to players in the game (minimum 3 players required).
+        ``role_set`` picks how many werewolves are dealt (see roles.py); the
+        classic set is 1 werewolf, 1 seer, rest villagers.
         """
-        game = self.state_manager.get_game_state(game_id)
-        if not game or len(game['players']) < 3:
-            return False
-        
-        player_ids = list(game['players'].keys())
-        random.shuffle(player_ids)
-        
-        # Assign roles
-        roles = ['werewolf', 'seer'] + ['villager'] * (len(player_ids) - 2)
-        
-        updates = {}
-        for i, player_id in enumerate(player_ids):
-            updates[f'players.{player_id}.role'] = roles[i]
-        
-        # Update game state
-        game_updates = {
-            'started': True,
-            'phase': 'night'
-        }
-        
-        # Apply role assignments
-        for player_id, role in zip(player_ids, roles):
-            game['players'][player_id]['role'] = role
-
-        game_updates['players'] = game['players']
+        def work(uow):
+            if len(uow.game['players']) < 3:
+                return None
+            return uow.emit(events.roles_assigned(role_set or self._role_set, events.new_seed()))
         
-        return self.state_manager.update_game_state(game_id, game_updates)
+        return bool(self.state_manager.run(game_id, work))
     
     def resolve_night_actions(self, game_id: str) -> Dict:
         """
         Process night actions: werewolf kills and seer investigations.
         Returns result summary.
         """
-        game = self.state_manager.get_game_state(game_id)
-        if not game:
+        # Resolved with compare-and-swap so votes cast meanwhile aren't overwritten
+        result = self.state_manager.run(game_id, lambda uow: uow.emit(events.night_resolved(time.time())))
+        if result is None:
             return {'error': 'Game not found'}
-        
-        result = {
-            'killed': None,
-            'seer_result': None,
-            'actions_processed': True
-        }
-        
-        # Process werewolf votes
-        werewolf_votes = game['actions']['werewolf_votes']
-        if werewolf_votes:
-            # Find most voted target
-            most_voted = max(werewolf_votes.items(), key=lambda x: x[1])
-            target_id = most_voted[0]
-            
-            # Kill the target
-            if target_id in game['players'] and game['players'][target_id]['alive']:
-                game['players'][target_id]['alive'] = False
-                result['killed'] = {
-                    'player_id': target_id,
-                    'name': game['players'][target_id]['name']
-                }
-        
-        # Process seer investigation
-        seer_target = game['actions']['seer_target']
-        if seer_target and seer_target in game['players']:
-            target_role = game['players'][seer_target]['role']
-            result['seer_result'] = {
-                'target_id': seer_target,
-                'target_name': game['players'][seer_target]['name'],
-                'is_werewolf': target_role == 'werewolf'
-            }
-        
-        # Clear night actions
-        game_updates = {
-            'actions': {
-                'werewolf_votes': {},
-                'seer_target': None,
-                'day_votes': {}
-            }
-        }
-
-        game_updates['seer_history'] = game['seer_history']
-        if seer_target:
-            game_updates['seer_history'].append({
-                'target_id': seer_target,
-                'target_role': target_role,
-                'timestamp': time.time()
-            })
-
-        game_updates['players'] = game['players']
-        
-        # Clear player votes
-        for player in game['players'].values():
-            player['vote'] = None
-        
-        self.state_manager.update_game_state(game_id, game_updates)
-        
         return result
     
     def resolve_day_votes(self, game_id: str) -> Dict:
@@ -116,58 +48,10 @@ class GameLogic:
         Process day phase voting and execute the most voted player.
         Returns execution result.
         """
-        game = self.state_manager.get_game_state(game_id)
-        if not game:
+        # Resolved with compare-and-swap so votes cast meanwhile aren't overwritten
+        result = self.state_manager.run(game_id, lambda uow: uow.emit(events.day_resolved(events.new_seed())))
+        if result is None:
             return {'error': 'Game not found'}
-        
-        result = {
-            'executed': None,
-            'vote_counts': {},
-            'actions_processed': True
-        }
-        
-        # Count votes
-        day_votes = game['actions']['day_votes']
-        vote_counts = {}
-        
-        for target_id, voters in day_votes.items():
-            if target_id in game['players'] and game['players'][target_id]['alive']:
-                vote_counts[target_id] = len(voters)
-        
-        result['vote_counts'] = vote_counts
-        
-        # Execute most voted player (if there are votes)
-        if vote_counts:
-            max_votes = max(vote_counts.values())
-            most_voted_players = [pid for pid, votes in vote_counts.items() if votes == max_votes]
-            
-            # In case of tie, random selection
-            if most_voted_players:
-                executed_id = random.choice(most_voted_players)
-                game['players'][executed_id]['alive'] = False
-                result['executed'] = {
-                    'player_id': executed_id,
-                    'name': game['players'][executed_id]['name'],
-                    'role': game['players'][executed_id]['role'],
-                    'votes': vote_counts[executed_id]
-                }
-        
-        # Clear day votes and player votes
-        game_updates = {
-            'actions': {
-                'werewolf_votes': {},
-                'seer_target': None,
-                'day_votes': {}
-            }
-        }
-        
-        for player in game['players'].values():
-            player['vote'] = None
-
-        game_updates['players'] = game['players']
-        
-        self.state_manager.update_game_state(game_id, game_updates)
-        
         return result
     
     def check_win_condition(self, game_id: str) -> Optional[str]:
@@ -175,33 +59,12 @@ class GameLogic:
         Check if the game has ended and return the winner.
         Returns: 'villagers', 'werewolves', or None if game continues.
         """
-        game = self.state_manager.get_game_state(game_id)
-        if not game or not game['started']:
-            return None
-        
-        alive_players = [p for p in game['players'].values() if p['alive']]
-        alive_werewolves = [p for p in alive_players if p['role'] == 'werewolf']
-        alive_villagers = [p for p in alive_players if p['role'] != 'werewolf']
-        
-        # Werewolves win if they equal or outnumber villagers
-        if len(alive_werewolves) >= len(alive_villagers):
-            self.state_manager.update_game_state(game_id, {
-                'ended': True,
-                'winner': 'werewolves',
-                'phase': 'ended'
-            })
-            return 'werewolves'
+        def work(uow):
+            if uow.game['ended']:
+                return uow.game['winner']
+            return uow.emit(events.win_checked())
         
-        # Villagers win if no werewolves left
-        if len(alive_werewolves) == 0:
-            self.state_manager.update_game_state(game_id, {
-                'ended': True,
-                'winner': 'villagers',
-                'phase': 'ended'
-            })
-            return 'villagers'
-        
-        return None
+        return self.state_manager.run(game_id, work)
     
     def get_player_role_info(self, game_id: str, player_id: str) -> Dict:
         """
@@ -218,10 +81,11 @@ class GameLogic:
         
         if role == 'werewolf':
             # Werewolf can see other werewolves
+            players = game['players']
             other_werewolves = [
-                {'id': pid, 'name': p['name']}
-                for pid, p in game['players'].items()
-                if p['role'] == 'werewolf' and pid != player_id and p['alive']
+                {'id': pid, 'name': players[pid]['name']}
+                for pid in role_players(game, 'werewolf')
+                if pid != player_id and players[pid]['alive']
             ]
             return {
                 'role': 'werewolf',
@@ -256,7 +120,10 @@ class GameLogic:
         game = self.state_manager.get_game_state(game_id)
         if not game:
             return False, "Game not found"
-        
+        return self.check_action(game, player_id, action_type, target_id)
+    
+    def check_action(self, game: Dict, player_id: str, action_type: str, target_id: str = None) -> Tuple[bool, str]:
+        """Validate an action against a loaded game. Returns (is_valid, error_message)."""
         if game['ended']:
             return False, "Game has ended"
         
@@ -285,6 +152,8 @@ class GameLogic:
                 return False, "Werewolf votes only allowed during night phase"
             if target_id == player_id:
                 return False, "Cannot target yourself"
+            if target_id and game['players'][target_id]['role'] == 'werewolf':
+                return False, "Werewolves cannot target each other"
         
         elif action_type == 'seer_investigate':
             if player['role'] != 'seer':
@@ -309,12 +178,42 @@ class GameLogic:
         
         return True, ""
     
+    def perform_action(self, game_id: str, player_id: str, action_type: str,
+                       target_id: str = None, message: str = None) -> Tuple[bool, str, bool]:
+        """
+        Validate and record an action (or chat ``message``) with one load
+        and one commit. Returns (is_valid, error_message, recorded); a chat
+        message isn't recorded when it's empty or the player is rate limited.
+        """
+        # Death is final, so a dead player's action is turned away from the
+        # alive flags alone, without taking the game's lock or decoding it
+        alive = self.state_manager.get_alive_flags(game_id)
+        if alive is not None and alive.get(player_id) is False and self.state_manager.index.is_live(game_id):
+            return False, "Dead players cannot act", False
+        
+        def work(uow):
+            valid, error_msg = self.check_action(uow.game, player_id, action_type, target_id)
+            if not valid:
+                return False, error_msg, False
+            
+            if action_type == 'chat':
+                return True, "", self.state_manager.post_chat_message(uow, player_id, message)
+            
+            # Ends the phase early once everyone it waits on has acted
+            return True, "", self.state_manager.cast_vote(uow, action_type, player_id, target_id)
+        
+        return self.state_manager.run(game_id, work, (False, "Game not found", False))
+    
     def get_alive_players(self, game_id: str) -> List[Dict]:
         """Get list of alive players."""
         game = self.state_manager.get_game_state(game_id)
-        if not game:
+        if not game or alive_count(game) == 0:
             return []
         
+        if dead_count(game) == 0:
+            # Nobody to filter out
+            return [{'id': pid, 'name': player['name'], 'alive': True} for pid, player in game['players'].items()]
+        
         return [
             {
                 'id': pid,
@@ -333,6 +232,42 @@ class GameLogic:
         if not game:
             return {'error': 'Game not found'}
         
+        summary = self._summarize(game_id, game, player_id)
+        if 'phase_end' in summary:
+            summary['time_remaining'] = max(0, summary['phase_end'] - time.time())
+        return summary
+    
+    def render_game_summary(self, game_id: str, player_id: str = None) -> Optional[bytes]:
+        """
+        The game summary as an encoded JSON response body.
+        
+        Summaries are cached per game version and viewer class (public,
+        the player's own view, or everyone once the game has ended), so a
+        state change is serialised once per viewer class rather than once
+        per poll. Only time_remaining is filled in on each request.
+        """
+        version = self.state_manager.get_game_version(game_id)
+        cached = self.render_cache.get(game_id, version, player_id) if version is not None else None
+        if cached is None:
+            game = self.state_manager.get_game_state(game_id)
+            if not game:
+                return None
+            
+            entry = RenderedGame(game['version'], game['ended'], frozenset(game['players']), game.get('phase_end') or None)
+            viewer = entry.viewer(player_id)
+            summary = self._summarize(game_id, game, None if viewer in (PUBLIC, ENDED) else viewer)
+            body = json.dumps(summary, indent=2).encode('utf-8')
+            self.render_cache.put(game_id, entry, viewer, body)
+            cached = body, entry.phase_end
+        
+        body, phase_end = cached
+        if phase_end is None:
+            return body
+        # Splice the countdown in before the closing brace of the cached document
+        return body[:-2] + b',\n  "time_remaining": ' + json.dumps(max(0, phase_end - time.time())).encode('utf-8') + b'\n}'
+    
+    def _summarize(self, game_id: str, game: Dict, player_id: str = None) -> Dict:
+        """Summary of a loaded game as ``player_id`` may see it, without time_remaining."""
         # Public information
         summary = {
             'game_id': game_id,
@@ -341,8 +276,8 @@ class GameLogic:
             'ended': game['ended'],
             'winner': game.get('winner'),
             'players': [],
-            'alive_count': 0,
-            'dead_count': 0
+            'alive_count': alive_count(game),
+            'dead_count': dead_count(game)
         }
         
         # Player information (role hidden unless game ended or it's the player themselves)
@@ -358,20 +293,13 @@ class GameLogic:
                 player_info['role'] = player['role']
             
             summary['players'].append(player_info)
-            
-            if player['alive']:
-                summary['alive_count'] += 1
-            else:
-                summary['dead_count'] += 1
         
         # Add phase timing if available
         if game.get('phase_end'):
             summary['phase_end'] = game['phase_end']
-            summary['time_remaining'] = max(0, game['phase_end'] - time.time()) if game['phase_end'] else None
         
         # Add recent chat (last 10 messages during day phase)
         if game['phase'] == 'day' and game['chat']:
             summary['recent_chat'] = game['chat'][-10:]
         
         return summary
-    
@@ -1,22 +1,77 @@
-import json
 import threading
 import time
 import uuid
 import os
 import logging
-import mmap
-import pickle
-from multiprocessing import Lock as ProcessLock, shared_memory
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any, Callable, Iterable, Set, Tuple
+from game import events, rules
+from game.codec import encode_game, decode_game, peek_header, peek_alive
+from game.chat_archive import ChatArchive
+from game.event_log import GameEventLog
+from game.game_archive import GameArchive
+from game.game_index import GameIndex
+from game.journal import GameJournal, apply_entry, iter_snapshot, read_snapshot_game
+from game.storage import create_storage
+
+class GameUnitOfWork:
+    """
+    A game loaded once for the length of a request or timer tick.
+    
+    Logic changes ``game`` by emitting events (see events.py), which are
+    applied right away and logged with the commit; GameStateManager.run then
+    commits everything in one write. Changing ``game`` directly and setting
+    ``changed`` also commits, but leaves a gap replay can't cross.
+    ``on_commit`` callbacks (work outside the record, like archiving chat)
+    only run once that write has succeeded.
+    """
+    __slots__ = ('game_id', 'game', 'version', 'changed', 'events', 'after_commit')
+    
+    def __init__(self, game_id: str, game: Dict, version: int):
+        self.game_id = game_id
+        self.game = game
+        self.version = version
+        self.changed = False
+        self.events: List[Dict] = []
+        self.after_commit: List[Callable[[], Any]] = []
+    
+    def emit(self, event: Dict) -> Any:
+        """Apply an event to the game and return the rule's result."""
+        result = events.apply_event(self.game, event)
+        self.events.append(event)
+        self.changed = True
+        return result
+    
+    def on_commit(self, callback: Callable[[], Any]):
+        self.after_commit.append(callback)
+
 
 class GameStateManager:
     """
     Thread-safe singleton class for managing game states with shared memory for multiprocess support.
+    Each game is stored and locked individually so games never wait on each other.
     """
     _instance = None
     _lock = threading.Lock()
     _shared_memory_name = "werewolf_game_state"
     _shared_memory_size = 1024 * 1024 * 10  # 10MB shared memory
+    _shared_memory_max_games = 4096  # Directory slots in shared memory
+    _storage_backend = 'shared_memory'  # 'shared_memory', 'sqlite' or 'remote' (state service)
+    _sqlite_path = 'game_states.db'
+    _state_service_address = ('127.0.0.1', 7000)
+    _state_service_secret = os.environ.get('STATE_SERVICE_SECRET')  # Needed when the service isn't on loopback
+    _journal_fsync_policy = 'interval'  # 'always', 'interval' or 'never'
+    _journal_fsync_interval = 1.0  # Seconds between fsyncs for 'interval'
+    _journal_compact_threshold = 1000  # Journal entries before snapshot compaction
+    _flush_interval = 1.0  # Max seconds a mutation waits before the flusher writes it to disk
+    _max_update_retries = 20  # Optimistic update attempts before giving up on a contended game
+    _chat_buffer_size = 50  # Recent messages kept in the game record, older ones are archived
+    _chat_rate_limit = 3  # Messages a player may send per window (token bucket capacity)
+    _chat_rate_window = 60.0  # Seconds for a player's bucket to refill completely
+    _phase_grace = 3.0  # Seconds a phase runs on once everyone it waits on has acted (None: full length)
+    _reap_interval = 60.0  # Seconds between reaper passes
+    _ended_game_ttl = 600.0  # Seconds an ended game stays hot before it's archived
+    _idle_lobby_ttl = 3600.0  # Seconds an unstarted lobby may sit untouched before it's archived
+    _max_game_age_hours = 24  # Games older than this are archived whatever their state
     
     def __new__(cls):
         if cls._instance is None:
@@ -27,150 +82,249 @@ class GameStateManager:
     
     def __init__(self):
         if not hasattr(self, 'initialized'):
-            self.games: Dict[str, Dict] = {}
             self.file_path = 'game_states.json'
             self.file_lock = threading.Lock()
-            self.games_lock = threading.Lock()
-            self.process_lock = ProcessLock()  # For multiprocess synchronization
-            self.shared_mem = None
-            self._init_shared_memory()
-            self.load_from_shared_memory()
+            self.journal = GameJournal(
+                self.file_path,
+                fsync_policy=self._journal_fsync_policy,
+                fsync_interval=self._journal_fsync_interval,
+                compact_threshold=self._journal_compact_threshold
+            )
+            # Events of every commit, written as it happens, for replay on top of the journal
+            self.event_log = GameEventLog(
+                self.file_path + '.events',
+                fsync_policy=self._journal_fsync_policy,
+                fsync_interval=self._journal_fsync_interval
+            )
+            self.chat_archive = ChatArchive('chat_archive')
+            # Called with (game ID, phase, new phase_end) when a phase is cut short
+            self.phase_listeners: List[Callable[[str, str, float], Any]] = []
+            self.archive = GameArchive('game_archive')
+            self.dirty_games: Set[str] = set()
+            self.dirty_since: Optional[float] = None
+            self.dirty_lock = threading.Lock()
+            self.flush_event = threading.Event()
+            self.flusher_stop = threading.Event()
+            # Per-game records (in shared memory by default), each behind its own cross-process lock
+            self.store = create_storage(
+                self._storage_backend,
+                name=self._shared_memory_name,
+                size=self._shared_memory_size,
+                max_games=self._shared_memory_max_games,
+                path=self._sqlite_path,
+                address=self._state_service_address,
+                secret=self._state_service_secret
+            )
+            # Lifecycle indexes so listings and sweeps only visit relevant games
+            self.index = GameIndex()
+            # Ended games still waiting to be loaded from the snapshot: game ID -> byte span
+            self.pending_games: Dict[str, Tuple[int, int]] = {}
+            self.pending_lock = threading.Lock()
+            self.snapshot_file = None
+            if self.store.created:
+                self.load_from_file()
+            self.index.rebuild(self.store.headers())
+            self._start_flusher()
+            self._start_reaper()
             self.initialized = True
     
-    def _init_shared_memory(self):
-        """Initialize shared memory for multiprocess communication."""
-        try:
-            # Try to connect to existing shared memory
-            self.shared_mem = shared_memory.SharedMemory(name=self._shared_memory_name)
-            logging.info("Connected to existing shared memory")
-        except FileNotFoundError:
-            # Create new shared memory if it doesn't exist
-            try:
-                self.shared_mem = shared_memory.SharedMemory(
-                    name=self._shared_memory_name, 
-                    create=True, 
-                    size=self._shared_memory_size
-                )
-                # Initialize with empty data
-                self._write_to_shared_memory({})
-                logging.info("Created new shared memory")
-            except Exception as e:
-                logging.error(f"Failed to create shared memory: {e}")
-                # Fallback to file-based storage
-                self.shared_mem = None
-        except Exception as e:
-            logging.error(f"Failed to connect to shared memory: {e}")
-            # Fallback to file-based storage
-            self.shared_mem = None
+    def _read_game(self, game_id: str) -> Optional[Dict]:
+        """Decode a game's record. Caller holds the game's lock."""
+        record = self.store.read(game_id)
+        if record is None:
+            return None
+        return decode_game(record[1])
     
-    def _write_to_shared_memory(self, data: Dict):
-        """Write data to shared memory."""
-        if not self.shared_mem:
-            return False
+    def _start_flusher(self):
+        """Start the write-behind thread that persists dirty games to the journal."""
+        self.flusher_pid = os.getpid()
+        self.flusher = threading.Thread(target=self._flusher_loop, name='game-state-flusher', daemon=True)
+        self.flusher.start()
+    
+    def mark_dirty(self, game_id: Optional[str] = None):
+        """Queue a game (or every game when no ID is given) for the next flush."""
+        with self.dirty_lock:
+            if game_id is None:
+                self.dirty_games.update(self.store.game_ids())
+            else:
+                self.dirty_games.add(game_id)
+            if self.dirty_since is None:
+                self.dirty_since = time.time()
         
-        try:
-            # Serialize data using pickle
-            serialized_data = pickle.dumps(data)
-            data_size = len(serialized_data)
+        if os.getpid() != self.flusher_pid:
+            # Forked children don't inherit the flusher thread, write through instead
+            self.flush()
+            return
+        
+        self.flush_event.set()
+    
+    def _flusher_loop(self):
+        """
+        Coalesce mutations and write them out once per flush interval.
+        A mutation is on disk at most _flush_interval seconds (plus the
+        write itself) after it was made.
+        """
+        while not self.flusher_stop.is_set():
+            self.flush_event.wait()
             
-            if data_size > self._shared_memory_size - 8:  # Reserve 8 bytes for size header
-                logging.error(f"Data too large for shared memory: {data_size} bytes")
-                return False
+            with self.dirty_lock:
+                dirty_since = self.dirty_since
             
-            # Write size header (first 8 bytes) then data
-            self.shared_mem.buf[:8] = data_size.to_bytes(8, byteorder='little')
-            self.shared_mem.buf[8:8 + data_size] = serialized_data
+            # Let the burst that started at dirty_since accumulate before writing
+            if dirty_since is not None:
+                delay = dirty_since + self._flush_interval - time.time()
+                if delay > 0:
+                    self.flusher_stop.wait(delay)
             
-            return True
-        except Exception as e:
-            logging.error(f"Error writing to shared memory: {e}")
-            return False
+            self.flush()
     
-    def _read_from_shared_memory(self) -> Dict:
-        """Read data from shared memory."""
-        if not self.shared_mem:
-            return {}
+    def flush(self) -> int:
+        """Write all dirty games to the journal now. Returns how many were written."""
+        with self.dirty_lock:
+            dirty = self.dirty_games
+            self.dirty_games = set()
+            self.dirty_since = None
+            self.flush_event.clear()
         
-        try:
-            # Read size header (first 8 bytes)
-            data_size = int.from_bytes(self.shared_mem.buf[:8], byteorder='little')
-            
-            if data_size == 0:
-                return {}
-            
-            if data_size > self._shared_memory_size - 8:
-                logging.error(f"Invalid data size in shared memory: {data_size}")
-                return {}
+        if not dirty:
+            return 0
+        
+        if not self.save_to_file(dirty):
+            # Keep them queued so the next interval retries
+            with self.dirty_lock:
+                self.dirty_games.update(dirty)
+                if self.dirty_since is None:
+                    self.dirty_since = time.time()
+            return 0
+        
+        return len(dirty)
+    
+    def shutdown_flusher(self):
+        """Stop the flusher and reaper threads, flush outstanding changes and close the journal."""
+        self.reaper_stop.set()
+        self.flusher_stop.set()
+        self.flush_event.set()
+        if self.flusher.is_alive() and self.flusher is not threading.current_thread():
+            self.flusher.join(timeout=5)
+        
+        self.flush()
+        with self.file_lock:
+            try:
+                self.journal.close()
+                self.event_log.close()
+            except Exception as e:
+                logging.error(f"Error closing journal: {e}")
+    
+    def create_game(self, game_id: Optional[str] = None, created_at: Optional[float] = None) -> str:
+        """Create a new game and return its ID (``game_id``/``created_at`` are for replaying recorded games)."""
+        game_id = game_id or str(uuid.uuid4())[:8]  # Short ID for easier use
+        created_at = created_at or time.time()
+        game = rules.new_game(created_at)
+        
+        data = encode_game(game)
+        with self.store.lock(game_id):
+            stored = self.store.write(game_id, data, game['version'])
+        if not stored:
+            raise RuntimeError('No room left to store the game')
+        
+        self.index.update(game_id, peek_header(data))
+        self.event_log.append(game_id, game['version'], created_at, [events.created(created_at)])
+        self.mark_dirty(game_id)
+        return game_id
+    
+    def run(self, game_id: str, work: Callable[[GameUnitOfWork], Any], default: Any = None) -> Any:
+        """
+        Run ``work`` against a game loaded once, then commit its changes once.
+        
+        The game is read at version V and ``work`` runs without holding its
+        lock; if it set ``changed`` the result is committed only if the game
+        is still at version V, otherwise the load and ``work`` are retried
+        on the newer state. Returns what ``work`` returned, or ``default`` if
+        the game doesn't exist or the commit kept failing.
+        """
+        for attempt in range(self._max_update_retries):
+            with self.store.lock(game_id, shared=True):
+                record = self.store.read(game_id)
+            if record is None:
+                record = self._rehydrate(game_id)
+                if record is None:
+                    return default
             
-            # Read serialized data
-            serialized_data = bytes(self.shared_mem.buf[8:8 + data_size])
-            return pickle.loads(serialized_data)
+            version, data = record
+            uow = GameUnitOfWork(game_id, decode_game(data), version)
+            result = work(uow)
+            if not uow.changed:
+                return result
             
-        except Exception as e:
-            logging.error(f"Error reading from shared memory: {e}")
-            return {}
-    
-    def load_from_shared_memory(self):
-        """Load game states from shared memory, with file fallback."""
-        with self.process_lock:
-            if self.shared_mem:
-                shared_data = self._read_from_shared_memory()
-                if shared_data:
-                    with self.games_lock:
-                        self.games = shared_data
-                    return
+            game = uow.game
+            game['version'] = version + 1
+            game['updated_at'] = time.time()
+            data = encode_game(game)
             
-            # Fallback to file loading
-            self.load_from_file()
+            # Only the compare-and-swap itself runs under the exclusive lock
+            if not self.store.compare_and_swap(game_id, version, data, version + 1):
+                if self.store.version(game_id) == version:
+                    # Nobody committed in between, the write itself failed
+                    return default
+                # Someone committed in between, retry on their version
+                continue
             
-            # If we loaded from file and have shared memory, sync it
-            if self.shared_mem and self.games:
-                self._write_to_shared_memory(self.games)
-    
-    def save_to_shared_memory(self):
-        """Save game states to shared memory and file backup."""
-        with self.process_lock:
-            # Save to shared memory
-            if self.shared_mem:
-                self._write_to_shared_memory(self.games)
+            self._committed(uow, data)
+            return result
+        
+        logging.error(f"Giving up update of game {game_id} after {self._max_update_retries} conflicts")
+        return default
+    
+    def run_many(self, game_ids: List[str], work: Callable[[GameUnitOfWork], Any]) -> Dict[str, Any]:
+        """
+        ``run`` for a batch of games: one read of all of them, ``work`` on
+        each, then one batched commit of every game it changed. Games whose
+        commit lost a race are retried on their own through ``run``.
+        Returns ``work``'s result per game; missing games are left out.
+        """
+        records = self.store.read_many(game_ids)
+        results = {}
+        units = []
+        swaps = []
+        now = time.time()
+        for game_id in game_ids:
+            record = records.get(game_id) or self._rehydrate(game_id)
+            if record is None:
+                continue
             
-            # Also save to file as backup
-            self.save_to_file()
-    
-    def create_game(self) -> str:
-        """Create a new game and return its ID."""
-        self.load_from_shared_memory()
-        game_id = str(uuid.uuid4())[:8]  # Short ID for easier use
-        
-        with self.games_lock:
-            self.games[game_id] = {
-                'phase': 'setup',
-                'phase_end': None,
-                'players': {},
-                'actions': {
-                    'werewolf_votes': {},
-                    'seer_target': None,
-                    'day_votes': {}
-                },
-                'seer_history': [],
-                'chat': [],
-                'created_at': time.time(),
-                'started': False,
-                'ended': False,
-                'winner': None
-            }
-        
-        self.save_to_shared_memory()
-        return game_id
+            version, data = record
+            uow = GameUnitOfWork(game_id, decode_game(data), version)
+            results[game_id] = work(uow)
+            if uow.changed:
+                uow.game['version'] = version + 1
+                uow.game['updated_at'] = now
+                units.append(uow)
+                swaps.append((game_id, version, encode_game(uow.game), version + 1))
+        
+        committed = self.store.compare_and_swap_many(swaps) if swaps else []
+        for uow, (game_id, _, data, _), ok in zip(units, swaps, committed):
+            if ok:
+                self._committed(uow, data)
+            else:
+                results[game_id] = self.run(game_id, work)
+        return results
+    
+    def _committed(self, uow: GameUnitOfWork, data: bytes):
+        """Bookkeeping after a unit of work's write went through."""
+        self.index.update(uow.game_id, peek_header(data))
+        if uow.events:
+            self.event_log.append(uow.game_id, uow.game['version'], uow.game['updated_at'], uow.events)
+        # The file backup is written behind by the flusher thread
+        self.mark_dirty(uow.game_id)
+        for callback in uow.after_commit:
+            callback()
     
     def add_player(self, game_id: str, name: str) -> Optional[str]:
         """Add a player to the game and return their player ID."""
-        self.load_from_shared_memory()  # Ensure we have the latest game state
-        if game_id not in self.games:
-            return None
+        player_id = str(uuid.uuid4())[:8]
         
-        with self.games_lock:
-            game = self.games[game_id]
+        def join(uow):
+            game = uow.game
             if game['started'] or game['ended']:
                 return None
             
@@ -179,193 +333,475 @@ class GameStateManager:
                 if player['name'] == name:
                     return None
             
-            player_id = str(uuid.uuid4())[:8]
-            game['players'][player_id] = {
-                'name': name,
-                'role': None,
-                'alive': True,
-                'vote': None,
-                'joined_at': time.time()
-            }
-        
-        self.save_to_shared_memory()
-        return player_id
+            uow.emit(events.joined(player_id, name, time.time()))
+            return player_id
+        
+        return self.run(game_id, join)
     
     def get_game_state(self, game_id: str) -> Optional[Dict]:
         """Get the current state of a game."""
-        self.load_from_shared_memory()  # Ensure we have the latest game state
-        with self.games_lock:
-            return self.games.get(game_id, None)
+        with self.store.lock(game_id, shared=True):
+            game = self._read_game(game_id)
+        if game is None:
+            record = self._rehydrate(game_id)
+            return decode_game(record[1]) if record else None
+        return game
+    
+    def get_game_header(self, game_id: str) -> Optional[Dict]:
+        """
+        Get a game's phase, phase_end, started/ended flags, winner and version
+        without decoding the rest of the record.
+        """
+        return self.store.header(game_id)
+    
+    def get_game_version(self, game_id: str) -> Optional[int]:
+        """Current version of a game, or None if it isn't in the store."""
+        return self.store.version(game_id)
+    
+    def get_alive_flags(self, game_id: str) -> Optional[Dict[str, bool]]:
+        """Get each player's alive flag without decoding the rest of the record."""
+        with self.store.lock(game_id, shared=True):
+            record = self.store.read(game_id)
+        return peek_alive(record[1]) if record else None
     
     def update_game_state(self, game_id: str, updates: Dict) -> bool:
         """Update game state with given updates."""
-        self.load_from_shared_memory()
-        if game_id not in self.games:
-            return False
-        
-        with self.games_lock:
+        def apply(uow):
+            game = uow.game
             for key, value in updates.items():
-                if key in self.games[game_id]:
-                    if isinstance(value, dict) and isinstance(self.games[game_id][key], dict):
+                if key in game:
+                    if isinstance(value, dict) and isinstance(game[key], dict):
                         logging.warning("Updating existing key: %s in game %s with value %s", key, game_id, value)
-                        self.games[game_id][key].update(value)
                     else:
                         logging.warning("Setting key: %s in game %s to value %s", key, game_id, value)
-                        self.games[game_id][key] = value
-
-        logging.warning(f'{self.games[game_id]}, {game_id}, {updates}')
+            
+            uow.emit(events.state_updated(updates))
+            logging.warning(f'{game}, {game_id}, {updates}')
+            return True
         
-        self.save_to_shared_memory()
-        return True
+        return bool(self.run(game_id, apply))
     
     def record_action(self, game_id: str, action_type: str, player_id: str, target_id: str = None, data: Any = None) -> bool:
         """Record a player action."""
-        self.load_from_shared_memory()
-        if game_id not in self.games:
+        return bool(self.run(game_id, lambda uow: self.cast_vote(uow, action_type, player_id, target_id)))
+    
+    def cast_vote(self, uow: GameUnitOfWork, action_type: str, player_id: str, target_id: str = None) -> bool:
+        """
+        Record a vote or investigation in a loaded game. The action that
+        completes the phase (see rules.all_acted) moves its end up to
+        _phase_grace seconds away; phase_listeners hear of it once committed.
+        """
+        recorded = uow.emit(events.vote_cast(action_type, player_id, target_id))
+        game = uow.game
+        if self._phase_grace is None or not game['phase_end'] or not rules.all_acted(game):
+            return recorded
+        
+        # Changing a vote afterwards doesn't push the end back
+        phase_end = time.time() + self._phase_grace
+        if phase_end < game['phase_end']:
+            phase = game['phase']
+            uow.emit(events.phase_shortened(phase_end))
+            uow.on_commit(lambda: self._phase_shortened(uow.game_id, phase, phase_end))
+        return recorded
+    
+    def _phase_shortened(self, game_id: str, phase: str, phase_end: float):
+        for listener in self.phase_listeners:
+            try:
+                listener(game_id, phase, phase_end)
+            except Exception as e:
+                logging.error(f"Phase listener failed for game {game_id}: {e}")
+    
+    def post_chat_message(self, uow: GameUnitOfWork, player_id: str, message: str) -> bool:
+        """Add a chat message to a loaded game, unless it's empty or the player is rate limited."""
+        # Sanitize message
+        sanitized_message = message.strip()[:200]  # Max 200 chars
+        if not sanitized_message:
             return False
         
-        with self.games_lock:
-            game = self.games[game_id]
-            
-            if action_type == 'werewolf_vote':
-                if target_id not in game['actions']['werewolf_votes']:
-                    game['actions']['werewolf_votes'][target_id] = 0
-                game['actions']['werewolf_votes'][target_id] += 1
-                
-            elif action_type == 'seer_investigate':
-                game['actions']['seer_target'] = target_id
-                
-            elif action_type == 'day_vote':
-                # Clear previous vote
-                for target, votes in game['actions']['day_votes'].items():
-                    if player_id in votes:
-                        votes.remove(player_id)
-                        if not votes:
-                            del game['actions']['day_votes'][target]
-                        break
-                
-                # Add new vote
-                if target_id not in game['actions']['day_votes']:
-                    game['actions']['day_votes'][target_id] = []
-                game['actions']['day_votes'][target_id].append(player_id)
-                
-                # Update player vote
-                game['players'][player_id]['vote'] = target_id
+        # Rate limiting: token bucket per player, refilled continuously
+        game = uow.game
+        current_time = time.time()
+        buckets = game.setdefault('chat_buckets', {})
+        tokens, updated = buckets.get(player_id, (self._chat_rate_limit, current_time))
+        refill = (current_time - updated) * self._chat_rate_limit / self._chat_rate_window
+        tokens = min(self._chat_rate_limit, tokens + refill)
+        
+        if tokens < 1:
+            return False
         
-        self.save_to_shared_memory()
+        # Keep the record bounded; evicted messages go to the archive once committed
+        evict = max(0, len(game['chat']) + 1 - self._chat_buffer_size)
+        evicted = uow.emit(events.chat_posted(player_id, sanitized_message, current_time, tokens - 1, evict))
+        if evicted:
+            uow.on_commit(lambda: self._archive_chat(uow.game_id, evicted))
         return True
     
+    def _archive_chat(self, game_id: str, messages: list):
+        try:
+            self.chat_archive.append(game_id, messages)
+        except OSError as e:
+            logging.error(f"Failed to archive chat for game {game_id}: {e}")
+    
     def add_chat_message(self, game_id: str, player_id: str, message: str) -> bool:
         """Add a chat message to the game."""
-        self.load_from_shared_memory()
-        if game_id not in self.games:
-            return False
+        return self.run(game_id, lambda uow: self.post_chat_message(uow, player_id, message), False)
+    
+    def get_chat_history(self, game_id: str, since_seq: int = 0) -> Optional[list]:
+        """
+        Chat messages with a sequence number >= ``since_seq``, oldest first.
+        Reads the archive only when the request reaches past the buffered messages.
+        """
+        game = self.get_game_state(game_id)
+        if game is None:
+            return None
         
-        with self.games_lock:
-            game = self.games[game_id]
-            
-            # Rate limiting: max 3 messages per player per minute
-            current_time = time.time()
-            recent_messages = [
-                msg for msg in game['chat']
-                if msg['player'] == player_id and (current_time - msg['time']) < 60
-            ]
-            
-            if len(recent_messages) >= 3:
-                return False
-            
-            # Sanitize message
-            sanitized_message = message.strip()[:200]  # Max 200 chars
-            if not sanitized_message:
-                return False
-            
-            game['chat'].append({
-                'player': player_id,
-                'message': sanitized_message,
-                'time': current_time
-            })
+        chat = game['chat']
+        first_seq = game.get('chat_seq', len(chat)) - len(chat)
+        # Buffered messages have consecutive sequence numbers, so the index is arithmetic
+        recent = chat[max(0, since_seq - first_seq):]
+        if since_seq >= first_seq:
+            return recent
         
-        self.save_to_shared_memory()
-        return True
+        archived = [msg for msg in self.chat_archive.read(game_id, since_seq) if msg['seq'] < first_seq]
+        return archived + recent
     
-    def save_to_file(self):
-        """Save game states to file with atomic write."""
+    def save_to_file(self, game_ids: Iterable[str]) -> bool:
+        """
+        Append the given games' current state to the journal in one batch,
+        compacting it into the snapshot file when due.
+        """
+        puts = {}
+        deletes = []
+        for gid in game_ids:
+            with self.store.lock(gid, shared=True):
+                game = self._read_game(gid)
+            if game is None:
+                deletes.append(gid)
+            else:
+                game.pop('role_players', None)  # Derived from the player rows
+                puts[gid] = game
+        
         with self.file_lock:
-            temp_file = self.file_path + '.tmp'
             try:
-                with open(temp_file, 'w') as f:
-                    json.dump(self.games, f, indent=2)
+                self.journal.write_batch(puts, deletes)
+                
+                if self.journal.needs_compaction():
+                    self.journal.compact()
+                    self._compact_event_log()
                 
-                # Atomic move
-                if os.name == 'nt':  # Windows
-                    if os.path.exists(self.file_path):
-                        os.remove(self.file_path)
-                    os.rename(temp_file, self.file_path)
-                else:  # Unix
-                    os.rename(temp_file, self.file_path)
-                    
+                return True
             except Exception as e:
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
                 print(f"Error saving game state: {e}")
+                return False
+    
+    def _compact_event_log(self):
+        """Drop logged commits the snapshot just written already covers."""
+        versions = self.journal.snapshot_versions
+        exists = {}
+        
+        def needed(game_id, version):
+            if game_id in versions:
+                return version > versions[game_id]
+            # Created since the snapshot was taken, or archived
+            if game_id not in exists:
+                exists[game_id] = self.store.version(game_id) is not None
+            return exists[game_id]
+        
+        self.event_log.compact(needed)
     
     def load_from_file(self):
-        """Load game states from file."""
+        """
+        Seed the store from the snapshot file, the journal and the event log.
+        
+        The snapshot is streamed one game at a time, so only one game is in
+        memory at once. Each game is brought up to date with the journal
+        tail, then with logged commits the write-behind journal hadn't caught
+        up with yet. Live games are stored before this returns; ended games
+        are only located, then loaded by a background thread (or on first
+        access, see _load_pending).
+        """
+        started = time.time()
         with self.file_lock:
-            if os.path.exists(self.file_path):
-                try:
-                    with open(self.file_path, 'r') as f:
-                        loaded_games = json.load(f)
-                    
-                    with self.games_lock:
-                        self.games = loaded_games
-                        
-                except Exception as e:
-                    print(f"Error loading game state: {e}")
-                    self.games = {}
+            try:
+                tail = self.journal.read_tail()
+                commits = self.event_log.read_all()
+                snapshot = self.journal.open_snapshot()
+            except Exception as e:
+                print(f"Error loading game state: {e}")
+                return
+        
+        loaded = 0
+        replayed = 0
+        recovered = set()
+        pending = {}
+        
+        def catch_up(game_id, game):
+            nonlocal replayed
+            game, applied = events.replay(game, commits.pop(game_id, ()))
+            if applied:
+                replayed += applied
+                recovered.add(game_id)
+            return game
+        
+        if snapshot is not None:
+            try:
+                for game_id, game, offset, length in iter_snapshot(snapshot):
+                    if game_id in tail:
+                        # Changed since the snapshot; the journal has the newer state
+                        for entry in tail.pop(game_id):
+                            game = apply_entry(game, entry)
+                        if game is None:
+                            # Deleted since; its commits mustn't bring it back
+                            commits.pop(game_id, None)
+                        else:
+                            self._load_game(game_id, catch_up(game_id, game))
+                            loaded += 1
+                    elif game.get('ended'):
+                        # Nothing happens to an ended game, so there are no commits to replay
+                        commits.pop(game_id, None)
+                        pending[game_id] = (offset, length)
+                    else:
+                        self._load_game(game_id, catch_up(game_id, game))
+                        loaded += 1
+            except Exception as e:
+                print(f"Error loading game state: {e}")
+        
+        # Games created after the snapshot only exist in the journal
+        for game_id, entries in tail.items():
+            game = None
+            for entry in entries:
+                game = apply_entry(game, entry)
+            if game is None:
+                commits.pop(game_id, None)
             else:
-                self.games = {}
+                self._load_game(game_id, catch_up(game_id, game))
+                loaded += 1
+        
+        # ...or, if they were created just before a crash, only in the event log
+        for game_id in list(commits):
+            game = catch_up(game_id, None)
+            if game is not None:
+                self._load_game(game_id, game)
+                loaded += 1
+        
+        print(f"Loaded {loaded} games from {self.file_path} in {time.time() - started:.2f}s "
+              f"({replayed} commits replayed from the event log), "
+              f"{len(pending)} ended games loading in the background")
+        if recovered:
+            # Write the replayed commits to the journal so the event log can be compacted
+            with self.dirty_lock:
+                self.dirty_games.update(recovered)
+                self.dirty_since = time.time()
+        if not pending:
+            if snapshot is not None:
+                snapshot.close()
+            return
+        
+        with self.pending_lock:
+            self.pending_games = pending
+            self.snapshot_file = snapshot
+        threading.Thread(target=self._load_pending_games, name='game-state-loader', daemon=True).start()
+    
+    def _load_game(self, game_id: str, game: Dict) -> Optional[tuple]:
+        """Store a game read from disk unless the store already has it. Returns (version, data)."""
+        data = encode_game(game)
+        with self.store.lock(game_id):
+            record = self.store.read(game_id)
+            if record is None:
+                record = (game.get('version', 0), data)
+                if not self.store.write(game_id, data, record[0]):
+                    logging.error(f"No room to load game {game_id}")
+                    return None
+        self.index.update(game_id, peek_header(record[1]))
+        return record
     
-    def get_all_games(self) -> Dict[str, Dict]:
-        """Get all games (for debugging/admin purposes)."""
-        self.load_from_shared_memory()
-        with self.games_lock:
-            return dict(self.games)
+    def _load_pending(self, game_id: str) -> Optional[tuple]:
+        """Load one ended game still waiting in the snapshot. Returns (version, data)."""
+        # Held while storing, so nobody sees the game gone from both places
+        with self.pending_lock:
+            span = self.pending_games.pop(game_id, None)
+            if span is None:
+                return None
+            return self._load_game(game_id, read_snapshot_game(self.snapshot_file, *span))
+    
+    def _load_pending_games(self):
+        started = time.time()
+        loaded = 0
+        for game_id in list(self.pending_games):
+            try:
+                if self._load_pending(game_id) is not None:
+                    loaded += 1
+            except Exception as e:
+                logging.error(f"Failed to load game {game_id} from the snapshot: {e}")
+        
+        with self.pending_lock:
+            if self.snapshot_file is not None:
+                self.snapshot_file.close()
+                self.snapshot_file = None
+        print(f"Loaded {loaded} ended games in the background in {time.time() - started:.2f}s")
+    
+    def find_games(self, state: str = 'all', phase: Optional[str] = None) -> List[str]:
+        """
+        IDs of games in a lifecycle state: 'live', 'ended', 'lobby' (still
+        accepting players) or 'all', optionally narrowed to one phase.
+        Served from the indexes, so the cost follows the size of the answer.
+        """
+        if state == 'live':
+            game_ids = self.index.live_games(phase)
+        elif state == 'ended':
+            game_ids = self.index.ended_games()
+        elif state == 'lobby':
+            game_ids = self.index.lobbies()
+        elif state == 'all':
+            game_ids = self.index.live_games() | self.index.ended_games()
+        else:
+            raise ValueError(f"Unknown game state: {state}")
+        
+        if phase is not None and state != 'live':
+            headers = {gid: self.index.header(gid) for gid in game_ids}
+            game_ids = {gid for gid, header in headers.items() if header and header['phase'] == phase}
+        return sorted(game_ids)
+    
+    def get_phase_deadlines(self, until: Optional[float] = None) -> List[Tuple[float, str]]:
+        """(phase_end, game ID) of live games whose phase ends by ``until``, earliest first."""
+        return self.index.deadlines_until(until)
+    
+    def get_all_games(self, state: str = 'all', phase: Optional[str] = None) -> Dict[str, Dict]:
+        """Get all games, or those matching ``state``/``phase`` (for debugging/admin purposes)."""
+        games = {}
+        for game_id in self.find_games(state, phase):
+            # Read directly so listing never rehydrates a game archived meanwhile
+            with self.store.lock(game_id, shared=True):
+                game = self._read_game(game_id)
+            if game is not None:
+                games[game_id] = game
+        return games
     
     def cleanup_old_games(self, max_age_hours: int = 24):
-        """Remove games older than specified hours."""
-        self.load_from_shared_memory()
+        """Archive games older than specified hours."""
         current_time = time.time()
         cutoff_time = current_time - (max_age_hours * 3600)
         
-        with self.games_lock:
-            games_to_remove = [
-                game_id for game_id, game in self.games.items()
-                if game.get('created_at', 0) < cutoff_time
-            ]
+        removed = 0
+        for game_id in self.index.created_before(cutoff_time):
+            if self.archive_game(game_id):
+                removed += 1
+        
+        return removed
+    
+    def archive_game(self, game_id: str, expected_version: Optional[int] = None) -> bool:
+        """
+        Move a game from shared memory to the compressed on-disk archive.
+        With ``expected_version`` the game is only archived if it hasn't
+        changed since the caller looked at it.
+        """
+        with self.store.lock(game_id):
+            record = self.store.read(game_id)
+            if record is None:
+                # Already archived or deleted, possibly by another process
+                self.index.remove(game_id)
+                return False
+            if expected_version is not None and record[0] != expected_version:
+                return False
             
-            for game_id in games_to_remove:
-                del self.games[game_id]
+            # Archive before deleting so the game exists somewhere at all times
+            try:
+                self.archive.put(game_id, decode_game(record[1]))
+            except Exception as e:
+                logging.error(f"Failed to archive game {game_id}: {e}")
+                return False
+            self.store.delete(game_id)
         
-        if games_to_remove:
-            self.save_to_shared_memory()
+        self.index.remove(game_id)
+        # Drops the game from the journal and snapshot too
+        self.mark_dirty(game_id)
+        logging.info(f"Archived game {game_id}")
+        return True
+    
+    def _rehydrate(self, game_id: str) -> Optional[tuple]:
+        """Bring an archived game back into shared memory. Returns (version, data)."""
+        if game_id in self.pending_games:
+            record = self._load_pending(game_id)
+            if record is None:
+                # The background loader stored it first
+                with self.store.lock(game_id, shared=True):
+                    record = self.store.read(game_id)
+            return record
+        if not self.archive.contains(game_id):
+            return None
         
-        return len(games_to_remove)
+        with self.store.lock(game_id):
+            record = self.store.read(game_id)
+            if record is not None:
+                # Another thread or process got there first
+                return record
+            
+            game = self.archive.get(game_id)
+            if game is None:
+                return None
+            
+            # Counts as activity, so the reaper doesn't evict it again straight away
+            game['updated_at'] = time.time()
+            data = encode_game(game)
+            version = game.get('version', 0)
+            if not self.store.write(game_id, data, version):
+                return None
+            self.archive.delete(game_id)
+        
+        self.index.update(game_id, peek_header(data))
+        self.mark_dirty(game_id)
+        logging.info(f"Rehydrated archived game {game_id}")
+        return version, data
     
-    def cleanup_shared_memory(self):
-        """Clean up shared memory resources when shutting down."""
-        if self.shared_mem:
+    def reap_games(self) -> int:
+        """
+        Archive ended games and idle lobbies past their TTL, and anything
+        older than _max_game_age_hours. Returns how many games were archived.
+        """
+        current_time = time.time()
+        archived = 0
+        candidates = [(gid, self._ended_game_ttl) for gid in self.index.ended_games()]
+        candidates += [(gid, self._idle_lobby_ttl) for gid in self.index.lobbies()]
+        for game_id, ttl in candidates:
+            header = self.index.header(game_id)
+            if header is None or current_time - header['updated_at'] < ttl:
+                continue
+            # Skipped if the game changed since it was indexed
+            if self.archive_game(game_id, header['version']):
+                archived += 1
+        
+        archived += self.cleanup_old_games(self._max_game_age_hours)
+        return archived
+    
+    def _start_reaper(self):
+        """Start the background thread that evicts finished and idle games."""
+        self.reaper_stop = threading.Event()
+        self.reaper = threading.Thread(target=self._reaper_loop, name='game-state-reaper', daemon=True)
+        self.reaper.start()
+    
+    def _reaper_loop(self):
+        while not self.reaper_stop.wait(self._reap_interval):
             try:
-                self.shared_mem.close()
-                self.shared_mem.unlink()  # Remove the shared memory
-                logging.info("Cleaned up shared memory")
+                # Pick up games created or changed by other processes
+                self.index.rebuild(self.store.headers())
+                archived = self.reap_games()
+                if archived:
+                    logging.info(f"Reaper archived {archived} games")
             except Exception as e:
-                logging.error(f"Error cleaning up shared memory: {e}")
+                logging.error(f"Error reaping games: {e}")
+    
+    def cleanup_shared_memory(self):
+        """Clean up shared memory resources when shutting down."""
+        try:
+            self.store.unlink()  # Remove the shared memory
+            logging.info("Cleaned up shared memory")
+        except Exception as e:
+            logging.error(f"Error cleaning up shared memory: {e}")
     
     def __del__(self):
         """Destructor to clean up resources."""
-        if hasattr(self, 'shared_mem') and self.shared_mem:
+        if hasattr(self, 'store'):
             try:
-                self.shared_mem.close()
+                self.store.close()
             except Exception as e:
                 logging.error(f"Error closing shared memory in destructor: {e}")
@@ -0,0 +1,270 @@
+import json
+import os
+import time
+import logging
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl  # Cross-process file locking (POSIX only)
+except ImportError:
+    fcntl = None
+
+FSYNC_POLICIES = ('always', 'interval', 'never')
+SNAPSHOT_CHUNK = 1024 * 1024  # Bytes read at a time when streaming the snapshot
+
+
+def apply_entry(game: Optional[Dict], entry: Dict) -> Optional[Dict]:
+    """A game's state after one journal entry (None once deleted)."""
+    if entry.get('op') == 'put':
+        # Flushers in different processes may append out of order,
+        # so never let an older version replace a newer one
+        if game is None or entry['game'].get('version', 0) >= game.get('version', 0):
+            return entry['game']
+        return game
+    if entry.get('op') == 'delete':
+        return None
+    return game
+
+
+def iter_snapshot(f: BinaryIO) -> Iterator[Tuple[str, Dict, int, int]]:
+    """
+    Stream a snapshot file (one JSON object of game ID -> game) one game at
+    a time, yielding (game ID, game, offset, length) with the byte span of
+    the game's JSON so it can be read again later with ``read_snapshot_game``.
+
+    The file is scanned as latin-1, which keeps character and byte offsets
+    equal; UTF-8 sequences never contain JSON delimiters, so only games with
+    non-ASCII text need decoding again from their bytes.
+    """
+    decoder = json.JSONDecoder()
+    buf = ''
+    base = 0  # File offset of buf[0]
+    pos = 0
+
+    def fill():
+        nonlocal buf, base, pos
+        chunk = f.read(SNAPSHOT_CHUNK)
+        if not chunk:
+            raise ValueError('Snapshot ends in the middle of a game')
+        # Drop what has been consumed only when reading more, so it's copied once per chunk
+        base += pos
+        buf = buf[pos:] + chunk.decode('latin-1')
+        pos = 0
+
+    def next_char() -> str:
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n':
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            fill()
+
+    def decode():
+        nonlocal pos
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Most likely the value runs past the buffer
+                fill()
+                continue
+            start, pos = pos, end
+            return value, start, end
+
+    f.seek(0)
+    if next_char() != '{':
+        raise ValueError('Snapshot is not a JSON object')
+    pos += 1
+    if next_char() == '}':
+        return
+    while True:
+        next_char()
+        game_id, _, _ = decode()
+        if next_char() != ':':
+            raise ValueError('Malformed snapshot')
+        pos += 1
+        next_char()
+        game, start, end = decode()
+        if not buf[start:end].isascii():
+            game = read_snapshot_game(f, base + start, end - start)
+        yield game_id, game, base + start, end - start
+
+        separator = next_char()
+        pos += 1
+        if separator == '}':
+            return
+        if separator != ',':
+            raise ValueError('Malformed snapshot')
+
+
+def read_snapshot_game(f: BinaryIO, offset: int, length: int) -> Dict:
+    """Read one game from the byte span ``iter_snapshot`` reported for it."""
+    return json.loads(os.pread(f.fileno(), length, offset))
+
+
+class GameJournal:
+    """
+    Append-only journal of per-game mutations backed by a periodic snapshot.
+
+    Every mutation appends one JSON line (``put`` with the game's new state or
+    ``delete``) instead of rewriting the whole state file. Once the journal
+    grows past ``compact_threshold`` entries it is folded into the snapshot.
+    """
+
+    def __init__(self, snapshot_path: str, fsync_policy: str = 'interval',
+                 fsync_interval: float = 1.0, compact_threshold: int = 1000):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+
+        self.snapshot_path = snapshot_path
+        self.journal_path = snapshot_path + '.journal'
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.compact_threshold = compact_threshold
+        self.entries_since_snapshot = 0
+        self.snapshot_versions: Dict[str, int] = {}  # Game versions in the last snapshot written
+        self.last_fsync = time.time()
+        self.fd = None
+
+    def _open(self):
+        """Open the journal for appending if it isn't open already."""
+        if self.fd is None:
+            self.fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        return self.fd
+
+    def _lock(self, fd: int):
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+
+    def _unlock(self, fd: int):
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def _append(self, entries: List[Dict]):
+        """Append entries as one write so concurrent appenders don't interleave."""
+        if not entries:
+            return
+
+        data = ''.join(json.dumps(entry, separators=(',', ':')) + '\n' for entry in entries).encode('utf-8')
+        fd = self._open()
+        self._lock(fd)
+        try:
+            os.write(fd, data)
+            self._maybe_fsync(fd)
+        finally:
+            self._unlock(fd)
+        self.entries_since_snapshot += len(entries)
+
+    def _maybe_fsync(self, fd: int, force: bool = False):
+        """Flush the journal to disk according to the fsync policy."""
+        if self.fsync_policy == 'never' and not force:
+            return
+
+        now = time.time()
+        if force or self.fsync_policy == 'always' or now - self.last_fsync >= self.fsync_interval:
+            os.fsync(fd)
+            self.last_fsync = now
+
+    def write_batch(self, puts: Dict[str, Dict], deletes: Iterable[str] = ()):
+        """Record several game changes with a single write (and at most one fsync)."""
+        entries = [{'op': 'put', 'id': game_id, 'game': game} for game_id, game in puts.items()]
+        entries.extend({'op': 'delete', 'id': game_id} for game_id in deletes)
+        self._append(entries)
+
+    def needs_compaction(self) -> bool:
+        return self.entries_since_snapshot >= self.compact_threshold
+
+    def read_tail(self) -> Dict[str, List[Dict]]:
+        """Journal entries not yet folded into the snapshot, grouped by game in order."""
+        games: Dict[str, List[Dict]] = {}
+        if not os.path.exists(self.journal_path):
+            self.entries_since_snapshot = 0
+            return games
+
+        applied = 0
+        with open(self.journal_path, 'rb') as f:
+            for line_no, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logging.warning("Skipping torn journal entry at line %d", line_no)
+                    continue
+                games.setdefault(entry.get('id'), []).append(entry)
+                applied += 1
+        self.entries_since_snapshot = applied
+        return games
+
+    def open_snapshot(self) -> Optional[BinaryIO]:
+        """
+        Open the snapshot for streaming with ``iter_snapshot``. The handle
+        keeps referring to this snapshot even after compaction replaces it.
+        """
+        if not os.path.exists(self.snapshot_path):
+            return None
+        return open(self.snapshot_path, 'rb')
+
+    def compact(self) -> int:
+        """
+        Fold the journal into a fresh snapshot and truncate it.
+        Reads from disk under the journal lock so entries appended by other
+        processes are never lost. The old snapshot is streamed through one
+        game at a time, so only the journal tail is held in memory. Returns
+        the number of games written.
+        """
+        fd = self._open()
+        self._lock(fd)
+        temp_file = self.snapshot_path + '.tmp'
+        try:
+            tail = self.read_tail()
+            versions: Dict[str, int] = {}
+
+            with open(temp_file, 'w') as f:
+                def write_game(game_id: str, game: Optional[Dict]):
+                    if game is None:
+                        return
+                    f.write(',' if versions else '{')
+                    f.write(json.dumps(game_id) + ':' + json.dumps(game, separators=(',', ':')))
+                    versions[game_id] = game.get('version', 0)
+
+                snapshot = self.open_snapshot()
+                if snapshot is not None:
+                    with snapshot:
+                        for game_id, game, _, _ in iter_snapshot(snapshot):
+                            for entry in tail.pop(game_id, ()):
+                                game = apply_entry(game, entry)
+                            write_game(game_id, game)
+                # Games created since the last snapshot
+                for game_id, entries in tail.items():
+                    game = None
+                    for entry in entries:
+                        game = apply_entry(game, entry)
+                    write_game(game_id, game)
+                f.write('}' if versions else '{}')
+                f.flush()
+                if self.fsync_policy != 'never':
+                    os.fsync(f.fileno())
+
+            # Atomic move
+            os.replace(temp_file, self.snapshot_path)
+            os.ftruncate(fd, 0)
+            self.entries_since_snapshot = 0
+            self.snapshot_versions = versions
+            return len(versions)
+        except Exception:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            raise
+        finally:
+            self._unlock(fd)
+
+    def sync(self):
+        """Force outstanding journal writes to disk."""
+        if self.fd is not None:
+            self._maybe_fsync(self.fd, force=True)
+
+    def close(self):
+        if self.fd is not None:
+            self.sync()
+            os.close(self.fd)
+            self.fd = None
@@ -1,8 +1,14 @@
+import os
+import socket
 import threading
 import time
-from typing import Dict, Optional
+from typing import Dict, Iterable, Optional, Set, Tuple
+from game.codec import peek_header
 from game.game_state import GameStateManager
 from game.game_logic import GameLogic
+from game import events
+from game.scheduler import PhaseScheduler
+from game.timer_metrics import PhaseTimerMetrics
 
 # Phase durations in seconds
 PHASE_DURATIONS = {
@@ -14,13 +20,146 @@ class PhaseTimer:
     """
     Manages background timers for game phases.
     Handles automatic phase transitions and cleanup.
+    
+    Every game's deadline lives in one PhaseScheduler (a single thread over
+    a heap), not a thread per game. ``executor`` picks where expired phases
+    are resolved; by default the scheduler thread does it.
+    
+    With several backend processes on one storage, each game's clock is
+    driven by exactly one of them: the holder of the game's timer lease
+    (GameStorage.claim_timers). A keeper thread heartbeats for this
+    process, drops timers whose lease was lost and takes over the games of
+    processes that stopped heartbeating.
+    
+    A phase whose players have all acted is cut short
+    (GameStateManager.cast_vote); its timer is moved up right away when the
+    action lands here, or on the next keeper pass when another process
+    took it.
+    
+    ``metrics`` records how late each transition commits against its
+    phase_end and where end_phases spends its time (see timer_metrics.py).
     """
     
-    def __init__(self):
+    _batch_window = 0.05  # Seconds; deadlines this close together end in one batch
+    _lease_ttl = 10.0     # Seconds without a heartbeat before other processes take over
+    _late_after = 1.0     # Seconds past phase_end after which a transition counts as a missed deadline
+    
+    def __init__(self, executor=None):
         self.state_manager = GameStateManager()
         self.game_logic = GameLogic()
-        self.active_timers: Dict[str, threading.Timer] = {}
+        self.scheduler = PhaseScheduler(self._timers_expired, executor, self._batch_window,
+                                        on_error=lambda e: self.metrics.error('scheduler', e))
         self.timer_lock = threading.Lock()
+        self.due_phases: Dict[str, str] = {}  # Expired games waiting for the next batch
+        self.batch_lock = threading.Lock()  # Held by the thread resolving a batch
+        self.leased: Set[str] = set()  # Games whose clock this process drives
+        self.keeper_pid = None
+        self.stopping = threading.Event()  # Set on shutdown: nothing is claimed any more
+        self.keeper_lock = threading.Lock()  # Held for a keeper pass
+        self.metrics = PhaseTimerMetrics(self._late_after)
+        self.state_manager.phase_listeners.append(self.phase_shortened)
+    
+    @property
+    def owner(self) -> str:
+        """This process's name as a timer owner (forked children are owners of their own)."""
+        return f"{socket.gethostname()[:20]}:{os.getpid()}"
+    
+    def _claim(self, game_ids: Iterable[str]) -> Set[str]:
+        """Take or renew the timer leases of ``game_ids``. Returns the ones this process holds."""
+        if self.stopping.is_set():
+            return set()
+        game_ids = list(game_ids)
+        held = set(self.state_manager.store.claim_timers(self.owner, game_ids, self._lease_ttl))
+        with self.timer_lock:
+            self.leased.update(held)
+            self.leased.difference_update(set(game_ids) - held)
+        return held
+    
+    def _release(self, game_ids: Iterable[str]):
+        game_ids = list(game_ids)
+        if not game_ids:
+            return
+        with self.timer_lock:
+            self.leased.difference_update(game_ids)
+        self.state_manager.store.release_timers(self.owner, game_ids)
+    
+    def release_timers(self):
+        """
+        Hand every game this process drives back, so others take over at
+        once (on shutdown). The keeper stops first, so it can't claim them
+        again. Safe to call more than once.
+        """
+        self.stopping.set()
+        # A pass already running may still claim and schedule games; let it finish
+        with self.keeper_lock:
+            with self.timer_lock:
+                leased = list(self.leased)
+            for game_id in leased:
+                self.scheduler.cancel(game_id)
+            self._release(leased)
+    
+    def _start_keeper(self):
+        # Forked children don't inherit the thread, start one per process
+        if self.keeper_pid != os.getpid():
+            self.keeper_pid = os.getpid()
+            threading.Thread(target=self._keeper_loop, name='phase-timer-leases', daemon=True).start()
+    
+    def _keeper_loop(self):
+        while not self.stopping.wait(self._lease_ttl / 3):
+            try:
+                with self.keeper_lock:
+                    self.keep_leases()
+            except Exception as e:
+                self.metrics.error('keeper', e)
+                print(f"Error renewing phase timer leases: {e}")
+    
+    def keep_leases(self) -> int:
+        """
+        Renew this process's leases (which is its heartbeat) and cancel the
+        timers of games another process took over, then claim live games
+        nobody drives. Candidates are the live deadlines in this process's
+        index, which the reaper refreshes from the store, so a dead owner's
+        games are taken over within _lease_ttl plus one pass once they've
+        been indexed here. Returns how many games were taken over.
+        """
+        if self.stopping.is_set():
+            return 0
+        pending = self.scheduler.pending()
+        held = self._claim(pending)
+        for game_id in set(pending) - held:
+            self.scheduler.cancel(game_id)
+            print(f"Phase timer of game {game_id} was taken over by another process")
+        if held:
+            self._catch_up(pending, held)
+        
+        # Games leased here are timed here, even while out of the heap being resolved
+        orphans = [game_id for _, game_id in self.state_manager.get_phase_deadlines()
+                   if game_id not in self.leased]
+        claimed = self._claim(orphans) if orphans else set()
+        for game_id in claimed:
+            # The index only sees other processes' commits with the reaper's refresh
+            header = self.state_manager.get_game_header(game_id)
+            if header is not None:
+                self.state_manager.index.update(game_id, header)
+        taken = self._restore(claimed) if claimed else 0
+        if taken:
+            print(f"Took over the phase timers of {taken} games")
+        return taken
+    
+    def _catch_up(self, pending: Dict[str, Tuple[str, float]], game_ids: Iterable[str]):
+        """Move up the timers of games whose phase another process cut short."""
+        records = self.state_manager.store.read_many(list(game_ids))
+        for game_id, (_, data) in records.items():
+            header = peek_header(data)
+            phase, due_at = pending[game_id]
+            # Timers are set a moment after the phase_end they follow, so small gaps are expected
+            if header['phase'] == phase and header['phase_end'] and header['phase_end'] < due_at - 1.0:
+                self.phase_shortened(game_id, phase, header['phase_end'])
+    
+    def phase_shortened(self, game_id: str, phase: str, phase_end: float):
+        """Everyone the game's phase waits on has acted: fire its timer at the new ``phase_end``."""
+        if game_id in self.leased and self.scheduler.advance(game_id, phase, phase_end):
+            print(f"All players acted in game {game_id}, {phase} phase ends in {max(0, phase_end - time.time()):.1f}s")
     
     def start_phase_timer(self, game_id: str, phase: str) -> bool:
         """
@@ -30,7 +169,7 @@ class PhaseTimer:
         if phase not in PHASE_DURATIONS:
             return False
         
-        game = self.state_manager.get_game_state(game_id)
+        game = self.state_manager.get_game_header(game_id)
         if not game or game['ended']:
             return False
         
@@ -38,97 +177,188 @@ class PhaseTimer:
         phase_end_time = time.time() + duration
         
         # Update game state with new phase and end time
-        self.state_manager.update_game_state(game_id, {
-            'phase': phase,
-            'phase_end': phase_end_time
-        })
-        
-        # Cancel any existing timer for this game
-        self.cancel_timer(game_id)
+        self.state_manager.run(game_id, lambda uow: uow.emit(events.phase_started(phase, phase_end_time)))
         
-        # Create and start new timer
-        with self.timer_lock:
-            timer = threading.Timer(duration, self._timer_callback, args=[game_id, phase])
-            timer.daemon = True  # Timer won't prevent program exit
-            timer.start()
-            self.active_timers[game_id] = timer
-        
-        print(f"Started {phase} phase timer for game {game_id} ({duration}s)")
+        self._schedule(game_id, phase, duration)
         return True
     
+    def _schedule(self, game_id: str, phase: str, duration: float):
+        """
+        Replace the game's timer with one firing after ``duration`` seconds,
+        unless another process drives the game's clock.
+        """
+        self._start_keeper()
+        if game_id not in self.leased and not self._claim([game_id]):
+            self.scheduler.cancel(game_id)
+            print(f"Phase timer for game {game_id} is driven by another process")
+            return
+        self.scheduler.schedule(game_id, phase, time.time() + duration)
+        print(f"Started {phase} phase timer for game {game_id} ({duration}s)")
+    
     def cancel_timer(self, game_id: str) -> bool:
         """Cancel the active timer for a game."""
-        with self.timer_lock:
-            if game_id in self.active_timers:
-                self.active_timers[game_id].cancel()
-                del self.active_timers[game_id]
-                return True
-        return False
+        return self.scheduler.cancel(game_id) is not None
     
-    def _timer_callback(self, game_id: str, phase: str):
+    def _timers_expired(self, due: Dict[str, str]):
         """
-        Called when a phase timer expires.
-        Handles phase transition logic.
+        Called by the scheduler with every game whose timer expired together.
+        Queues them and resolves every due game in one batch.
         """
         try:
-            print(f"Phase timer expired for game {game_id}, phase: {phase}")
+            print(f"Phase timers expired for {len(due)} games")
             
-            # Remove timer from active list
             with self.timer_lock:
-                if game_id in self.active_timers:
-                    del self.active_timers[game_id]
+                self.due_phases.update(due)
             
-            # Process phase end
-            self.end_phase(game_id, phase)
+            self.resolve_due_phases()
             
         except Exception as e:
-            print(f"Error in timer callback for game {game_id}: {e}")
+            self.metrics.error('callback', e)
+            print(f"Error in timer callback for games {sorted(due)}: {e}")
+    
+    def resolve_due_phases(self) -> int:
+        """
+        End the phase of every queued game, plus games whose timers here are
+        overdue but haven't fired yet, as one batch.
+        
+        Only one thread resolves at a time; timers firing meanwhile just
+        queue their game, which the running batch picks up on its next
+        round. Returns how many games were resolved.
+        """
+        resolved = 0
+        while True:
+            if not self.batch_lock.acquire(blocking=False):
+                return resolved
+            try:
+                while True:
+                    due = self._take_due()
+                    if not due:
+                        break
+                    resolved += self.end_phases(due)
+            finally:
+                self.batch_lock.release()
+            
+            # A timer may have queued its game after the last round but before the release
+            with self.timer_lock:
+                if not self.due_phases:
+                    return resolved
+    
+    def _take_due(self) -> Dict[str, str]:
+        """Empty the queue, adding games whose phase_end passed while their timer is still waiting."""
+        overdue = self.state_manager.get_phase_deadlines(time.time())
+        with self.timer_lock:
+            due, self.due_phases = self.due_phases, {}
+            for _, game_id in overdue:
+                header = self.state_manager.index.header(game_id)
+                if header is None or game_id in due or self.scheduler.cancel(game_id) is None:
+                    continue
+                due[game_id] = header['phase']
+        return due
     
     def end_phase(self, game_id: str, phase: str):
         """
         End the current phase and transition to the next phase.
         """
-        game = self.state_manager.get_game_state(game_id)
-        if not game or game['ended']:
-            return
+        self.end_phases({game_id: phase})
+    
+    def end_phases(self, due: Dict[str, str]) -> int:
+        """
+        End the given phase of each game in ``due`` (game ID -> phase).
         
-        print(f"Ending {phase} phase for game {game_id}")
+        All games are loaded in one read, resolved and moved to their next
+        phase in memory, and committed in one batched storage write. Games
+        that already ended or moved on (e.g. by another process's timer)
+        are skipped. Returns how many games were resolved.
+        """
+        due = {game_id: phase for game_id, phase in due.items() if phase in PHASE_DURATIONS}
+        if not due:
+            return 0
         
-        if phase == 'night':
-            # Process night actions
-            night_result = self.game_logic.resolve_night_actions(game_id)
-            print(f"Night actions resolved for game {game_id}: {night_result}")
-            
-            # Check win condition
-            winner = self.game_logic.check_win_condition(game_id)
+        print(f"Ending phases of {len(due)} games")
+        started = time.time()
+        timings: Dict[str, tuple] = {}
+        outcomes = self.state_manager.run_many(list(due), lambda uow: self._advance(uow, due[uow.game_id], timings))
+        committed = time.time()
+        self.metrics.record('batch', committed - started)
+        
+        resolved = 0
+        ended = []
+        moved_on = []
+        for game_id, outcome in outcomes.items():
+            if outcome is None:
+                moved_on.append(game_id)
+                continue
+            resolved += 1
+            phase = due[game_id]
+            result, winner, next_phase = outcome
+            self._record_transition(started, committed, *timings[game_id])
+            if phase == 'night':
+                print(f"Night actions resolved for game {game_id}: {result}")
+            else:
+                print(f"Day votes resolved for game {game_id}: {result}")
             if winner:
                 print(f"Game {game_id} ended, winner: {winner}")
-                self.state_manager.update_game_state(game_id, {
-                    'phase': 'ended',
-                    'phase_end': None
-                })
-                return
-            
-            # Start day phase
-            self.start_day_phase(game_id)
+                ended.append(game_id)
+                continue
             
-        elif phase == 'day':
+            # The new phase_end is already committed; only the local timer is left
+            self._schedule(game_id, next_phase, PHASE_DURATIONS[next_phase])
+        
+        # Moved on elsewhere (e.g. an admin forced the phase through another
+        # process): keep timing whatever phase the game is in now
+        for game_id in moved_on:
+            header = self.state_manager.get_game_header(game_id)
+            if header and not header['ended'] and header['phase_end'] and game_id in self.leased:
+                self.scheduler.schedule(game_id, header['phase'], header['phase_end'])
+            elif header is None or header['ended']:
+                ended.append(game_id)
+        self._release(ended)
+        return resolved
+    
+    def _record_transition(self, started: float, committed: float, phase_end: Optional[float], steps: Dict[str, float]):
+        # Phases ended ahead of their deadline (forced by an admin) aren't late or on time
+        if phase_end is None or started < phase_end - self._batch_window:
+            self.metrics.transition(None, None, steps)
+        else:
+            self.metrics.transition(started - phase_end, committed - phase_end, steps)
+    
+    def _advance(self, uow, phase: str, timings: Optional[Dict[str, tuple]] = None):
+        """
+        Resolve ``phase`` in a loaded game, check for a winner and switch to
+        the next phase. Returns (result, winner, next phase), or None if the
+        game is no longer in ``phase``. Stores the phase_end it was due at and
+        the time each step took in ``timings``.
+        """
+        game = uow.game
+        # Already ended or moved on (e.g. by another process's timer)
+        if game['ended'] or game['phase'] != phase:
+            return None
+        
+        phase_end = game['phase_end']
+        steps = {}
+        start = time.perf_counter()
+        if phase == 'night':
+            # Process night actions
+            result = uow.emit(events.night_resolved(time.time()))
+        else:
             # Process day votes
-            day_result = self.game_logic.resolve_day_votes(game_id)
-            print(f"Day votes resolved for game {game_id}: {day_result}")
-            
-            # Check win condition
-            winner = self.game_logic.check_win_condition(game_id)
-            if winner:
-                print(f"Game {game_id} ended, winner: {winner}")
-                self.state_manager.update_game_state(game_id, {
-                    'phase': 'ended',
-                    'phase_end': None
-                })
-                return
-            
-            # Start night phase
-            self.start_night_phase(game_id)
+            result = uow.emit(events.day_resolved(events.new_seed()))
+        resolved = time.perf_counter()
+        steps['resolve'] = resolved - start
+        
+        # Check win condition
+        winner = uow.emit(events.win_checked())
+        checked = time.perf_counter()
+        steps['win_check'] = checked - resolved
+        if timings is not None:
+            timings[uow.game_id] = (phase_end, steps)
+        if winner:
+            return result, winner, None
+        
+        next_phase = 'day' if phase == 'night' else 'night'
+        uow.emit(events.phase_started(next_phase, time.time() + PHASE_DURATIONS[next_phase]))
+        steps['next_phase'] = time.perf_counter() - checked
+        return result, None, next_phase
     
     def start_night_phase(self, game_id: str) -> bool:
         """Start the night phase for a game."""
@@ -140,7 +370,7 @@ class PhaseTimer:
     
     def get_phase_time_remaining(self, game_id: str) -> Optional[float]:
         """Get the time remaining in the current phase."""
-        game = self.state_manager.get_game_state(game_id)
+        game = self.state_manager.get_game_header(game_id)
         if not game or not game.get('phase_end'):
             return None
         
@@ -151,7 +381,7 @@ class PhaseTimer:
         """
         Manually end the current phase (admin function).
         """
-        game = self.state_manager.get_game_state(game_id)
+        game = self.state_manager.get_game_header(game_id)
         if not game or game['ended']:
             return False
         
@@ -167,40 +397,71 @@ class PhaseTimer:
     
     def get_active_timers(self) -> Dict[str, Dict]:
         """Get information about all active timers (for debugging)."""
+        active_info = {}
+        now = time.time()
+        for game_id, (phase, due_at) in self.scheduler.pending().items():
+            game = self.state_manager.get_game_header(game_id)
+            if game:
+                active_info[game_id] = {
+                    'phase': game['phase'],
+                    'time_remaining': self.get_phase_time_remaining(game_id),
+                    'fires_in': max(0, due_at - now),
+                    'timer_active': True
+                }
+        return active_info
+    
+    def get_metrics(self) -> Dict:
+        """Transition lag and step histograms, error counts and the timers pending here (admin)."""
+        stats = self.metrics.snapshot()
         with self.timer_lock:
-            active_info = {}
-            for game_id, timer in self.active_timers.items():
-                game = self.state_manager.get_game_state(game_id)
-                if game:
-                    remaining = self.get_phase_time_remaining(game_id)
-                    active_info[game_id] = {
-                        'phase': game['phase'],
-                        'time_remaining': remaining,
-                        'timer_active': timer.is_alive()
-                    }
-            return active_info
+            stats['queued_phases'] = len(self.due_phases)
+            stats['leased_games'] = len(self.leased)
+        stats['pending_timers'] = len(self.scheduler)
+        return stats
     
     def restore_timers_from_state(self):
         """
         Restore active timers from game state on server restart.
         This should be called during application initialization.
+        Only games whose timer lease this process gets are restored; the
+        rest are driven by the other backends.
+        """
+        self._start_keeper()
+        
+        # Only games with a pending phase deadline can need a timer
+        candidates = [game_id for _, game_id in self.state_manager.get_phase_deadlines()]
+        restored_count = self._restore(self._claim(candidates)) if candidates else 0
+        
+        if restored_count > 0:
+            print(f"Successfully restored {restored_count} active timers from game state")
+        else:
+            print("No active timers to restore")
+        
+        return restored_count
+    
+    def _restore(self, game_ids: Iterable[str]) -> int:
+        """
+        Schedule the games' current phase deadlines, ending the ones already
+        past in one batch. The leases of games left without a timer are released.
         """
         current_time = time.time()
         restored_count = 0
+        expired = {}
+        untimed = []
         
-        # Get all games from state manager
-        all_games = self.state_manager.get_all_games()
-        
-        for game_id, game in all_games.items():
-            # Skip ended games or games without active phases
-            if game.get('ended') or not game.get('started'):
+        for game_id in game_ids:
+            game = self.state_manager.get_game_header(game_id)
+            # Skip games that ended or moved on since they were indexed
+            if not game or game.get('ended') or not game.get('started') or not game.get('phase_end'):
+                untimed.append(game_id)
                 continue
                 
             phase = game.get('phase')
-            phase_end = game.get('phase_end')
+            phase_end = game['phase_end']
             
-            # Skip if no active phase or phase_end timestamp
-            if not phase or not phase_end or phase in ['setup', 'ended']:
+            # Skip if no active phase
+            if not phase or phase not in PHASE_DURATIONS:
+                untimed.append(game_id)
                 continue
             
             # Calculate remaining time
@@ -209,45 +470,38 @@ class PhaseTimer:
             # If timer has already expired, process the phase end immediately
             if remaining_time <= 0:
                 print(f"Timer for game {game_id} phase {phase} has expired, processing immediately")
-                self.end_phase(game_id, phase)
+                expired[game_id] = phase
                 continue
             
             # If timer is still valid, restore it
-            if phase in PHASE_DURATIONS:
-                print(f"Restoring timer for game {game_id}, phase {phase}, {remaining_time:.1f}s remaining")
-                
-                # Cancel any existing timer for this game (shouldn't be any, but safety first)
-                self.cancel_timer(game_id)
-                
-                # Create and start timer with remaining time
-                with self.timer_lock:
-                    timer = threading.Timer(remaining_time, self._timer_callback, args=[game_id, phase])
-                    timer.daemon = True
-                    timer.start()
-                    self.active_timers[game_id] = timer
-                
-                restored_count += 1
+            print(f"Restoring timer for game {game_id}, phase {phase}, {remaining_time:.1f}s remaining")
+            
+            # Replaces any existing timer for this game (shouldn't be any, but safety first)
+            self.scheduler.schedule(game_id, phase, phase_end)
+            
+            restored_count += 1
         
-        if restored_count > 0:
-            print(f"Successfully restored {restored_count} active timers from game state")
-        else:
-            print("No active timers to restore")
+        self._release(untimed)
         
-        return restored_count
-
+        # Everything that expired while nobody drove it is resolved in one batch
+        return restored_count + self.end_phases(expired)
+    
     def cleanup_finished_games(self):
         """Remove timers for ended games."""
         games_to_cleanup = []
         
-        with self.timer_lock:
-            for game_id in list(self.active_timers.keys()):
-                game = self.state_manager.get_game_state(game_id)
-                if not game or game['ended']:
-                    games_to_cleanup.append(game_id)
+        # Games the index still sees as live keep their timers
+        candidates = [gid for gid in self.scheduler.pending() if not self.state_manager.index.is_live(gid)]
+        
+        for game_id in candidates:
+            game = self.state_manager.get_game_header(game_id)
+            if not game or game['ended']:
+                games_to_cleanup.append(game_id)
         
         for game_id in games_to_cleanup:
             self.cancel_timer(game_id)
             print(f"Cleaned up timer for ended game {game_id}")
+        self._release(games_to_cleanup)
 
 
 # Global instance for use across the application
@@ -0,0 +1,313 @@
+import json
+import os
+import socket
+import threading
+import time
+import logging
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterable, List, Optional, Tuple
+from game.codec import is_compact
+from game.state_protocol import (
+    read_frame, pack_frame, U64, CAS_BODY, KIND_REQUEST, KIND_RESPONSE, KIND_NOTIFY,
+    OP_GET, OP_VERSION, OP_PUT, OP_CAS, OP_DELETE, OP_LIST, OP_HEADERS, OP_LOCK, OP_UNLOCK,
+    OP_SUBSCRIBE, OP_STATS, OP_HEARTBEAT, OP_CLAIM_TIMERS, OP_RELEASE_TIMERS, OP_TIMER_OWNERS, OP_AUTH,
+    STATUS_OK, STATUS_BUSY, DELETED
+)
+from game.storage import GameStorage
+
+
+class _Pending:
+    """A request waiting for its response."""
+    __slots__ = ('event', 'status', 'body')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.status = None
+        self.body = b''
+
+
+class RemoteGameStore(GameStorage):
+    """
+    Game storage served by a state service (server/state_service.py).
+
+    All threads share one connection; requests are tagged with IDs, so many
+    can be in flight at once and a reader thread hands each response to the
+    thread waiting for it. Records are cached here and dropped when the
+    service pushes a change notification, so repeat reads of an unchanged
+    game never leave the process. Only records in the compact format are
+    sent or accepted, and ``secret`` is given to services that require one.
+    """
+
+    _lock_retry_delay = 0.002  # Seconds between attempts on a game locked by another backend
+    _request_timeout = 10.0
+
+    def __init__(self, host: str, port: int, secret: Optional[str] = None):
+        self.address = (host, port)
+        self.secret = secret
+        self.sock: Optional[socket.socket] = None
+        self.pid = None
+        self.connect_lock = threading.Lock()
+        self.send_lock = threading.Lock()
+        self.pending: Dict[int, _Pending] = {}
+        self.next_id = 1
+        self.cache: Dict[str, Tuple[int, bytes]] = {}
+        self.latest: Dict[str, int] = {}  # Newest version announced per game
+        self.cache_lock = threading.Lock()
+        self.thread_locks: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self._connect()
+
+    def _connect(self) -> socket.socket:
+        """Open the connection (again after a drop or a fork) and subscribe to changes."""
+        with self.connect_lock:
+            if self.sock is not None and self.pid == os.getpid():
+                return self.sock
+
+            sock = socket.create_connection(self.address)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self.secret is not None:
+                # Answered before the reader starts, so it can be read here directly
+                sock.sendall(pack_frame(KIND_REQUEST, OP_AUTH, 0, body=self.secret.encode('utf-8')))
+                if read_frame(sock)[1] != STATUS_OK:
+                    sock.close()
+                    raise ConnectionError('State service rejected the shared secret')
+            with self.cache_lock:
+                # Changes made while disconnected were never announced
+                self.cache.clear()
+                self.latest.clear()
+            threading.Thread(target=self._reader, args=(sock,), name='state-service-reader', daemon=True).start()
+
+            # Subscribe before any other request can use the connection, so
+            # nothing read through it misses a later change
+            with self.send_lock:
+                sock.sendall(pack_frame(KIND_REQUEST, OP_SUBSCRIBE, 0))
+            self.sock = sock
+            self.pid = os.getpid()
+            return sock
+
+    def _reader(self, sock: socket.socket):
+        try:
+            while True:
+                kind, code, request_id, game_id, body = read_frame(sock)
+                if kind == KIND_NOTIFY:
+                    self._invalidate(game_id, U64.unpack(body)[0])
+                elif kind == KIND_RESPONSE:
+                    waiter = self.pending.pop(request_id, None)
+                    if waiter is not None:
+                        waiter.status, waiter.body = code, body
+                        waiter.event.set()
+        except (ConnectionError, OSError) as e:
+            if self.sock is sock:
+                logging.error(f"Lost connection to state service: {e}")
+        finally:
+            with self.connect_lock:
+                if self.sock is sock:
+                    self.sock = None
+            sock.close()
+            # Wake everyone still waiting on this connection
+            for request_id, waiter in list(self.pending.items()):
+                self.pending.pop(request_id, None)
+                waiter.event.set()
+
+    def _invalidate(self, game_id: str, version: int):
+        with self.cache_lock:
+            if version == DELETED or version > self.latest.get(game_id, -1):
+                self.latest[game_id] = version
+            cached = self.cache.get(game_id)
+            if cached is not None and (version == DELETED or cached[0] < version):
+                del self.cache[game_id]
+
+    def _send(self, requests: Iterable[Tuple[int, str, bytes]]) -> List[_Pending]:
+        """Send requests back to back without waiting for responses."""
+        sock = self.sock if self.sock is not None and self.pid == os.getpid() else None
+        if sock is None:
+            sock = self._connect()
+
+        waiters = []
+        frames = []
+        with self.send_lock:
+            for op, game_id, body in requests:
+                request_id = self.next_id
+                self.next_id = self.next_id % 0xFFFFFFFF + 1
+                waiter = self.pending[request_id] = _Pending()
+                waiters.append(waiter)
+                frames.append(pack_frame(KIND_REQUEST, op, request_id, game_id, body))
+            sock.sendall(b''.join(frames))
+        return waiters
+
+    def _wait(self, waiter: _Pending) -> Tuple[int, bytes]:
+        if not waiter.event.wait(self._request_timeout) or waiter.status is None:
+            raise ConnectionError('No response from state service')
+        return waiter.status, waiter.body
+
+    def _call(self, op: int, game_id: str = '', body: bytes = b'') -> Tuple[int, bytes]:
+        return self._wait(self._send([(op, game_id, body)])[0])
+
+    @staticmethod
+    def _record(game_id: str, body: bytes) -> Tuple[int, bytes]:
+        data = body[U64.size:]
+        if not is_compact(data):
+            raise ValueError(f"State service returned a non-record for game {game_id}")
+        return U64.unpack_from(body, 0)[0], data
+
+    def _remember(self, game_id: str, version: int, data: bytes):
+        with self.cache_lock:
+            # A notification for a newer version may have overtaken this response
+            if version >= self.latest.get(game_id, -1):
+                self.cache[game_id] = (version, data)
+
+    @contextmanager
+    def _hold(self, game_id: str):
+        # Threads of this process queue locally, so only one asks the service at a time
+        with self.cache_lock:
+            lock = self.thread_locks.get(game_id)
+            if lock is None:
+                lock = self.thread_locks[game_id] = threading.Lock()
+
+        with lock:
+            while self._call(OP_LOCK, game_id)[0] == STATUS_BUSY:
+                time.sleep(self._lock_retry_delay)
+            try:
+                yield
+            finally:
+                self._call(OP_UNLOCK, game_id)
+
+    def lock(self, game_id: str, shared: bool = False):
+        # The service applies each request atomically, so readers need no lock
+        if shared:
+            return nullcontext()
+        return self._hold(game_id)
+
+    def read(self, game_id: str) -> Optional[Tuple[int, bytes]]:
+        with self.cache_lock:
+            cached = self.cache.get(game_id)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        status, body = self._call(OP_GET, game_id)
+        if status != STATUS_OK:
+            return None
+        version, data = self._record(game_id, body)
+        self._remember(game_id, version, data)
+        return version, data
+
+    def read_many(self, game_ids: List[str]) -> Dict[str, Tuple[int, bytes]]:
+        """Fetch several games with one pipelined round trip for the uncached ones."""
+        records = {}
+        missing = []
+        with self.cache_lock:
+            for game_id in game_ids:
+                if game_id in self.cache:
+                    records[game_id] = self.cache[game_id]
+                else:
+                    missing.append(game_id)
+
+        waiters = self._send([(OP_GET, game_id, b'') for game_id in missing]) if missing else []
+        for game_id, waiter in zip(missing, waiters):
+            status, body = self._wait(waiter)
+            if status == STATUS_OK:
+                version, data = self._record(game_id, body)
+                records[game_id] = (version, data)
+                self._remember(game_id, version, data)
+        return records
+
+    def version(self, game_id: str) -> Optional[int]:
+        with self.cache_lock:
+            cached = self.cache.get(game_id)
+        if cached is not None:
+            return cached[0]
+        status, body = self._call(OP_VERSION, game_id)
+        return U64.unpack(body)[0] if status == STATUS_OK else None
+
+    def write(self, game_id: str, data: bytes, version: int) -> bool:
+        if not is_compact(data):
+            raise ValueError(f"Not a game record: {game_id}")
+        status, _ = self._call(OP_PUT, game_id, U64.pack(version) + data)
+        if status != STATUS_OK:
+            return False
+        self._remember(game_id, version, data)
+        return True
+
+    def compare_and_swap(self, game_id: str, expected_version: int, data: bytes, version: int) -> bool:
+        if not is_compact(data):
+            raise ValueError(f"Not a game record: {game_id}")
+        while True:
+            status, _ = self._call(OP_CAS, game_id, CAS_BODY.pack(expected_version, version) + data)
+            if status != STATUS_BUSY:
+                break
+            time.sleep(self._lock_retry_delay)
+
+        if status != STATUS_OK:
+            # Our copy is behind; don't let a retry read it again before the notification lands
+            with self.cache_lock:
+                self.cache.pop(game_id, None)
+            return False
+        self._remember(game_id, version, data)
+        return True
+
+    def compare_and_swap_many(self, swaps: List[Tuple[str, int, bytes, int]]) -> List[bool]:
+        """Pipeline the swaps in one round trip; ones that hit a held lock are retried on their own."""
+        for game_id, _, data, _ in swaps:
+            if not is_compact(data):
+                raise ValueError(f"Not a game record: {game_id}")
+        waiters = self._send([(OP_CAS, game_id, CAS_BODY.pack(expected_version, version) + data)
+                              for game_id, expected_version, data, version in swaps])
+        results = []
+        for (game_id, expected_version, data, version), waiter in zip(swaps, waiters):
+            status, _ = self._wait(waiter)
+            if status == STATUS_BUSY:
+                results.append(self.compare_and_swap(game_id, expected_version, data, version))
+            elif status != STATUS_OK:
+                with self.cache_lock:
+                    self.cache.pop(game_id, None)
+                results.append(False)
+            else:
+                self._remember(game_id, version, data)
+                results.append(True)
+        return results
+
+    def delete(self, game_id: str) -> bool:
+        status, _ = self._call(OP_DELETE, game_id)
+        self._invalidate(game_id, DELETED)
+        return status == STATUS_OK
+
+    def game_ids(self) -> List[str]:
+        return json.loads(self._call(OP_LIST)[1])
+
+    def headers(self) -> Dict[str, Dict]:
+        return json.loads(self._call(OP_HEADERS)[1])
+
+    def heartbeat(self, owner: str):
+        self._call(OP_HEARTBEAT, body=owner.encode('utf-8'))
+
+    def claim_timers(self, owner: str, game_ids: List[str], ttl: float) -> List[str]:
+        body = json.dumps({'owner': owner, 'games': list(game_ids), 'ttl': ttl}).encode('utf-8')
+        status, reply = self._call(OP_CLAIM_TIMERS, body=body)
+        return json.loads(reply) if status == STATUS_OK else []
+
+    def release_timers(self, owner: str, game_ids: List[str]):
+        self._call(OP_RELEASE_TIMERS, body=json.dumps({'owner': owner, 'games': list(game_ids)}).encode('utf-8'))
+
+    def timer_owners(self) -> Dict[str, Dict]:
+        return json.loads(self._call(OP_TIMER_OWNERS)[1])
+
+    def stats(self) -> Dict:
+        stats = json.loads(self._call(OP_STATS)[1])
+        stats['backend'] = 'remote'
+        stats['cache_games'] = len(self.cache)
+        stats['cache_hits'] = self.hits
+        stats['cache_misses'] = self.misses
+        return stats
+
+    def close(self):
+        with self.connect_lock:
+            sock, self.sock = self.sock, None
+            if sock is not None and self.pid == os.getpid():
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                sock.close()
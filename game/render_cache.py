@@ -0,0 +1,80 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Hashable, Optional, Tuple
+
+# Viewer classes besides individual players (who see their own role)
+PUBLIC = 'public'
+ENDED = 'ended'  # Every role is revealed, so all viewers share one render
+
+
+class RenderedGame:
+    """Encoded summaries of one game version, per viewer class."""
+    __slots__ = ('version', 'ended', 'players', 'phase_end', 'renders')
+
+    def __init__(self, version: int, ended: bool, players: FrozenSet[str], phase_end: Optional[float]):
+        self.version = version
+        self.ended = ended
+        self.players = players
+        self.phase_end = phase_end
+        self.renders: Dict[Hashable, bytes] = {}
+
+    def viewer(self, player_id: Optional[str]) -> Hashable:
+        """The viewer class a player falls into for this version."""
+        if self.ended:
+            return ENDED
+        if player_id is not None and player_id in self.players:
+            return player_id
+        return PUBLIC
+
+
+class RenderCache:
+    """
+    LRU cache of pre-encoded game summaries, one entry per game.
+
+    An entry belongs to a single game version; looking it up with any other
+    version misses, so a state change invalidates every render of the game
+    at once without anyone having to announce it.
+    """
+
+    def __init__(self, max_games: int = 1024):
+        self.max_games = max_games
+        self.entries: 'OrderedDict[str, RenderedGame]' = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, game_id: str, version: int, player_id: Optional[str]) -> Optional[Tuple[bytes, Optional[float]]]:
+        """The cached render for ``player_id`` at ``version``, with the phase_end it was rendered for."""
+        with self.lock:
+            entry = self.entries.get(game_id)
+            if entry is not None and entry.version == version:
+                self.entries.move_to_end(game_id)
+                body = entry.renders.get(entry.viewer(player_id))
+                if body is not None:
+                    self.hits += 1
+                    return body, entry.phase_end
+            self.misses += 1
+            return None
+
+    def put(self, game_id: str, entry: RenderedGame, viewer: Hashable, body: bytes):
+        """Remember one render, keeping the renders already cached for the same version."""
+        with self.lock:
+            current = self.entries.get(game_id)
+            if current is not None and current.version == entry.version:
+                entry = current
+            elif current is not None and current.version > entry.version:
+                return  # Rendered from an older read than what's cached
+            entry.renders[viewer] = body
+            self.entries[game_id] = entry
+            self.entries.move_to_end(game_id)
+            while len(self.entries) > self.max_games:
+                self.entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                'games': len(self.entries),
+                'renders': sum(len(entry.renders) for entry in self.entries.values()),
+                'hits': self.hits,
+                'misses': self.misses
+            }
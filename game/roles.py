@@ -0,0 +1,34 @@
+import random
+from typing import Dict, List
+
+# Role sets decide how many werewolves a lobby is dealt.
+#
+#   werewolves_per_player  share of the lobby dealt werewolf, rounded down;
+#                          always at least one, and always fewer than the
+#                          rest of the lobby so the game doesn't start won
+#
+# Every set deals one seer (the night has a single seer target) and makes
+# everyone else a villager.
+
+ROLE_SETS = {
+    'classic': {'werewolves_per_player': 0.0},  # One werewolf whatever the lobby size
+    'scaled': {'werewolves_per_player': 0.2}    # One werewolf per five players, for large lobbies
+}
+
+
+def role_counts(player_count: int, role_set: str) -> Dict[str, int]:
+    """How many players of each role a lobby of ``player_count`` gets."""
+    if role_set not in ROLE_SETS:
+        raise ValueError(f"Unknown role set: {role_set}")
+    werewolves = int(player_count * ROLE_SETS[role_set]['werewolves_per_player'])
+    werewolves = max(1, min(werewolves, (player_count - 1) // 2))
+    return {'werewolf': werewolves, 'seer': 1, 'villager': player_count - werewolves - 1}
+
+
+def deal_roles(player_ids: List[str], role_set: str, rng: random.Random = random) -> Dict[str, str]:
+    """Shuffle the players with ``rng`` and deal them the role set. Returns player ID -> role."""
+    counts = role_counts(len(player_ids), role_set)
+    roles = ['werewolf'] * counts['werewolf'] + ['seer'] * counts['seer'] + ['villager'] * counts['villager']
+    player_ids = list(player_ids)
+    rng.shuffle(player_ids)
+    return dict(zip(player_ids, roles))
@@ -0,0 +1,94 @@
+from typing import Dict, List, Tuple
+
+# Alive counts kept on the game record.
+#
+#   alive_count    players still alive
+#   alive_by_role  alive players per assigned role
+#
+# They change only when a player joins, dies or gets a role, so win checks
+# and summaries read them instead of walking the player list.
+#
+# The role index (role_players: role -> player IDs, alive or not) is derived
+# from the player rows when a record is decoded and is never stored; roles
+# only change when they're dealt, which rebuilds it.
+
+ROLE_NAMES = ('werewolf', 'seer', 'villager')
+
+
+def tally_alive(players: Dict[str, Dict]) -> Tuple[int, Dict[str, int]]:
+    """(alive count, alive per role) counted from a player list."""
+    by_role = dict.fromkeys(ROLE_NAMES, 0)
+    alive = 0
+    for player in players.values():
+        if player['alive']:
+            alive += 1
+            if player['role'] in by_role:
+                by_role[player['role']] += 1
+    return alive, by_role
+
+
+def count_alive(game: Dict):
+    """Recompute the counts from the player list (after role assignment or for old records)."""
+    game['alive_count'], game['alive_by_role'] = tally_alive(game['players'])
+
+
+def index_roles(game: Dict):
+    """Rebuild the role index from the player list."""
+    index = {role: [] for role in ROLE_NAMES}
+    for player_id, player in game['players'].items():
+        if player['role'] in index:
+            index[player['role']].append(player_id)
+    game['role_players'] = index
+
+
+def role_players(game: Dict, role: str) -> List[str]:
+    """IDs of the players dealt ``role``."""
+    if 'role_players' not in game:
+        index_roles(game)
+    return game['role_players'][role]
+
+
+def _counts(game: Dict):
+    if 'alive_count' not in game or 'alive_by_role' not in game:
+        count_alive(game)
+
+
+def join_player(game: Dict, player_id: str, player: Dict):
+    _counts(game)
+    game['players'][player_id] = player
+    if player['alive']:
+        game['alive_count'] += 1
+        if player['role'] in game['alive_by_role']:
+            game['alive_by_role'][player['role']] += 1
+
+
+def kill_player(game: Dict, player_id: str) -> bool:
+    """Mark a player dead. Returns False if they were already dead."""
+    _counts(game)
+    player = game['players'][player_id]
+    if not player['alive']:
+        return False
+    player['alive'] = False
+    game['alive_count'] -= 1
+    if player['role'] in game['alive_by_role']:
+        game['alive_by_role'][player['role']] -= 1
+    return True
+
+
+def alive_count(game: Dict) -> int:
+    _counts(game)
+    return game['alive_count']
+
+
+def dead_count(game: Dict) -> int:
+    return len(game['players']) - alive_count(game)
+
+
+def alive_werewolves(game: Dict) -> int:
+    _counts(game)
+    return game['alive_by_role']['werewolf']
+
+
+def alive_villagers(game: Dict) -> int:
+    """Alive players on the villagers' side (everyone but werewolves)."""
+    return alive_count(game) - alive_werewolves(game)
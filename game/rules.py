@@ -0,0 +1,261 @@
+import random
+from typing import Any, Dict, List, Optional
+from game.roles import deal_roles
+from game.roster import count_alive, index_roles, join_player, kill_player, alive_count, alive_werewolves, alive_villagers
+from game.votes import new_vote_book, as_vote_book, cast_vote, vote_leaders
+
+# Game rules as functions of a loaded game dict.
+#
+# They change the game in place and take anything random or time-dependent
+# (the RNG, the current time) as an argument, so the same game and the same
+# arguments always give the same result. events.py applies them as a reducer
+# over recorded events; GameLogic decides what to apply.
+
+
+def new_game(created_at: float) -> Dict:
+    return {
+        'phase': 'setup',
+        'phase_end': None,
+        'players': {},
+        'actions': {
+            'werewolf_votes': new_vote_book(),
+            'seer_target': None,
+            'day_votes': new_vote_book()
+        },
+        'seer_history': [],
+        'chat': [],
+        'chat_seq': 0,
+        'chat_buckets': {},
+        'created_at': created_at,
+        'updated_at': created_at,
+        'started': False,
+        'ended': False,
+        'winner': None,
+        'version': 1,
+        'alive_count': 0,
+        'alive_by_role': {'werewolf': 0, 'seer': 0, 'villager': 0}
+    }
+
+
+def add_player(game: Dict, player_id: str, name: str, joined_at: float):
+    join_player(game, player_id, {
+        'name': name,
+        'role': None,
+        'alive': True,
+        'vote': None,
+        'joined_at': joined_at
+    })
+
+
+def apply_roles(game: Dict, role_set: str, rng: random.Random) -> Optional[bool]:
+    """Deal roles and move the game to the night phase (minimum 3 players)."""
+    if len(game['players']) < 3:
+        return None
+
+    for player_id, role in deal_roles(list(game['players']), role_set, rng).items():
+        game['players'][player_id]['role'] = role
+
+    count_alive(game)
+    index_roles(game)
+    game['started'] = True
+    game['phase'] = 'night'
+    return True
+
+
+def start_phase(game: Dict, phase: str, phase_end: Optional[float]):
+    game['phase'] = phase
+    game['phase_end'] = phase_end
+
+
+def shorten_phase(game: Dict, phase_end: float):
+    game['phase_end'] = phase_end
+
+
+def apply_action(game: Dict, action_type: str, player_id: str, target_id: str = None) -> bool:
+    """Record a player action."""
+    actions = game['actions']
+    if action_type == 'werewolf_vote':
+        # One vote per werewolf; voting again moves it
+        book = actions['werewolf_votes'] = as_vote_book(actions['werewolf_votes'])
+        cast_vote(book, player_id, target_id)
+
+    elif action_type == 'seer_investigate':
+        actions['seer_target'] = target_id
+
+    elif action_type == 'day_vote':
+        # Replaces the player's previous vote, if any
+        book = actions['day_votes'] = as_vote_book(actions['day_votes'])
+        cast_vote(book, player_id, target_id)
+
+        # Update player vote
+        game['players'][player_id]['vote'] = target_id
+
+    return True
+
+
+def all_acted(game: Dict) -> bool:
+    """
+    Whether every player the current phase waits on has acted: at night
+    each living werewolf has voted and the seer, if alive, has investigated;
+    by day every living player has voted.
+    """
+    actions = game['actions']
+    if game['phase'] == 'night':
+        if len(as_vote_book(actions['werewolf_votes'])['voters']) < alive_werewolves(game):
+            return False
+        return actions['seer_target'] is not None or not game['alive_by_role'].get('seer')
+    if game['phase'] == 'day':
+        return len(as_vote_book(actions['day_votes'])['voters']) >= alive_count(game)
+    return False
+
+
+def post_chat(game: Dict, player_id: str, message: str, sent_at: float, tokens: float, evict: int) -> List[Dict]:
+    """
+    Append a chat message, leaving ``tokens`` in the sender's rate-limit
+    bucket and dropping the ``evict`` oldest messages. Returns the dropped ones.
+    """
+    game.setdefault('chat_buckets', {})[player_id] = [tokens, sent_at]
+    seq = game.get('chat_seq', len(game['chat']))
+    game['chat'].append({
+        'player': player_id,
+        'message': message,
+        'time': sent_at,
+        'seq': seq
+    })
+    game['chat_seq'] = seq + 1
+
+    evicted = game['chat'][:evict]
+    del game['chat'][:evict]
+    return evicted
+
+
+def resolve_night(game: Dict, now: float) -> Dict:
+    """Resolve the night's kill and investigation."""
+    result = {
+        'killed': None,
+        'seer_result': None,
+        'actions_processed': True
+    }
+
+    # Process werewolf votes
+    leaders, _ = vote_leaders(as_vote_book(game['actions']['werewolf_votes']))
+    if leaders:
+        # Most voted target (the first to reach the top count on a tie)
+        target_id = leaders[0]
+
+        # Kill the target
+        if target_id in game['players'] and kill_player(game, target_id):
+            result['killed'] = {
+                'player_id': target_id,
+                'name': game['players'][target_id]['name']
+            }
+
+    # Process seer investigation
+    seer_target = game['actions']['seer_target']
+    if seer_target and seer_target in game['players']:
+        target_role = game['players'][seer_target]['role']
+        result['seer_result'] = {
+            'target_id': seer_target,
+            'target_name': game['players'][seer_target]['name'],
+            'is_werewolf': target_role == 'werewolf'
+        }
+        game['seer_history'].append({
+            'target_id': seer_target,
+            'target_role': target_role,
+            'timestamp': now
+        })
+
+    # Clear night actions and player votes
+    clear_actions(game)
+
+    return result
+
+
+def resolve_day(game: Dict, rng: random.Random) -> Dict:
+    """Execute the most voted player, breaking ties with ``rng``."""
+    result = {
+        'executed': None,
+        'vote_counts': {},
+        'actions_processed': True
+    }
+
+    # Tallies are maintained as votes come in
+    day_votes = as_vote_book(game['actions']['day_votes'])
+    vote_counts = {
+        target_id: votes for target_id, votes in day_votes['tally'].items()
+        if target_id in game['players'] and game['players'][target_id]['alive']
+    }
+
+    result['vote_counts'] = vote_counts
+
+    # Execute most voted player (if there are votes)
+    if vote_counts:
+        most_voted_players, max_votes = vote_leaders(day_votes)
+        most_voted_players = [pid for pid in most_voted_players if pid in vote_counts]
+        if not most_voted_players:
+            # Only reachable if the leaders died during the day
+            max_votes = max(vote_counts.values())
+            most_voted_players = [pid for pid, votes in vote_counts.items() if votes == max_votes]
+
+        # In case of tie, random selection
+        if most_voted_players:
+            executed_id = rng.choice(most_voted_players)
+            kill_player(game, executed_id)
+            result['executed'] = {
+                'player_id': executed_id,
+                'name': game['players'][executed_id]['name'],
+                'role': game['players'][executed_id]['role'],
+                'votes': vote_counts[executed_id]
+            }
+
+    # Clear day votes and player votes
+    clear_actions(game)
+
+    return result
+
+
+def clear_actions(game: Dict):
+    """Reset the phase's actions, and the vote of each player who cast one."""
+    players = game['players']
+    for voter_id in as_vote_book(game['actions']['day_votes'])['voters']:
+        if voter_id in players:
+            players[voter_id]['vote'] = None
+    game['actions'] = {
+        'werewolf_votes': new_vote_book(),
+        'seer_target': None,
+        'day_votes': new_vote_book()
+    }
+
+
+def apply_win_condition(game: Dict) -> Optional[str]:
+    """End the game if one side has won, and return the winner."""
+    if not game['started']:
+        return None
+
+    # Kept up to date as players die, so no need to walk the player list
+    werewolves = alive_werewolves(game)
+
+    # Werewolves win if they equal or outnumber villagers
+    if werewolves >= alive_villagers(game):
+        winner = 'werewolves'
+    # Villagers win if no werewolves left
+    elif werewolves == 0:
+        winner = 'villagers'
+    else:
+        return None
+
+    game['ended'] = True
+    game['winner'] = winner
+    game['phase'] = 'ended'
+    game['phase_end'] = None
+    return winner
+
+
+def update_keys(game: Dict, updates: Dict[str, Any]):
+    """Set existing top-level keys; dict values are merged into dict keys."""
+    for key, value in updates.items():
+        if key in game:
+            if isinstance(value, dict) and isinstance(game[key], dict):
+                game[key].update(value)
+            else:
+                game[key] = value
@@ -0,0 +1,128 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class InlineExecutor:
+    """Runs submitted work right away on the calling thread."""
+
+    def submit(self, fn: Callable, *args):
+        fn(*args)
+
+
+class PhaseScheduler:
+    """
+    One thread firing the phase deadlines of every game.
+
+    Deadlines sit in a min-heap of ``[due, seq, game_id, phase]`` entries.
+    Scheduling pushes an entry (O(log n)); cancelling or rescheduling only
+    marks the game's current entry dead (O(1)). Dead entries are dropped as
+    they reach the top, or all at once when they outnumber the live ones.
+
+    When the earliest deadline passes, every deadline due within
+    ``batch_window`` seconds is taken with it and handed to ``fire`` as one
+    ``{game_id: phase}`` batch. The batch runs through ``executor``, anything
+    with a ``submit(fn, *args)`` such as a ThreadPoolExecutor. The default
+    runs it on the scheduler thread, so batches never overlap. Errors raised
+    while handing a batch over are passed to ``on_error``.
+    """
+
+    def __init__(self, fire: Callable[[Dict[str, str]], None], executor=None, batch_window: float = 0.05,
+                 on_error: Optional[Callable[[Exception], None]] = None):
+        self.fire = fire
+        self.executor = executor or InlineExecutor()
+        self.batch_window = batch_window
+        self.on_error = on_error
+        self.heap: List[list] = []
+        self.entries: Dict[str, list] = {}  # Game ID -> its live heap entry
+        self.dead = 0
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.thread_pid = None
+
+    def schedule(self, game_id: str, phase: str, due_at: float):
+        """Fire ``phase`` of the game at ``due_at``, replacing any pending deadline."""
+        with self.condition:
+            self._discard(game_id)
+            entry = [due_at, next(self.counter), game_id, phase]
+            self.entries[game_id] = entry
+            heapq.heappush(self.heap, entry)
+            self._ensure_thread()
+            if self.heap[0] is entry:
+                # Earlier than what the thread is sleeping towards
+                self.condition.notify()
+
+    def cancel(self, game_id: str) -> Optional[str]:
+        """Drop the game's pending deadline. Returns the phase it was for, or None."""
+        with self.condition:
+            entry = self._discard(game_id)
+            return entry[3] if entry else None
+
+    def advance(self, game_id: str, phase: str, due_at: float) -> bool:
+        """Move the game's pending deadline for ``phase`` up to ``due_at``. Returns whether it moved."""
+        with self.condition:
+            entry = self.entries.get(game_id)
+            if entry is None or entry[3] != phase or entry[0] <= due_at:
+                return False
+            self.schedule(game_id, phase, due_at)
+            return True
+    
+    def pending(self) -> Dict[str, Tuple[str, float]]:
+        """Game ID -> (phase, due time) of every pending deadline."""
+        with self.condition:
+            return {game_id: (entry[3], entry[0]) for game_id, entry in self.entries.items()}
+
+    def __contains__(self, game_id: str) -> bool:
+        return game_id in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _discard(self, game_id: str) -> Optional[list]:
+        entry = self.entries.pop(game_id, None)
+        if entry is None:
+            return None
+        entry[2] = None
+        self.dead += 1
+        if self.dead > 64 and self.dead > len(self.entries):
+            self.heap = [live for live in self.heap if live[2] is not None]
+            heapq.heapify(self.heap)
+            self.dead = 0
+        return entry
+
+    def _ensure_thread(self):
+        # Forked children don't inherit the thread, start one per process
+        if self.thread_pid != os.getpid():
+            self.thread_pid = os.getpid()
+            threading.Thread(target=self._run, name='phase-scheduler', daemon=True).start()
+
+    def _take_due(self) -> Dict[str, str]:
+        heap = self.heap
+        due = {}
+        cutoff = time.time() + self.batch_window
+        while heap and (heap[0][2] is None or heap[0][0] <= cutoff):
+            _, _, game_id, phase = heapq.heappop(heap)
+            if game_id is None:
+                self.dead -= 1
+                continue
+            del self.entries[game_id]
+            due[game_id] = phase
+        return due
+
+    def _run(self):
+        while True:
+            with self.condition:
+                due = self._take_due()
+                while not due:
+                    timeout = max(0.0, self.heap[0][0] - time.time()) if self.heap else None
+                    self.condition.wait(timeout)
+                    due = self._take_due()
+            try:
+                self.executor.submit(self.fire, due)
+            except Exception as e:
+                print(f"Error firing phase deadlines of {len(due)} games: {e}")
+                if self.on_error:
+                    self.on_error(e)
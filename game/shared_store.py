@@ -0,0 +1,689 @@
+import bisect
+import os
+import struct
+import tempfile
+import threading
+import time
+import logging
+import zlib
+from contextlib import ExitStack, contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Iterable, List, Optional, Tuple
+from game.storage import GameStorage
+
+try:
+    import fcntl  # Cross-process record locks (POSIX only)
+except ImportError:
+    fcntl = None
+
+# Segment layout: header, timer owner table, one timer lease per directory
+# entry, fixed-size directory of game entries, then a heap holding one extent
+# per game record. When the heap fills up, overflow segments named
+# "<name>.1", "<name>.2", ... are added; each starts with its own small
+# header and is attached lazily by the other processes. Released extents are
+# chained into a free list stored in the extents themselves, ordered by
+# address so neighbours can be merged.
+MAGIC = b'WWG2'
+HEADER = struct.Struct('<4sIIIQQIIQ')  # magic, layout version, max games, free extents, heap start, heap top, segments,
+                                       # first free extent's segment and offset (0: none)
+HEADER_SIZE = 64
+ENTRY = struct.Struct('<16sBB2xQQII4x')  # game id, state, segment, version, offset, length, capacity
+TIMER_OWNER = struct.Struct('<32sd')  # owner name, last heartbeat
+TIMER_LEASE = struct.Struct('<16sH')  # game id, owner slot + 1 (0: no owner)
+FREE_EXTENT = struct.Struct('<QI4xQ')  # capacity, next free extent's segment and offset (0: end of list)
+MAX_TIMER_OWNERS = 64
+LAYOUT_VERSION = 4
+
+OVERFLOW_MAGIC = b'WWGX'
+OVERFLOW_HEADER = struct.Struct('<4s4xQQ')  # magic, segment size, heap top
+OVERFLOW_HEADER_SIZE = 32
+
+ENTRY_EMPTY = 0  # Unused directory slot
+ENTRY_USED = 1   # Slot holds a game record
+
+MIN_EXTENT = 128
+
+# Byte 0 of the lock file guards the directory, games hash to the bytes after
+# it (up to 2**32) and the timer tables use a byte past all of them
+DIRECTORY_LOCK_OFFSET = 0
+TIMERS_LOCK_OFFSET = 1 << 33
+
+
+def _untrack(shm: shared_memory.SharedMemory):
+    """
+    Stop multiprocessing's resource tracker from unlinking the segment when
+    this process exits; other backends may still be using it.
+    """
+    try:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+
+
+class GameLockTable:
+    """
+    Per-game locks shared by every backend process on the host.
+
+    Each game maps to one byte of a lock file in /dev/shm which is locked with
+    POSIX record locks, so independently started processes coordinate. A thread
+    lock per game serialises the threads inside a process, since record locks
+    are held per process.
+    """
+
+    def __init__(self, name: str):
+        base_dir = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+        self.path = os.path.join(base_dir, name + '.locks')
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600) if fcntl else None
+        self.closed = False
+        self.thread_locks: Dict[int, threading.Lock] = {}
+        self.meta_lock = threading.Lock()
+
+    @staticmethod
+    def _offset(game_id: str) -> int:
+        return 1 + zlib.crc32(game_id.encode('utf-8'))
+
+    @contextmanager
+    def _hold(self, offset: int, shared: bool):
+        # Without the file the lock would only hold within this process
+        if self.closed:
+            raise ValueError(f"Lock table {self.path} is closed")
+        with self.meta_lock:
+            lock = self.thread_locks.get(offset)
+            if lock is None:
+                lock = self.thread_locks[offset] = threading.Lock()
+
+        with lock:
+            if self.fd is not None:
+                fcntl.lockf(self.fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX, 1, offset)
+            try:
+                yield
+            finally:
+                if self.fd is not None:
+                    fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, offset)
+
+    def game(self, game_id: str, shared: bool = False):
+        """Lock a single game; shared locks allow concurrent readers in other processes."""
+        return self._hold(self._offset(game_id), shared)
+
+    @contextmanager
+    def games(self, game_ids: Iterable[str]):
+        """Lock several games exclusively, in a fixed order so two batches can't deadlock."""
+        with ExitStack() as held:
+            for offset in sorted({self._offset(game_id) for game_id in game_ids}):
+                held.enter_context(self._hold(offset, False))
+            yield
+
+    def directory(self, shared: bool = False):
+        """Lock the directory and heap allocator."""
+        return self._hold(DIRECTORY_LOCK_OFFSET, shared)
+
+    def timers(self):
+        """Lock the timer owner and lease tables."""
+        return self._hold(TIMERS_LOCK_OFFSET, False)
+
+    def close(self):
+        self.closed = True
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def unlink(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class SharedGameStore(GameStorage):
+    """
+    Stores each game as its own record in shared memory.
+
+    Records are addressed through a directory of fixed-size entries carrying
+    the game's version, so a write to one game only touches that game's extent
+    and only needs that game's lock. Callers hold ``lock(game_id)`` around
+    ``read``/``write``/``delete``. The heap grows by adding overflow segments
+    on demand. Falls back to process-local records when shared memory is
+    unavailable.
+    """
+
+    def __init__(self, name: str, size: int, max_games: int = 4096, create: bool = True):
+        self.name = name
+        self.create = create
+        self.size = size
+        self.max_games = max_games
+        self.locks = GameLockTable(name)
+        self.slots: Dict[str, int] = {}  # Cached directory index per game
+        self.shm = None
+        self.segments: List[Optional[shared_memory.SharedMemory]] = []  # Index 0 is the main segment
+        self.segment_lock = threading.Lock()
+        self.local: Optional[Dict[str, Tuple[int, bytes]]] = None
+        self.created = False
+
+        with self.locks.directory():
+            self._attach()
+
+    def _attach(self):
+        """Connect to (or create and format) the shared memory segment."""
+        if not self.create:
+            # Inspecting an existing segment (e.g. from shared_memory_util.py)
+            self.shm = shared_memory.SharedMemory(name=self.name)
+            _untrack(self.shm)
+            self.size = self.shm.size
+            magic, layout, max_games = HEADER.unpack_from(self.shm.buf, 0)[:3]
+            if magic != MAGIC or layout != LAYOUT_VERSION:
+                self.shm.close()
+                raise ValueError("Shared memory has an unknown layout")
+            self.max_games = max_games
+            self.segments = [self.shm]
+            return
+
+        try:
+            try:
+                self.shm = shared_memory.SharedMemory(name=self.name)
+                logging.info("Connected to existing shared memory")
+            except FileNotFoundError:
+                self.shm = shared_memory.SharedMemory(name=self.name, create=True, size=self.size)
+                logging.info("Created new shared memory")
+            _untrack(self.shm)
+            self.size = self.shm.size
+            self.segments = [self.shm]
+
+            magic, layout, max_games = HEADER.unpack_from(self.shm.buf, 0)[:3]
+            if magic != MAGIC or layout != LAYOUT_VERSION:
+                if magic != b'\x00' * 4:
+                    logging.warning("Reformatting shared memory with an unknown layout")
+                self._format()
+            else:
+                self.max_games = max_games
+        except Exception as e:
+            logging.error(f"Failed to set up shared memory, using process-local storage: {e}")
+            if self.shm:
+                self.shm.close()
+            self.shm = None
+            self.segments = []
+            self.local = {}
+            self.created = True
+
+    def _format(self):
+        """Write an empty header, timer tables and directory."""
+        heap_start = self._directory_start() + self.max_games * ENTRY.size
+        self.shm.buf[:heap_start] = bytes(heap_start)
+        HEADER.pack_into(self.shm.buf, 0, MAGIC, LAYOUT_VERSION, self.max_games, 0, heap_start, heap_start, 1, 0, 0)
+        self.created = True
+
+    def _header(self) -> Tuple:
+        return HEADER.unpack_from(self.shm.buf, 0)
+
+    def _set_header(self, free_extents: Optional[int] = None, heap_top: Optional[int] = None,
+                    segment_count: Optional[int] = None, free_head: Optional[Tuple[int, int]] = None):
+        """Update the given header fields, keeping the others."""
+        _, _, _, current_free, heap_start, current_top, current_count, head_segment, head_offset = self._header()
+        if free_head is not None:
+            head_segment, head_offset = free_head
+        HEADER.pack_into(self.shm.buf, 0, MAGIC, LAYOUT_VERSION, self.max_games,
+                         current_free if free_extents is None else free_extents, heap_start,
+                         current_top if heap_top is None else heap_top,
+                         current_count if segment_count is None else segment_count, head_segment, head_offset)
+
+    def _segment_name(self, segment: int) -> str:
+        return f"{self.name}.{segment}"
+
+    def _segment(self, segment: int) -> shared_memory.SharedMemory:
+        """Return an attached segment, attaching overflow segments created by other processes."""
+        if segment < len(self.segments) and self.segments[segment] is not None:
+            return self.segments[segment]
+
+        with self.segment_lock:
+            while len(self.segments) <= segment:
+                self.segments.append(None)
+            if self.segments[segment] is None:
+                shm = shared_memory.SharedMemory(name=self._segment_name(segment))
+                _untrack(shm)
+                self.segments[segment] = shm
+            return self.segments[segment]
+
+    def _create_segment(self, segment: int, size: int) -> shared_memory.SharedMemory:
+        """Create and format an overflow segment. Caller holds the directory lock."""
+        try:
+            shm = shared_memory.SharedMemory(name=self._segment_name(segment), create=True, size=size)
+        except FileExistsError:
+            # Left behind by a store that was unlinked without its overflow segments
+            stale = shared_memory.SharedMemory(name=self._segment_name(segment))
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=self._segment_name(segment), create=True, size=size)
+        _untrack(shm)
+        OVERFLOW_HEADER.pack_into(shm.buf, 0, OVERFLOW_MAGIC, shm.size, OVERFLOW_HEADER_SIZE)
+
+        with self.segment_lock:
+            while len(self.segments) <= segment:
+                self.segments.append(None)
+            old = self.segments[segment]
+            self.segments[segment] = shm
+        if old is not None:
+            old.close()
+        logging.info(f"Added shared memory segment {self._segment_name(segment)} ({shm.size} bytes)")
+        return shm
+
+    @staticmethod
+    def _owner_pos(slot: int) -> int:
+        return HEADER_SIZE + slot * TIMER_OWNER.size
+
+    def _lease_pos(self, index: int) -> int:
+        return self._owner_pos(MAX_TIMER_OWNERS) + index * TIMER_LEASE.size
+
+    def _directory_start(self) -> int:
+        return self._lease_pos(self.max_games)
+
+    def _entry_pos(self, index: int) -> int:
+        return self._directory_start() + index * ENTRY.size
+
+    def _read_entry(self, index: int) -> Tuple:
+        return ENTRY.unpack_from(self.shm.buf, self._entry_pos(index))
+
+    def _write_entry(self, index: int, game_key: bytes, state: int, segment: int, version: int,
+                     offset: int, length: int, capacity: int):
+        ENTRY.pack_into(self.shm.buf, self._entry_pos(index), game_key, state, segment,
+                        version, offset, length, capacity)
+
+    def _directory(self) -> bytes:
+        start = self._directory_start()
+        return bytes(self.shm.buf[start:start + self.max_games * ENTRY.size])
+
+    @staticmethod
+    def _key(game_id: str) -> bytes:
+        key = game_id.encode('utf-8')
+        if len(key) > 16:
+            raise ValueError(f"Game ID too long for shared memory: {game_id}")
+        return key.ljust(16, b'\x00')
+
+    def _find(self, game_id: str) -> Optional[int]:
+        """Locate a game's directory entry, using the cached index when still valid."""
+        try:
+            key = self._key(game_id)
+        except ValueError:
+            return None  # Never stored: only writes reject IDs that don't fit
+        index = self.slots.get(game_id)
+        if index is not None:
+            entry = self._read_entry(index)
+            if entry[0] == key and entry[1] == ENTRY_USED:
+                return index
+
+        directory = self._directory()
+        pos = directory.find(key)
+        while pos != -1:
+            if pos % ENTRY.size == 0:
+                index = pos // ENTRY.size
+                if self._read_entry(index)[1] == ENTRY_USED:
+                    self.slots[game_id] = index
+                    return index
+            pos = directory.find(key, pos + 1)
+
+        self.slots.pop(game_id, None)
+        return None
+
+    def lock(self, game_id: str, shared: bool = False):
+        """Lock a game across threads and processes."""
+        return self.locks.game(game_id, shared)
+
+    def version(self, game_id: str) -> Optional[int]:
+        """Current version of a game's record, or None if it doesn't exist."""
+        if self.local is not None:
+            record = self.local.get(game_id)
+            return record[0] if record else None
+
+        index = self._find(game_id)
+        return self._read_entry(index)[3] if index is not None else None
+
+    def read(self, game_id: str) -> Optional[Tuple[int, bytes]]:
+        """Return (version, data) for a game. Caller holds the game's lock."""
+        if self.local is not None:
+            return self.local.get(game_id)
+
+        index = self._find(game_id)
+        if index is None:
+            return None
+
+        _, _, segment, version, offset, length, _ = self._read_entry(index)
+        return version, bytes(self._segment(segment).buf[offset:offset + length])
+
+    def write(self, game_id: str, data: bytes, version: int) -> bool:
+        """Store a game's record at the given version. Caller holds the game's lock."""
+        if self.local is not None:
+            self.local[game_id] = (version, data)
+            return True
+
+        key = self._key(game_id)
+        index = self._find(game_id)
+        if index is not None:
+            _, _, segment, _, offset, _, capacity = self._read_entry(index)
+            if len(data) <= capacity:
+                # Fits the game's current extent: no allocator involvement
+                self._segment(segment).buf[offset:offset + len(data)] = data
+                self._write_entry(index, key, ENTRY_USED, segment, version, offset, len(data), capacity)
+                return True
+
+        with self.locks.directory():
+            extent = self._allocate(len(data))
+            if extent is None:
+                logging.error(f"No shared memory left for game {game_id} ({len(data)} bytes)")
+                return False
+
+            new_segment, new_offset, new_capacity = extent
+            if index is None:
+                index = self._claim_slot()
+                if index is None:
+                    self._release(new_segment, new_offset, new_capacity)
+                    logging.error(f"Shared memory directory full, cannot store game {game_id}")
+                    return False
+            else:
+                _, _, old_segment, _, old_offset, _, old_capacity = self._read_entry(index)
+                self._release(old_segment, old_offset, old_capacity)
+
+            self._segment(new_segment).buf[new_offset:new_offset + len(data)] = data
+            self._write_entry(index, key, ENTRY_USED, new_segment, version, new_offset, len(data), new_capacity)
+            self.slots[game_id] = index
+        return True
+
+    def delete(self, game_id: str) -> bool:
+        """Remove a game's record. Caller holds the game's lock."""
+        if self.local is not None:
+            return self.local.pop(game_id, None) is not None
+
+        index = self._find(game_id)
+        if index is None:
+            return False
+
+        with self.locks.directory():
+            _, _, segment, _, offset, _, capacity = self._read_entry(index)
+            self._write_entry(index, bytes(16), ENTRY_EMPTY, 0, 0, 0, 0, 0)
+            TIMER_LEASE.pack_into(self.shm.buf, self._lease_pos(index), bytes(16), 0)
+            self._release(segment, offset, capacity)
+
+        self.slots.pop(game_id, None)
+        return True
+
+    def _allocate(self, size: int) -> Optional[Tuple[int, int, int]]:
+        """
+        Find an extent for ``size`` bytes: best-fit free extent (split when
+        the rest is worth keeping), else the top of the main heap, else the top
+        of an overflow segment, else a new segment. Returns (segment, offset,
+        capacity). Caller holds the directory lock.
+        """
+        capacity = MIN_EXTENT
+        while capacity < size:
+            capacity *= 2
+
+        extents = self._free_list()
+        best = None
+        for i, (_, _, free_capacity) in enumerate(extents):
+            if free_capacity >= capacity and (best is None or free_capacity < extents[best][2]):
+                best = i
+        if best is not None:
+            segment, offset, free_capacity = extents[best]
+            if free_capacity - capacity >= MIN_EXTENT:
+                extents[best] = (segment, offset + capacity, free_capacity - capacity)
+            else:
+                del extents[best]
+                capacity = free_capacity
+            self._set_free_list(extents)
+            return segment, offset, capacity
+
+        _, _, _, _, _, heap_top, segment_count, _, _ = self._header()
+        if heap_top + capacity <= self.size:
+            self._set_header(heap_top=heap_top + capacity)
+            return 0, heap_top, capacity
+
+        for segment in range(1, segment_count):
+            buf = self._segment(segment).buf
+            _, segment_size, segment_top = OVERFLOW_HEADER.unpack_from(buf, 0)
+            if segment_top + capacity <= segment_size:
+                OVERFLOW_HEADER.pack_into(buf, 0, OVERFLOW_MAGIC, segment_size, segment_top + capacity)
+                return segment, segment_top, capacity
+
+        # Everything is full: grow by another segment, big enough for this record
+        try:
+            shm = self._create_segment(segment_count, max(self.size, OVERFLOW_HEADER_SIZE + capacity))
+        except Exception as e:
+            logging.error(f"Failed to add shared memory segment: {e}")
+            return None
+
+        OVERFLOW_HEADER.pack_into(shm.buf, 0, OVERFLOW_MAGIC, shm.size, OVERFLOW_HEADER_SIZE + capacity)
+        self._set_header(segment_count=segment_count + 1)
+        return segment_count, OVERFLOW_HEADER_SIZE, capacity
+
+    def _claim_slot(self) -> Optional[int]:
+        """Find an empty directory entry."""
+        for index, entry in enumerate(struct.iter_unpack(ENTRY.format, self._directory())):
+            if entry[1] == ENTRY_EMPTY:
+                return index
+        return None
+
+    def _free_list(self) -> List[Tuple[int, int, int]]:
+        """Free extents as (segment, offset, capacity), in address order. Caller holds the directory lock."""
+        extents = []
+        segment, offset = self._header()[7:9]
+        while offset:
+            capacity, next_segment, next_offset = FREE_EXTENT.unpack_from(self._segment(segment).buf, offset)
+            extents.append((segment, offset, capacity))
+            segment, offset = next_segment, next_offset
+        return extents
+
+    def _set_free_list(self, extents: List[Tuple[int, int, int]]):
+        """Relink the free list through ``extents``. Caller holds the directory lock."""
+        next_segment, next_offset = 0, 0
+        for segment, offset, capacity in reversed(extents):
+            FREE_EXTENT.pack_into(self._segment(segment).buf, offset, capacity, next_segment, next_offset)
+            next_segment, next_offset = segment, offset
+        self._set_header(free_extents=len(extents), free_head=(next_segment, next_offset))
+
+    def _heap_top(self, segment: int) -> int:
+        if segment == 0:
+            return self._header()[5]
+        return OVERFLOW_HEADER.unpack_from(self._segment(segment).buf, 0)[2]
+
+    def _set_heap_top(self, segment: int, top: int):
+        if segment == 0:
+            self._set_header(heap_top=top)
+        else:
+            buf = self._segment(segment).buf
+            _, segment_size, _ = OVERFLOW_HEADER.unpack_from(buf, 0)
+            OVERFLOW_HEADER.pack_into(buf, 0, OVERFLOW_MAGIC, segment_size, top)
+
+    def _release(self, segment: int, offset: int, capacity: int):
+        """
+        Return an extent to the free list, merged with the free extents either
+        side of it. An extent that ends at its segment's heap top lowers the
+        top instead. Caller holds the directory lock.
+        """
+        extents = self._free_list()
+        i = bisect.bisect_left(extents, (segment, offset))
+        if i < len(extents) and extents[i][:2] == (segment, offset + capacity):
+            capacity += extents.pop(i)[2]
+        if i > 0 and extents[i - 1][0] == segment and extents[i - 1][1] + extents[i - 1][2] == offset:
+            i -= 1
+            _, offset, previous = extents.pop(i)
+            capacity += previous
+
+        if offset + capacity == self._heap_top(segment):
+            self._set_heap_top(segment, offset)
+        else:
+            extents.insert(i, (segment, offset, capacity))
+        self._set_free_list(extents)
+
+    def _owner_slot(self, owner: str, now: float) -> int:
+        """
+        ``owner``'s slot in the owner table, recording a heartbeat. An owner
+        without one takes a free slot, else the one longest without a
+        heartbeat, whose leases are dropped. Caller holds the timers lock.
+        """
+        name = owner.encode('utf-8')[:32].ljust(32, b'\x00')
+        buf = self.shm.buf
+        stalest = None
+        for slot in range(MAX_TIMER_OWNERS):
+            pos = self._owner_pos(slot)
+            slot_name, beat = TIMER_OWNER.unpack_from(buf, pos)
+            if slot_name == name:
+                TIMER_OWNER.pack_into(buf, pos, name, now)
+                return slot
+            if stalest is None or beat < stalest[1]:
+                stalest = (slot, beat)
+
+        slot, beat = stalest
+        if beat > now - 60:
+            raise RuntimeError(f"Timer owner table full ({MAX_TIMER_OWNERS} live owners)")
+        for index in range(self.max_games):
+            if TIMER_LEASE.unpack_from(buf, self._lease_pos(index))[1] == slot + 1:
+                TIMER_LEASE.pack_into(buf, self._lease_pos(index), bytes(16), 0)
+        TIMER_OWNER.pack_into(buf, self._owner_pos(slot), name, now)
+        return slot
+
+    def heartbeat(self, owner: str):
+        if self.local is not None:
+            return GameStorage.heartbeat(self, owner)
+        with self.locks.timers():
+            self._owner_slot(owner, time.time())
+
+    def claim_timers(self, owner: str, game_ids: List[str], ttl: float) -> List[str]:
+        """Leases sit next to the directory entries, one lookup per game."""
+        if self.local is not None:
+            return GameStorage.claim_timers(self, owner, game_ids, ttl)
+
+        held = []
+        buf = self.shm.buf
+        with self.locks.timers():
+            now = time.time()
+            mark = self._owner_slot(owner, now) + 1
+            beats = [TIMER_OWNER.unpack_from(buf, self._owner_pos(slot))[1]
+                     for slot in range(MAX_TIMER_OWNERS)]
+            for game_id in game_ids:
+                index = self._find(game_id)
+                if index is None:
+                    continue
+                key = self._key(game_id)
+                lease_key, holder = TIMER_LEASE.unpack_from(buf, self._lease_pos(index))
+                if lease_key != key or holder == 0 or holder == mark or beats[holder - 1] < now - ttl:
+                    TIMER_LEASE.pack_into(buf, self._lease_pos(index), key, mark)
+                    held.append(game_id)
+        return held
+
+    def release_timers(self, owner: str, game_ids: List[str]):
+        if self.local is not None:
+            return GameStorage.release_timers(self, owner, game_ids)
+
+        buf = self.shm.buf
+        with self.locks.timers():
+            mark = self._owner_slot(owner, time.time()) + 1
+            for game_id in game_ids:
+                index = self._find(game_id)
+                if index is not None and TIMER_LEASE.unpack_from(buf, self._lease_pos(index)) == (self._key(game_id), mark):
+                    TIMER_LEASE.pack_into(buf, self._lease_pos(index), bytes(16), 0)
+
+    def timer_owners(self) -> Dict[str, Dict]:
+        if self.local is not None:
+            return GameStorage.timer_owners(self)
+
+        buf = self.shm.buf
+        with self.locks.timers():
+            owners = [TIMER_OWNER.unpack_from(buf, self._owner_pos(slot))
+                      for slot in range(MAX_TIMER_OWNERS)]
+            leases = struct.iter_unpack(TIMER_LEASE.format, bytes(buf[self._lease_pos(0):self._directory_start()]))
+            counts = [0] * (MAX_TIMER_OWNERS + 1)
+            for _, holder in leases:
+                counts[holder] += 1
+        return {name.rstrip(b'\x00').decode('utf-8', 'replace'): {'heartbeat': beat, 'games': counts[slot + 1]}
+                for slot, (name, beat) in enumerate(owners) if name.strip(b'\x00')}
+
+    def game_ids(self) -> List[str]:
+        """IDs of all stored games."""
+        if self.local is not None:
+            return list(self.local.keys())
+
+        with self.locks.directory(shared=True):
+            directory = self._directory()
+
+        return [
+            entry[0].rstrip(b'\x00').decode('utf-8')
+            for entry in struct.iter_unpack(ENTRY.format, directory)
+            if entry[1] == ENTRY_USED
+        ]
+
+    def stats(self) -> Dict:
+        """Usage and headroom figures for monitoring."""
+        if self.local is not None:
+            return {'games': len(self.local), 'shared': False}
+
+        with self.locks.directory(shared=True):
+            _, _, max_games, _, heap_start, heap_top, segment_count, _, _ = self._header()
+            entries = list(struct.iter_unpack(ENTRY.format, self._directory()))
+            free = [capacity for _, _, capacity in self._free_list()]
+            segments = [{
+                'name': self.name,
+                'size': self.size,
+                'heap_size': self.size - heap_start,
+                'heap_used': heap_top - heap_start
+            }]
+            for segment in range(1, segment_count):
+                _, segment_size, segment_top = OVERFLOW_HEADER.unpack_from(self._segment(segment).buf, 0)
+                segments.append({
+                    'name': self._segment_name(segment),
+                    'size': segment_size,
+                    'heap_size': segment_size - OVERFLOW_HEADER_SIZE,
+                    'heap_used': segment_top - OVERFLOW_HEADER_SIZE
+                })
+
+        used = [e for e in entries if e[1] == ENTRY_USED]
+        free_bytes = sum(free)
+        heap_size = sum(s['heap_size'] for s in segments)
+        heap_used = sum(s['heap_used'] for s in segments)
+        return {
+            'shared': True,
+            'games': len(used),
+            'max_games': max_games,
+            'segments': segments,
+            'segment_size': sum(s['size'] for s in segments),
+            'heap_size': heap_size,
+            'heap_used': heap_used,
+            'data_bytes': sum(e[5] for e in used),
+            # Free extents live in the heap, so they take no directory slots
+            'free_extents': len(free),
+            'free_extent_slots': 0,
+            'free_bytes': free_bytes,
+            'largest_free_extent': max(free, default=0),
+            # Bytes that can still be allocated before another segment is needed
+            'headroom_bytes': heap_size - heap_used + free_bytes,
+            'headroom_games': max_games - len(used),
+        }
+
+    def close(self):
+        for shm in self.segments:
+            if shm is not None:
+                shm.close()
+        self.segments = []
+        self.shm = None
+        self.locks.close()
+
+    def unlink(self):
+        """Close and remove every segment and the lock file."""
+        if self.shm:
+            segment_count = self._header()[6]
+            for segment in range(1, segment_count):
+                try:
+                    self._segment(segment)
+                except FileNotFoundError:
+                    pass
+
+            for shm in self.segments:
+                if shm is None:
+                    continue
+                shm.close()
+                # unlink() unregisters from the resource tracker, so register back first
+                resource_tracker.register(shm._name, 'shared_memory')
+                try:
+                    shm.unlink()
+                except FileNotFoundError:
+                    pass
+            self.segments = []
+            self.shm = None
+        self.locks.close()
+        self.locks.unlink()
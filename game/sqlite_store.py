@@ -0,0 +1,280 @@
+import os
+import sqlite3
+import threading
+import time
+import logging
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Tuple
+from game.codec import peek_header
+from game.shared_store import GameLockTable
+from game.storage import GameStorage
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS games (
+        id TEXT PRIMARY KEY,
+        version INTEGER NOT NULL,
+        phase TEXT NOT NULL,
+        phase_end REAL,
+        started INTEGER NOT NULL,
+        ended INTEGER NOT NULL,
+        winner TEXT,
+        player_count INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        data BLOB NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS games_by_state ON games (ended, started, updated_at)",
+    "CREATE INDEX IF NOT EXISTS games_by_phase_end ON games (phase_end) WHERE phase_end IS NOT NULL",
+    "CREATE TABLE IF NOT EXISTS timer_owners (owner TEXT PRIMARY KEY, heartbeat REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS timer_leases (game_id TEXT PRIMARY KEY, owner TEXT NOT NULL)",
+)
+
+# Statements are fixed strings so sqlite3's per-connection statement cache
+# prepares each one once and reuses it
+SELECT_RECORD = "SELECT version, data FROM games WHERE id = ?"
+SELECT_VERSION = "SELECT version FROM games WHERE id = ?"
+SELECT_IDS = "SELECT id FROM games"
+SELECT_HEADER = ("SELECT phase, phase_end, started, ended, winner, version, created_at, updated_at, player_count "
+                 "FROM games WHERE id = ?")
+SELECT_HEADERS = ("SELECT id, phase, phase_end, started, ended, winner, version, created_at, updated_at, player_count "
+                  "FROM games")
+UPSERT = """INSERT INTO games (id, version, phase, phase_end, started, ended, winner, player_count,
+                               created_at, updated_at, data)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET
+                version = excluded.version, phase = excluded.phase, phase_end = excluded.phase_end,
+                started = excluded.started, ended = excluded.ended, winner = excluded.winner,
+                player_count = excluded.player_count, updated_at = excluded.updated_at, data = excluded.data"""
+COMPARE_AND_SWAP = """UPDATE games SET version = ?, phase = ?, phase_end = ?, started = ?, ended = ?, winner = ?,
+                          player_count = ?, updated_at = ?, data = ?
+                      WHERE id = ? AND version = ?"""
+DELETE = "DELETE FROM games WHERE id = ?"
+HEARTBEAT = """INSERT INTO timer_owners (owner, heartbeat) VALUES (?, ?)
+               ON CONFLICT (owner) DO UPDATE SET heartbeat = excluded.heartbeat"""
+# Taken if free, already the claimant's, or held by an owner that stopped heartbeating
+CLAIM_TIMER = """INSERT INTO timer_leases (game_id, owner) VALUES (?, ?)
+                 ON CONFLICT (game_id) DO UPDATE SET owner = excluded.owner
+                 WHERE timer_leases.owner = excluded.owner
+                    OR NOT EXISTS (SELECT 1 FROM timer_owners
+                                   WHERE timer_owners.owner = timer_leases.owner AND heartbeat >= ?)"""
+RELEASE_TIMER = "DELETE FROM timer_leases WHERE game_id = ? AND owner = ?"
+DELETE_TIMER = "DELETE FROM timer_leases WHERE game_id = ?"
+# Leases left behind by games deleted before delete() dropped them too
+PRUNE_TIMERS = "DELETE FROM timer_leases WHERE game_id NOT IN (SELECT id FROM games)"
+SELECT_TIMER_OWNERS = """SELECT o.owner, o.heartbeat, COUNT(l.game_id) FROM timer_owners o
+                         LEFT JOIN timer_leases l ON l.owner = o.owner GROUP BY o.owner"""
+
+
+def _header_row(header: Dict) -> Tuple:
+    return (header['phase'], header['phase_end'], int(header['started']), int(header['ended']),
+            header['winner'], header['player_count'])
+
+
+class SQLiteGameStore(GameStorage):
+    """
+    Stores each game as one row of an SQLite database in WAL mode.
+
+    Readers in any process see the last committed record without blocking
+    writers, every write is its own transaction, and header fields are kept
+    in indexed columns so listings don't touch the record blobs.
+    """
+
+    _busy_timeout_ms = 5000
+    _synchronous = 'NORMAL'  # WAL + NORMAL: durable across process crashes, may lose the last commits on power loss
+
+    def __init__(self, path: str):
+        self.path = path
+        self.locks = GameLockTable(os.path.basename(path) + '.sqlite')
+        self.local = threading.local()
+        # Every thread's connection, so close() reaches the ones other threads opened
+        self.connections: List[Tuple[int, sqlite3.Connection]] = []  # (pid, connection)
+        self.connections_lock = threading.Lock()
+        self.closed = False
+
+        conn = self._connection()
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'games'").fetchone()
+        for statement in SCHEMA:
+            conn.execute(statement)
+        conn.execute(PRUNE_TIMERS)
+        self.created = exists is None
+
+    def _connection(self) -> sqlite3.Connection:
+        """This thread's connection (connections can't be shared across threads or forks)."""
+        if self.closed:
+            raise ValueError(f"SQLite store {self.path} is closed")
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=self._busy_timeout_ms / 1000,
+                                   check_same_thread=False, cached_statements=32)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self._synchronous}")
+            conn.execute(f"PRAGMA busy_timeout={self._busy_timeout_ms}")
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+            with self.connections_lock:
+                self.connections.append((os.getpid(), conn))
+        return conn
+
+    def lock(self, game_id: str, shared: bool = False):
+        # Reads run against a consistent WAL snapshot, only writers need to coordinate
+        if shared:
+            return nullcontext()
+        return self.locks.game(game_id)
+
+    def version(self, game_id: str) -> Optional[int]:
+        row = self._connection().execute(SELECT_VERSION, (game_id,)).fetchone()
+        return row[0] if row else None
+
+    def read(self, game_id: str) -> Optional[Tuple[int, bytes]]:
+        row = self._connection().execute(SELECT_RECORD, (game_id,)).fetchone()
+        return (row[0], bytes(row[1])) if row else None
+
+    def write(self, game_id: str, data: bytes, version: int) -> bool:
+        header = peek_header(data)
+        try:
+            self._connection().execute(UPSERT, (
+                game_id, version, *_header_row(header), header['created_at'], header['updated_at'], data
+            ))
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Failed to store game {game_id} in SQLite: {e}")
+            return False
+
+    def compare_and_swap(self, game_id: str, expected_version: int, data: bytes, version: int) -> bool:
+        header = peek_header(data)
+        with self.lock(game_id):
+            cursor = self._connection().execute(COMPARE_AND_SWAP, (
+                version, *_header_row(header), header['updated_at'], data, game_id, expected_version
+            ))
+        return cursor.rowcount == 1
+
+    def compare_and_swap_many(self, swaps: List[Tuple[str, int, bytes, int]]) -> List[bool]:
+        """All swaps in one transaction, so a batch costs a single WAL commit."""
+        conn = self._connection()
+        results = []
+        with self.locks.games(swap[0] for swap in swaps):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for game_id, expected_version, data, version in swaps:
+                    header = peek_header(data)
+                    cursor = conn.execute(COMPARE_AND_SWAP, (
+                        version, *_header_row(header), header['updated_at'], data, game_id, expected_version
+                    ))
+                    results.append(cursor.rowcount == 1)
+                conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                logging.error(f"Failed to store a batch of {len(swaps)} games in SQLite: {e}")
+                return [False] * len(swaps)
+        return results
+
+    def delete(self, game_id: str) -> bool:
+        """Delete the game and its timer lease in one transaction."""
+        conn = self._connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            deleted = conn.execute(DELETE, (game_id,)).rowcount > 0
+            conn.execute(DELETE_TIMER, (game_id,))
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            logging.error(f"Failed to delete game {game_id} from SQLite: {e}")
+            return False
+        return deleted
+
+    def game_ids(self) -> List[str]:
+        return [row[0] for row in self._connection().execute(SELECT_IDS)]
+
+    @staticmethod
+    def _header_dict(row: Tuple) -> Dict:
+        phase, phase_end, started, ended, winner, version, created_at, updated_at, player_count = row
+        return {
+            'phase': phase,
+            'phase_end': phase_end,
+            'started': bool(started),
+            'ended': bool(ended),
+            'winner': winner,
+            'version': version,
+            'created_at': created_at,
+            'updated_at': updated_at,
+            'player_count': player_count
+        }
+
+    def header(self, game_id: str) -> Optional[Dict]:
+        row = self._connection().execute(SELECT_HEADER, (game_id,)).fetchone()
+        return self._header_dict(row) if row else None
+
+    def headers(self) -> Dict[str, Dict]:
+        return {row[0]: self._header_dict(row[1:]) for row in self._connection().execute(SELECT_HEADERS)}
+
+    def heartbeat(self, owner: str):
+        self._connection().execute(HEARTBEAT, (owner, time.time()))
+
+    def claim_timers(self, owner: str, game_ids: List[str], ttl: float) -> List[str]:
+        """All claims in one transaction, so two claimants never both win a game."""
+        conn = self._connection()
+        held = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            conn.execute(HEARTBEAT, (owner, now))
+            for game_id in game_ids:
+                if conn.execute(CLAIM_TIMER, (game_id, owner, now - ttl)).rowcount == 1:
+                    held.append(game_id)
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            logging.error(f"Failed to claim timers of {len(game_ids)} games in SQLite: {e}")
+            return []
+        return held
+
+    def release_timers(self, owner: str, game_ids: List[str]):
+        conn = self._connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(RELEASE_TIMER, [(game_id, owner) for game_id in game_ids])
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            logging.error(f"Failed to release timers of {len(game_ids)} games in SQLite: {e}")
+
+    def timer_owners(self) -> Dict[str, Dict]:
+        return {owner: {'heartbeat': beat, 'games': games}
+                for owner, beat, games in self._connection().execute(SELECT_TIMER_OWNERS)}
+
+    def stats(self) -> Dict:
+        conn = self._connection()
+        games, data_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM games").fetchone()
+        wal_path = self.path + '-wal'
+        return {
+            'backend': 'sqlite',
+            'games': games,
+            'data_bytes': data_bytes,
+            'db_size': os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            'wal_size': os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+        }
+
+    def close(self):
+        """Close every thread's connection and the lock table; using the store afterwards raises ValueError."""
+        self.closed = True
+        with self.connections_lock:
+            connections, self.connections = self.connections, []
+            self.local = threading.local()
+        for pid, conn in connections:
+            # A forked child must leave its parent's connections alone
+            if pid != os.getpid():
+                continue
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logging.error(f"Failed to close an SQLite connection: {e}")
+        self.locks.close()
+
+    def unlink(self):
+        """Close the database. Unlike shared memory it stays on disk for the next start."""
+        self.close()
+        self.locks.unlink()
@@ -0,0 +1,71 @@
+import socket
+import struct
+from typing import Tuple
+
+# Binary protocol between backends and the state service.
+#
+# Every message is one frame: a fixed 12-byte header followed by the game ID
+# and an opaque body. Requests carry a client-chosen ID that the response
+# echoes, so a client may send many requests before reading any response
+# (pipelining); responses on one connection come back in request order.
+# Notifications use request ID 0 and are pushed to subscribed connections
+# whenever a game changes. Record bodies are only accepted in the compact
+# format (codec.is_compact).
+
+FRAME = struct.Struct('<BBIHI')  # kind, op or status, request ID, game ID length, body length
+U64 = struct.Struct('<Q')
+CAS_BODY = struct.Struct('<QQ')  # expected version, new version
+
+KIND_REQUEST = 0
+KIND_RESPONSE = 1
+KIND_NOTIFY = 2
+
+OP_GET = 1
+OP_VERSION = 2
+OP_PUT = 3
+OP_CAS = 4
+OP_DELETE = 5
+OP_LIST = 6
+OP_HEADERS = 7
+OP_LOCK = 8
+OP_UNLOCK = 9
+OP_SUBSCRIBE = 10
+OP_STATS = 11
+# Phase timer leases (see GameStorage.claim_timers); JSON bodies, no game ID
+OP_HEARTBEAT = 12       # owner
+OP_CLAIM_TIMERS = 13    # {"owner", "games", "ttl"} -> games held
+OP_RELEASE_TIMERS = 14  # {"owner", "games"}
+OP_TIMER_OWNERS = 15    # -> owner -> {"heartbeat", "games"}
+OP_AUTH = 16            # shared secret; must be the first request when the service has one
+
+STATUS_OK = 0
+STATUS_NOT_FOUND = 1
+STATUS_CONFLICT = 2  # Version mismatch on compare-and-swap
+STATUS_BUSY = 3      # Game is locked by another connection
+STATUS_ERROR = 4
+
+DELETED = 0  # Version announced for a removed game
+
+
+def pack_frame(kind: int, code: int, request_id: int, game_id: str = '', body: bytes = b'') -> bytes:
+    key = game_id.encode('utf-8')
+    return FRAME.pack(kind, code, request_id, len(key), len(body)) + key + body
+
+
+def recv_exact(sock: socket.socket, size: int) -> bytes:
+    """Read exactly ``size`` bytes, raising ConnectionError if the peer goes away."""
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 65536))
+        if not chunk:
+            raise ConnectionError('Connection closed')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def read_frame(sock: socket.socket) -> Tuple[int, int, int, str, bytes]:
+    """Read one frame as (kind, op or status, request ID, game ID, body)."""
+    kind, code, request_id, key_length, body_length = FRAME.unpack(recv_exact(sock, FRAME.size))
+    payload = recv_exact(sock, key_length + body_length)
+    return kind, code, request_id, payload[:key_length].decode('utf-8'), payload[key_length:]
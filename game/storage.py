@@ -0,0 +1,183 @@
+import threading
+import time
+from typing import ContextManager, Dict, List, Optional, Tuple
+from game.codec import peek_header
+
+_leases_lock = threading.Lock()  # Guards creating GameStorage.local_leases
+
+
+class TimerLeases:
+    """
+    Timer leases kept in this process, for storage no other process shares.
+
+    A game's lease names the one process (its timer owner) that drives the
+    game's phase clock. Owners heartbeat; an owner whose last heartbeat is
+    more than the lease TTL old is presumed dead, and its games can be
+    claimed by anyone.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.heartbeats: Dict[str, float] = {}  # Owner -> last heartbeat
+        self.owners: Dict[str, str] = {}  # Game ID -> owner
+
+    def heartbeat(self, owner: str):
+        with self.lock:
+            self.heartbeats[owner] = time.time()
+
+    def claim(self, owner: str, game_ids: List[str], ttl: float) -> List[str]:
+        with self.lock:
+            now = time.time()
+            self.heartbeats[owner] = now
+            held = []
+            for game_id in game_ids:
+                holder = self.owners.get(game_id)
+                if holder is None or holder == owner or self.heartbeats.get(holder, 0) < now - ttl:
+                    self.owners[game_id] = owner
+                    held.append(game_id)
+            return held
+
+    def release(self, owner: str, game_ids: List[str]):
+        with self.lock:
+            for game_id in game_ids:
+                if self.owners.get(game_id) == owner:
+                    del self.owners[game_id]
+
+    def listing(self) -> Dict[str, Dict]:
+        with self.lock:
+            listing = {owner: {'heartbeat': beat, 'games': 0} for owner, beat in self.heartbeats.items()}
+            for owner in self.owners.values():
+                listing.setdefault(owner, {'heartbeat': None, 'games': 0})['games'] += 1
+            return listing
+
+
+class GameStorage:
+    """
+    Interface for where game records live.
+
+    Records are opaque encoded bytes (see codec.py) stored per game with a
+    version number. Chat messages and votes are part of the record, so they
+    are written through the same versioned ``compare_and_swap``.
+    ``lock(game_id)`` gives a game-level lock shared by every process using
+    the same storage; ``read``/``write``/``delete`` expect the caller to hold it.
+    """
+
+    # True when the storage started out empty and should be seeded from disk
+    created = False
+    # Timer leases for storage that isn't shared between processes
+    local_leases: Optional[TimerLeases] = None
+
+    def lock(self, game_id: str, shared: bool = False) -> ContextManager:
+        """Lock a game across threads and processes."""
+        raise NotImplementedError
+
+    def version(self, game_id: str) -> Optional[int]:
+        """Current version of a game's record, or None if it doesn't exist."""
+        raise NotImplementedError
+
+    def read(self, game_id: str) -> Optional[Tuple[int, bytes]]:
+        """Return (version, data) for a game."""
+        raise NotImplementedError
+
+    def write(self, game_id: str, data: bytes, version: int) -> bool:
+        """Store a game's record at the given version."""
+        raise NotImplementedError
+
+    def delete(self, game_id: str) -> bool:
+        """Remove a game's record."""
+        raise NotImplementedError
+
+    def game_ids(self) -> List[str]:
+        """IDs of all stored games."""
+        raise NotImplementedError
+
+    def read_many(self, game_ids: List[str]) -> Dict[str, Tuple[int, bytes]]:
+        """(version, data) of several games; games that don't exist are left out."""
+        records = {}
+        for game_id in game_ids:
+            with self.lock(game_id, shared=True):
+                record = self.read(game_id)
+            if record is not None:
+                records[game_id] = record
+        return records
+
+    def compare_and_swap(self, game_id: str, expected_version: int, data: bytes, version: int) -> bool:
+        """Write the record only if the game is still at ``expected_version``."""
+        with self.lock(game_id):
+            if self.version(game_id) != expected_version:
+                return False
+            return self.write(game_id, data, version)
+
+    def compare_and_swap_many(self, swaps: List[Tuple[str, int, bytes, int]]) -> List[bool]:
+        """
+        ``compare_and_swap`` for a batch of (game ID, expected version, data,
+        version); each swap succeeds or fails on its own.
+        """
+        return [self.compare_and_swap(*swap) for swap in swaps]
+
+    def header(self, game_id: str) -> Optional[Dict]:
+        """A game's header fields (see codec.peek_header) without decoding the record."""
+        with self.lock(game_id, shared=True):
+            record = self.read(game_id)
+        return peek_header(record[1]) if record else None
+
+    def headers(self) -> Dict[str, Dict]:
+        """Header fields of every game."""
+        headers = {}
+        for game_id in self.game_ids():
+            header = self.header(game_id)
+            if header is not None:
+                headers[game_id] = header
+        return headers
+
+    def stats(self) -> Dict:
+        """Usage figures for monitoring."""
+        return {'games': len(self.game_ids())}
+
+    def _local_leases(self) -> TimerLeases:
+        with _leases_lock:
+            if self.local_leases is None:
+                self.local_leases = TimerLeases()
+            return self.local_leases
+
+    def heartbeat(self, owner: str):
+        """Record that timer owner ``owner`` (a process driving phase timers) is alive."""
+        self._local_leases().heartbeat(owner)
+
+    def claim_timers(self, owner: str, game_ids: List[str], ttl: float) -> List[str]:
+        """
+        Make ``owner`` the timer owner of each game that has none, is already
+        its own, or whose owner's last heartbeat is more than ``ttl`` seconds
+        old (taking over from a dead process). Counts as a heartbeat.
+        Returns the games ``owner`` drives.
+        """
+        return self._local_leases().claim(owner, game_ids, ttl)
+
+    def release_timers(self, owner: str, game_ids: List[str]):
+        """Give up ``owner``'s leases on the given games."""
+        self._local_leases().release(owner, game_ids)
+
+    def timer_owners(self) -> Dict[str, Dict]:
+        """Owner -> last heartbeat and number of games driven, for monitoring."""
+        return self._local_leases().listing()
+
+    def close(self):
+        """Release this process's handles; the stored games stay."""
+
+    def unlink(self):
+        """Close and release the storage at shutdown."""
+        self.close()
+
+
+def create_storage(backend: str, **options) -> GameStorage:
+    """Build the storage backend named ``backend`` ('shared_memory', 'sqlite' or 'remote')."""
+    if backend == 'shared_memory':
+        from game.shared_store import SharedGameStore
+        return SharedGameStore(options['name'], options['size'], options.get('max_games', 4096))
+    if backend == 'sqlite':
+        from game.sqlite_store import SQLiteGameStore
+        return SQLiteGameStore(options['path'])
+    if backend == 'remote':
+        from game.remote_store import RemoteGameStore
+        return RemoteGameStore(*options['address'], secret=options.get('secret'))
+    raise ValueError(f"Unknown storage backend: {backend}")
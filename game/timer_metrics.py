@@ -0,0 +1,116 @@
+import bisect
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+# Bucket upper bounds in milliseconds; anything slower lands in 'inf'
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram of durations. Recording is O(log buckets) and
+    memory stays constant however many samples come in; percentiles are
+    read off the buckets, so they're reported as the bucket's upper bound.
+    """
+
+    def __init__(self):
+        self.counts: List[int] = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        ms = max(0.0, seconds * 1000)
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the ``fraction`` quantile (the max for 'inf')."""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return float(min(bound, self.max))
+        return self.max
+
+    def snapshot(self) -> Dict:
+        buckets = {str(bound): count for bound, count in zip(BUCKETS_MS, self.counts)}
+        buckets['inf'] = self.counts[-1]
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count if self.count else 0.0,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': self.max,
+            'buckets': buckets
+        }
+
+
+class PhaseTimerMetrics:
+    """
+    How late and how slowly this process's phase transitions run.
+
+      wait         phase_end to the start of its resolution (timer and queue delay)
+      lag          phase_end to the commit of the next phase (what players see)
+      resolve      resolving the night or day, per game
+      win_check    checking for a winner, per game
+      next_phase   starting the next phase, per game
+      batch        one end_phases call: load, resolve and commit of a batch
+
+    A transition committed more than ``late_after`` seconds past its
+    phase_end counts as a missed deadline. Counters are per process.
+    """
+
+    HISTOGRAMS = ('wait', 'lag', 'resolve', 'win_check', 'next_phase', 'batch')
+
+    def __init__(self, late_after: float = 1.0, kept_errors: int = 20):
+        self.late_after = late_after
+        self.lock = threading.Lock()
+        self.histograms: Dict[str, Histogram] = {step: Histogram() for step in self.HISTOGRAMS}
+        self.transitions = 0
+        self.late = 0
+        self.errors: Dict[str, int] = {}
+        self.recent_errors = deque(maxlen=kept_errors)
+        self.started_at = time.time()
+
+    def record(self, step: str, seconds: float):
+        with self.lock:
+            self.histograms[step].record(seconds)
+
+    def transition(self, wait: Optional[float], lag: Optional[float], steps: Dict[str, float]):
+        """Record one game's phase transition (no wait or lag when it was ended before its deadline)."""
+        with self.lock:
+            self.transitions += 1
+            if lag is not None:
+                if lag > self.late_after:
+                    self.late += 1
+                self.histograms['wait'].record(wait)
+                self.histograms['lag'].record(lag)
+            for step, seconds in steps.items():
+                self.histograms[step].record(seconds)
+
+    def error(self, source: str, error: Exception):
+        """Count an error raised in ``source`` (e.g. the timer callback) and keep its message."""
+        with self.lock:
+            self.errors[source] = self.errors.get(source, 0) + 1
+            self.recent_errors.append({'time': time.time(), 'source': source, 'error': str(error)})
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            return {
+                'since': self.started_at,
+                'transitions': self.transitions,
+                'late': self.late,
+                'late_after': self.late_after,
+                'errors': dict(self.errors),
+                'recent_errors': list(self.recent_errors),
+                'histograms': {step: histogram.snapshot() for step, histogram in self.histograms.items()}
+            }
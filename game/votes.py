@@ -0,0 +1,113 @@
+from typing import Dict, List, Optional, Tuple
+
+# A vote book keeps one vote per voter with incrementally maintained tallies:
+#
+#   voters   voter ID -> target ID
+#   tally    target ID -> number of votes
+#   buckets  buckets[n] holds the targets with exactly n votes, in the order
+#            they reached n; the last bucket is never empty, so its index is
+#            the leading vote count and the leaders are read off directly
+#
+# Casting, changing or retracting a vote moves one target between adjacent
+# buckets, so every operation is O(1) regardless of lobby size.
+
+
+def new_vote_book() -> Dict:
+    return {'voters': {}, 'tally': {}, 'buckets': [{}]}
+
+
+def _add(book: Dict, target_id: str):
+    tally = book['tally']
+    buckets = book['buckets']
+    count = tally.get(target_id, 0)
+    if count:
+        del buckets[count][target_id]
+    count += 1
+    tally[target_id] = count
+    if count == len(buckets):
+        buckets.append({})
+    buckets[count][target_id] = True
+
+
+def _remove(book: Dict, target_id: str):
+    tally = book['tally']
+    buckets = book['buckets']
+    count = tally[target_id]
+    del buckets[count][target_id]
+    count -= 1
+    if count:
+        tally[target_id] = count
+        buckets[count][target_id] = True
+    else:
+        del tally[target_id]
+    while len(buckets) > 1 and not buckets[-1]:
+        buckets.pop()
+
+
+def cast_vote(book: Dict, voter_id: str, target_id: str) -> Optional[str]:
+    """Record ``voter_id``'s vote, replacing any earlier one. Returns the previous target."""
+    previous = book['voters'].get(voter_id)
+    if previous == target_id:
+        return previous
+    if previous is not None:
+        _remove(book, previous)
+    book['voters'][voter_id] = target_id
+    _add(book, target_id)
+    return previous
+
+
+def retract_vote(book: Dict, voter_id: str) -> Optional[str]:
+    """Withdraw ``voter_id``'s vote. Returns the target it was for."""
+    previous = book['voters'].pop(voter_id, None)
+    if previous is not None:
+        _remove(book, previous)
+    return previous
+
+
+def vote_leaders(book: Dict) -> Tuple[List[str], int]:
+    """Targets with the most votes (in the order they got there) and that vote count."""
+    buckets = book['buckets']
+    top = len(buckets) - 1
+    return list(buckets[top]), top
+
+
+def vote_count(book: Dict, target_id: str) -> int:
+    return book['tally'].get(target_id, 0)
+
+
+def rebuild_vote_book(voters: Dict[str, str], tally: Dict[str, int]) -> Dict:
+    """Rebuild a book from its voters and tally (buckets follow the tally's order)."""
+    book = {'voters': dict(voters), 'tally': {}, 'buckets': [{}]}
+    for target_id, count in tally.items():
+        if count <= 0:
+            continue
+        book['tally'][target_id] = count
+        while len(book['buckets']) <= count:
+            book['buckets'].append({})
+        book['buckets'][count][target_id] = True
+    while len(book['buckets']) > 1 and not book['buckets'][-1]:
+        book['buckets'].pop()
+    return book
+
+
+def as_vote_book(votes: Dict) -> Dict:
+    """
+    Accept a vote book or one of the older vote layouts: werewolf votes as
+    ``{target: count}`` and day votes as ``{target: [voters]}``.
+    """
+    if 'voters' in votes and 'tally' in votes:
+        if 'buckets' in votes:
+            return votes
+        return rebuild_vote_book(votes['voters'], votes['tally'])
+
+    voters = {}
+    tally = {}
+    for target_id, value in votes.items():
+        if isinstance(value, list):
+            for voter_id in value:
+                voters[voter_id] = target_id
+            tally[target_id] = len(value)
+        else:
+            # Counts only: who voted was never recorded
+            tally[target_id] = value
+    return rebuild_vote_book(voters, tally)
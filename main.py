@@ -1,22 +1,39 @@
+import os
 import signal
 import sys
 from server.server_thread_http import Server
 from server.lb_process import Server as ServerLB
-from game.controller import create_app
-from game.game_state import GameStateManager
+from server.state_service import StateService
+from game.storage import create_storage
 import argparse
 
-# Create the Werewolf game application
-app = create_app()
+shutting_down = False
 
 def signal_handler(sig, frame):
     """Handle graceful shutdown on SIGINT/SIGTERM."""
+    global shutting_down
+    # A second signal would interrupt the cleanup below while it holds the
+    # journal and lease locks; let the first one finish instead
+    if shutting_down:
+        return
+    shutting_down = True
+    
+    # Only backends get here, and they've imported these already
+    from game.game_state import GameStateManager
+    from game.phase_timer import phase_timer
+    
     print("\nShutting down server gracefully...")
     
-    # Clean up shared memory
+    # Hand our games' phase timers to the other backends, flush pending
+    # writes to disk and detach from the store. The segment and lock file
+    # stay, since other backends are still attached and take over our
+    # leases through them; `python shared_memory_util.py cleanup` removes
+    # them once every backend is down
     try:
+        phase_timer.release_timers()
         game_manager = GameStateManager()
-        game_manager.cleanup_shared_memory()
+        game_manager.shutdown_flusher()
+        game_manager.store.close()
     except Exception as e:
         print(f"Error during cleanup: {e}")
     
@@ -28,9 +45,10 @@ if __name__ == '__main__':
     parser.add_argument(
         '--type',
         type=str,
-        choices=['backend', 'lb'],
+        choices=['backend', 'lb', 'state'],
         required=True,
-        help="Specify the server type to run: 'backend' for the game server, 'lb' for the load balancer."
+        help="Specify the server type to run: 'backend' for the game server, 'lb' for the load balancer, "
+             "'state' for the state service shared by backends using the 'remote' storage backend."
     )
     parser.add_argument(
         '--port',
@@ -38,8 +56,20 @@ if __name__ == '__main__':
         required=False,
         help="Specify the port number for the server to listen on."
     )
+    parser.add_argument(
+        '--host',
+        type=str,
+        default='127.0.0.1',
+        help="Address the state service listens on. Anything but loopback needs STATE_SERVICE_SECRET set."
+    )
     args = parser.parse_args()
     if args.type == 'backend':
+        # Importing the game modules attaches the store and starts the phase
+        # timer, so only backends do it; the state service and the load
+        # balancer never own game clocks
+        from game.controller import create_app
+        app = create_app()
+        
         # Register signal handlers for graceful shutdown
         signal.signal(signal.SIGINT, signal_handler)
         signal.signal(signal.SIGTERM, signal_handler)
@@ -52,6 +82,7 @@ if __name__ == '__main__':
         print("  POST /games/{id}/action - Perform action")
         print("  POST /games/{id}/vote - Vote")
         print("  POST /games/{id}/chat - Send chat")
+        print("  GET /games/{id}/chat?since={seq} - Chat history")
         print("  GET /games/{id}/state - Get game state")
         print("  GET /games/{id}/player/{pid} - Get player info")
         print("  GET /admin/games - List all games (debug)")
@@ -66,6 +97,18 @@ if __name__ == '__main__':
             Server(app, port).start()
         except KeyboardInterrupt:
             signal_handler(signal.SIGINT, None)
+    elif args.type == 'state':
+        # Records are kept in SQLite so they survive a restart of the service
+        storage = create_storage('sqlite', path='state_service.db')
+        print(f"Starting state service on {args.host}:{args.port or 7000}...")
+        try:
+            service = StateService(storage, args.port or 7000, host=args.host,
+                                   secret=os.environ.get('STATE_SERVICE_SECRET'))
+            service.start()
+            service.join()
+        except KeyboardInterrupt:
+            storage.close()
+            print("\nState service shutting down...")
     elif args.type == 'lb':
         try:
             ServerLB().start()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Report how much memory games take in process: decoded into dicts, as the
+encoded records the storage keeps, and as the headers GameIndex keeps.
+
+Each representation is built from the same encoded records while
+tracemalloc is running, so the figures are what a process holding that many
+games actually allocates.
+
+Usage:
+    python memory_report.py
+    python memory_report.py --games 5000 --players 8 --chat 20
+"""
+
+import argparse
+import time
+import tracemalloc
+from game.codec import encode_game, decode_game, peek_header
+from game.votes import new_vote_book, cast_vote
+
+
+def new_game(game_no: int, players: int, chat: int) -> dict:
+    now = time.time()
+    # Fresh strings per game, as if each game had been decoded separately
+    player_ids = [f"{game_no:04x}{i:04x}" for i in range(players)]
+    day_votes = new_vote_book()
+    for i, player_id in enumerate(player_ids[:players // 2]):
+        cast_vote(day_votes, player_id, player_ids[-1 - i % 2])
+    return {
+        'phase': 'day' if chat else 'setup',
+        'phase_end': now + 300 if chat else None,
+        'players': {
+            player_id: {'name': f"Player {i}", 'role': 'villager' if chat else None, 'alive': True,
+                        'vote': None, 'joined_at': now}
+            for i, player_id in enumerate(player_ids)
+        },
+        'actions': {'werewolf_votes': new_vote_book(), 'seer_target': None, 'day_votes': day_votes},
+        'seer_history': [],
+        'chat': [
+            {'player': player_ids[i % players], 'message': f"message {i}", 'time': now, 'seq': i}
+            for i in range(chat)
+        ],
+        'chat_seq': chat,
+        'chat_buckets': {player_id: [3.0, now] for player_id in player_ids[:chat]},
+        'created_at': now,
+        'updated_at': now,
+        'started': bool(chat),
+        'ended': False,
+        'winner': None,
+        'version': 1
+    }
+
+
+def measure(build) -> int:
+    """Bytes still allocated by the object ``build`` returns."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return after - before
+
+
+def report(label: str, records: list):
+    count = len(records)
+    sizes = {
+        # Re-encoded so the list holds fresh copies rather than the inputs
+        'records': measure(lambda: [encode_game(decode_game(data)) for data in records]),
+        'dicts': measure(lambda: [decode_game(data) for data in records]),
+        'headers': measure(lambda: [peek_header(data) for data in records])
+    }
+    print(f"\n{label} ({count} games)")
+    for name, size in sizes.items():
+        print(f"  {name:<8} {size / count:>10,.0f} bytes/game  {size / 1024 / 1024:>8.2f} MiB")
+    print(f"  records use {sizes['records'] / sizes['dicts']:.0%} of the dict size")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-game memory of the in-process game representations')
+    parser.add_argument('--games', type=int, default=2000)
+    parser.add_argument('--players', type=int, default=8)
+    parser.add_argument('--chat', type=int, default=20, help='Chat messages in each active game')
+    args = parser.parse_args()
+
+    lobbies = [encode_game(new_game(i, args.players // 2, 0)) for i in range(args.games)]
+    active = [encode_game(new_game(i, args.players, args.chat)) for i in range(args.games)]
+    report(f"Idle lobbies, {args.players // 2} players", lobbies)
+    report(f"Games in progress, {args.players} players, {args.chat} chat messages", active)
+
+
+if __name__ == '__main__':
+    main()
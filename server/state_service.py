@@ -0,0 +1,225 @@
+import hmac
+import json
+import ipaddress
+import socket
+import threading
+import logging
+import zlib
+from typing import Dict, Optional
+from game.codec import is_compact
+from game.state_protocol import (
+    read_frame, pack_frame, U64, CAS_BODY, KIND_REQUEST, KIND_RESPONSE, KIND_NOTIFY,
+    OP_GET, OP_VERSION, OP_PUT, OP_CAS, OP_DELETE, OP_LIST, OP_HEADERS, OP_LOCK, OP_UNLOCK,
+    OP_SUBSCRIBE, OP_STATS, OP_HEARTBEAT, OP_CLAIM_TIMERS, OP_RELEASE_TIMERS, OP_TIMER_OWNERS, OP_AUTH,
+    STATUS_OK, STATUS_NOT_FOUND, STATUS_CONFLICT, STATUS_BUSY, STATUS_ERROR,
+    DELETED
+)
+from game.storage import GameStorage
+
+
+class ServiceConnection(threading.Thread):
+    """Serves one backend connection; requests are handled in the order they arrive."""
+
+    def __init__(self, service: 'StateService', connection: socket.socket, address):
+        self.service = service
+        self.connection = connection
+        self.address = address
+        self.send_lock = threading.Lock()
+        self.subscribed = False
+        self.authenticated = service.secret is None
+        threading.Thread.__init__(self, daemon=True)
+
+    def send(self, frame: bytes) -> bool:
+        try:
+            with self.send_lock:
+                self.connection.sendall(frame)
+            return True
+        except OSError:
+            return False
+
+    def run(self):
+        try:
+            while True:
+                kind, op, request_id, game_id, body = read_frame(self.connection)
+                if kind != KIND_REQUEST:
+                    continue
+                if not self.authenticated:
+                    # Nothing but the shared secret is served before it's been given
+                    if op == OP_AUTH and hmac.compare_digest(body, self.service.secret):
+                        self.authenticated = True
+                        self.send(pack_frame(KIND_RESPONSE, STATUS_OK, request_id))
+                        continue
+                    logging.warning(f"State service: unauthenticated request from {self.address}")
+                    self.send(pack_frame(KIND_RESPONSE, STATUS_ERROR, request_id, body=b'Not authenticated'))
+                    break
+                try:
+                    status, reply = self.service.handle(self, op, game_id, body)
+                except Exception as e:
+                    logging.error(f"State service error on op {op} for {game_id}: {e}")
+                    status, reply = STATUS_ERROR, str(e).encode('utf-8')
+                if not self.send(pack_frame(KIND_RESPONSE, status, request_id, game_id, reply)):
+                    break
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.service.disconnect(self)
+            self.connection.close()
+
+
+class StateService(threading.Thread):
+    """
+    TCP service that owns game records on behalf of every backend.
+
+    Records live in a local GameStorage; backends reach them over the binary
+    protocol in game/state_protocol.py. Game locks are owned by connections
+    (and released when one drops), writes by other connections get
+    STATUS_BUSY while a game is locked, and every change is pushed to
+    subscribed connections so they can invalidate their caches.
+
+    It listens on loopback by default. Listening on any other address needs
+    a shared ``secret``, which each connection must send (OP_AUTH) before
+    anything else.
+    """
+
+    _stripes = 64  # Locks making each check-and-write atomic per game
+
+    def __init__(self, storage: GameStorage, port: int = 7000, host: str = '127.0.0.1',
+                 secret: Optional[str] = None):
+        if secret is None and not self._loopback(host):
+            raise ValueError(f"State service on {host} needs a shared secret")
+        self.storage = storage
+        self.port = port
+        self.host = host
+        self.secret = secret.encode('utf-8') if secret is not None else None
+        self.the_clients = []
+        self.clients_lock = threading.Lock()
+        self.owners: Dict[str, ServiceConnection] = {}
+        self.stripes = [threading.Lock() for _ in range(self._stripes)]
+        self.my_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        threading.Thread.__init__(self)
+
+    def run(self):
+        self.my_socket.bind((self.host, self.port))
+        self.my_socket.listen(16)
+        logging.warning(f"State service listening on {self.host}:{self.port}")
+        while True:
+            connection, client_address = self.my_socket.accept()
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            logging.warning("state service connection from {}".format(client_address))
+
+            clt = ServiceConnection(self, connection, client_address)
+            with self.clients_lock:
+                self.the_clients.append(clt)
+            clt.start()
+
+    @staticmethod
+    def _loopback(host: str) -> bool:
+        try:
+            return ipaddress.ip_address(host).is_loopback
+        except ValueError:
+            return host == 'localhost'
+
+    def _stripe(self, game_id: str) -> threading.Lock:
+        return self.stripes[zlib.crc32(game_id.encode('utf-8')) % self._stripes]
+
+    def disconnect(self, client: ServiceConnection):
+        """Forget a connection and release the game locks it still held."""
+        with self.clients_lock:
+            if client in self.the_clients:
+                self.the_clients.remove(client)
+        for game_id, owner in list(self.owners.items()):
+            if owner is client:
+                with self._stripe(game_id):
+                    if self.owners.get(game_id) is client:
+                        del self.owners[game_id]
+
+    def notify(self, game_id: str, version: int):
+        """Push a change to every subscribed connection."""
+        frame = pack_frame(KIND_NOTIFY, STATUS_OK, 0, game_id, U64.pack(version))
+        with self.clients_lock:
+            subscribers = [clt for clt in self.the_clients if clt.subscribed]
+        for clt in subscribers:
+            clt.send(frame)
+
+    def handle(self, client: ServiceConnection, op: int, game_id: str, body: bytes):
+        """Execute one request and return (status, reply body)."""
+        storage = self.storage
+
+        if op == OP_LIST:
+            return STATUS_OK, json.dumps(storage.game_ids()).encode('utf-8')
+        if op == OP_HEADERS:
+            return STATUS_OK, json.dumps(storage.headers()).encode('utf-8')
+        if op == OP_STATS:
+            stats = storage.stats()
+            stats['connections'] = len(self.the_clients)
+            stats['locked_games'] = len(self.owners)
+            return STATUS_OK, json.dumps(stats).encode('utf-8')
+        if op == OP_SUBSCRIBE:
+            client.subscribed = True
+            return STATUS_OK, b''
+        if op == OP_AUTH:
+            return STATUS_OK, b''
+        
+        # Timer leases live with the records, and heartbeats use the service's clock
+        if op == OP_HEARTBEAT:
+            storage.heartbeat(body.decode('utf-8'))
+            return STATUS_OK, b''
+        if op == OP_CLAIM_TIMERS:
+            request = json.loads(body)
+            held = storage.claim_timers(request['owner'], request['games'], request['ttl'])
+            return STATUS_OK, json.dumps(held).encode('utf-8')
+        if op == OP_RELEASE_TIMERS:
+            request = json.loads(body)
+            storage.release_timers(request['owner'], request['games'])
+            return STATUS_OK, b''
+        if op == OP_TIMER_OWNERS:
+            return STATUS_OK, json.dumps(storage.timer_owners()).encode('utf-8')
+
+        if op == OP_GET:
+            record = storage.read(game_id)
+            if record is None:
+                return STATUS_NOT_FOUND, b''
+            return STATUS_OK, U64.pack(record[0]) + record[1]
+        if op == OP_VERSION:
+            version = storage.version(game_id)
+            return (STATUS_NOT_FOUND, b'') if version is None else (STATUS_OK, U64.pack(version))
+
+        changed: Optional[int] = None
+        with self._stripe(game_id):
+            owner = self.owners.get(game_id)
+            if owner is not None and owner is not client:
+                return STATUS_BUSY, b''
+
+            if op == OP_LOCK:
+                self.owners[game_id] = client
+                return STATUS_OK, b''
+            if op == OP_UNLOCK:
+                self.owners.pop(game_id, None)
+                return STATUS_OK, b''
+
+            if op == OP_PUT:
+                (version,) = U64.unpack_from(body, 0)
+                if not is_compact(body[U64.size:]):
+                    return STATUS_ERROR, b'Not a game record'
+                with storage.lock(game_id):
+                    if not storage.write(game_id, body[U64.size:], version):
+                        return STATUS_ERROR, b''
+                changed = version
+            elif op == OP_CAS:
+                expected, version = CAS_BODY.unpack_from(body, 0)
+                if not is_compact(body[CAS_BODY.size:]):
+                    return STATUS_ERROR, b'Not a game record'
+                if not storage.compare_and_swap(game_id, expected, body[CAS_BODY.size:], version):
+                    return STATUS_CONFLICT, b''
+                changed = version
+            elif op == OP_DELETE:
+                with storage.lock(game_id):
+                    if not storage.delete(game_id):
+                        return STATUS_NOT_FOUND, b''
+                changed = DELETED
+            else:
+                return STATUS_ERROR, b'Unknown op'
+
+        self.notify(game_id, changed)
+        return STATUS_OK, b''
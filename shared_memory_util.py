@@ -7,35 +7,46 @@ This utility helps manage the shared memory used by the multiprocess Werewolf ga
 
 import sys
 import json
-import pickle
-from multiprocessing import shared_memory
 import argparse
+from game.codec import decode_game
+from game.shared_store import SharedGameStore
 
 SHARED_MEMORY_NAME = "werewolf_game_state"
 
+def open_store():
+    """Attach to the server's shared memory store without creating it."""
+    return SharedGameStore(SHARED_MEMORY_NAME, 0, create=False)
+
+def read_games(store):
+    """Decode every game record in the store."""
+    games = {}
+    for game_id in store.game_ids():
+        with store.lock(game_id, shared=True):
+            record = store.read(game_id)
+        if record is not None:
+            games[game_id] = decode_game(record[1])
+    return games
+
 def view_shared_memory():
     """View the contents of the shared memory."""
     try:
-        shm = shared_memory.SharedMemory(name=SHARED_MEMORY_NAME)
+        store = open_store()
+        stats = store.stats()
         
-        # Read size header
-        data_size = int.from_bytes(shm.buf[:8], byteorder='little')
-        print(f"Shared memory size: {len(shm.buf)} bytes")
-        print(f"Data size: {data_size} bytes")
+        print(f"Shared memory size: {stats['segment_size']} bytes")
+        print(f"Data size: {stats['data_bytes']} bytes")
         
-        if data_size == 0:
+        if stats['games'] == 0:
             print("No data in shared memory")
-            shm.close()
+            store.close()
             return
         
-        # Read and deserialize data
-        serialized_data = bytes(shm.buf[8:8 + data_size])
-        data = pickle.loads(serialized_data)
+        data = read_games(store)
         
         print("\nShared memory contents:")
         print(json.dumps(data, indent=2, default=str))
         
-        shm.close()
+        store.close()
         
     except FileNotFoundError:
         print("Shared memory not found. Server may not be running.")
@@ -45,9 +56,8 @@ def view_shared_memory():
 def cleanup_shared_memory():
     """Clean up (remove) the shared memory."""
     try:
-        shm = shared_memory.SharedMemory(name=SHARED_MEMORY_NAME)
-        shm.close()
-        shm.unlink()
+        store = open_store()
+        store.unlink()
         print("Shared memory cleaned up successfully")
     except FileNotFoundError:
         print("Shared memory not found (already cleaned up)")
@@ -57,29 +67,30 @@ def cleanup_shared_memory():
 def shared_memory_info():
     """Get information about the shared memory."""
     try:
-        shm = shared_memory.SharedMemory(name=SHARED_MEMORY_NAME)
-        
-        data_size = int.from_bytes(shm.buf[:8], byteorder='little')
+        store = open_store()
+        stats = store.stats()
         
+        total = stats['segment_size']
         print(f"Shared Memory Information:")
         print(f"  Name: {SHARED_MEMORY_NAME}")
-        print(f"  Total size: {len(shm.buf)} bytes ({len(shm.buf) / 1024 / 1024:.2f} MB)")
-        print(f"  Data size: {data_size} bytes ({data_size / 1024:.2f} KB)")
-        print(f"  Used: {((data_size + 8) / len(shm.buf) * 100):.2f}%")
-        print(f"  Available: {len(shm.buf) - data_size - 8} bytes")
+        print(f"  Total size: {total} bytes ({total / 1024 / 1024:.2f} MB)")
+        print(f"  Data size: {stats['data_bytes']} bytes ({stats['data_bytes'] / 1024:.2f} KB)")
+        print(f"  Heap used: {stats['heap_used']} of {stats['heap_size']} bytes ({stats['heap_used'] / stats['heap_size'] * 100:.2f}%)")
+        print(f"  Free extents: {stats['free_extents']} ({stats['free_bytes']} bytes reusable)")
+        print(f"  Directory: {stats['games']} of {stats['max_games']} slots used")
+        print(f"  Segments: {len(stats['segments'])}")
+        for segment in stats['segments']:
+            print(f"    {segment['name']}: {segment['heap_used']} of {segment['heap_size']} bytes used")
+        print(f"  Headroom: {stats['headroom_bytes']} bytes ({stats['headroom_bytes'] / 1024 / 1024:.2f} MB) "
+              f"before another segment is added, {stats['headroom_games']} more games fit the directory")
         
-        if data_size > 0:
-            serialized_data = bytes(shm.buf[8:8 + data_size])
-            data = pickle.loads(serialized_data)
-            
-            if isinstance(data, dict):
-                print(f"  Games stored: {len(data)}")
-                for game_id, game in data.items():
-                    players = len(game.get('players', {}))
-                    phase = game.get('phase', 'unknown')
-                    print(f"    {game_id}: {players} players, phase: {phase}")
+        print(f"  Games stored: {stats['games']}")
+        for game_id, game in read_games(store).items():
+            players = len(game.get('players', {}))
+            phase = game.get('phase', 'unknown')
+            print(f"    {game_id}: {players} players, phase: {phase}, version: {game.get('version', 0)}")
         
-        shm.close()
+        store.close()
         
     except FileNotFoundError:
         print("Shared memory not found. Server may not be running.")
@@ -91,28 +102,23 @@ def monitor_shared_memory():
     import time
     
     print("Monitoring shared memory for changes (Ctrl+C to stop)...")
-    last_data = None
+    last_versions = None
     
     try:
         while True:
             try:
-                shm = shared_memory.SharedMemory(name=SHARED_MEMORY_NAME)
-                data_size = int.from_bytes(shm.buf[:8], byteorder='little')
+                store = open_store()
+                versions = {game_id: store.version(game_id) for game_id in store.game_ids()}
                 
-                if data_size > 0:
-                    serialized_data = bytes(shm.buf[8:8 + data_size])
-                    current_data = pickle.loads(serialized_data)
-                    
-                    if current_data != last_data:
-                        print(f"\n[{time.strftime('%H:%M:%S')}] Shared memory updated:")
-                        if isinstance(current_data, dict):
-                            for game_id, game in current_data.items():
-                                players = len(game.get('players', {}))
-                                phase = game.get('phase', 'unknown')
-                                print(f"  Game {game_id}: {players} players, phase: {phase}")
-                        last_data = current_data.copy() if isinstance(current_data, dict) else current_data
+                if versions != last_versions:
+                    print(f"\n[{time.strftime('%H:%M:%S')}] Shared memory updated:")
+                    for game_id, game in read_games(store).items():
+                        players = len(game.get('players', {}))
+                        phase = game.get('phase', 'unknown')
+                        print(f"  Game {game_id}: {players} players, phase: {phase}")
+                    last_versions = versions
                 
-                shm.close()
+                store.close()
                 time.sleep(1)
                 
             except FileNotFoundError:
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Headless game simulator for capacity planning and engine regressions.
+
+Drives GameLogic, GameStateManager and the phase logic directly (no HTTP)
+with bot players. All games are created up front and played concurrently,
+round-robin within each process; phases end as soon as the bots have moved
+instead of waiting for the real timers. Reports games/sec, per-operation
+latency and the storage footprint. Runs in a scratch directory, so the
+journal, snapshot and archives of a real server are never touched.
+
+Bot strategies:
+    random         everyone picks targets at random
+    coordinated    werewolves agree on one victim and one day vote
+    seer-informed  coordinated werewolves; the seer shares what it found
+                   in chat and the village votes for exposed werewolves
+
+With --replay, the bots are replaced by recorded games: every game in an
+event log (game_states.json.events of a real server) is recreated and its
+commits are applied again in their original order, all games side by side.
+
+Usage:
+    python simulate.py
+    python simulate.py --games 2000 --players 8 --processes 4 --strategy seer-informed
+    python simulate.py --backend sqlite --games 500
+    python simulate.py --replay /srv/werewolf/game_states.json.events --processes 4
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+STRATEGIES = ('random', 'coordinated', 'seer-informed')
+
+
+class Bots:
+    """Decides the moves of every player in a game for one phase."""
+
+    def __init__(self, strategy: str, rng: random.Random):
+        self.strategy = strategy
+        self.rng = rng
+
+    @staticmethod
+    def _alive(game: Dict) -> List[str]:
+        return [pid for pid, player in game['players'].items() if player['alive']]
+
+    @staticmethod
+    def _exposed(game: Dict) -> List[str]:
+        """Alive werewolves the seer has investigated."""
+        return [entry['target_id'] for entry in game['seer_history']
+                if entry['target_role'] == 'werewolf' and game['players'][entry['target_id']]['alive']]
+
+    def night(self, game: Dict) -> List[Tuple[str, str, str]]:
+        """(player, action type, target) for the night."""
+        players = game['players']
+        alive = self._alive(game)
+        prey = [pid for pid in alive if players[pid]['role'] != 'werewolf']
+        moves = []
+        if not prey:
+            return moves
+
+        shared_target = self.rng.choice(prey)
+        investigated = {entry['target_id'] for entry in game['seer_history']}
+        for pid in alive:
+            role = players[pid]['role']
+            if role == 'werewolf':
+                target = shared_target if self.strategy != 'random' else self.rng.choice(prey)
+                moves.append((pid, 'werewolf_vote', target))
+            elif role == 'seer':
+                candidates = [other for other in alive if other != pid and other not in investigated]
+                if candidates:
+                    moves.append((pid, 'seer_investigate', self.rng.choice(candidates)))
+        return moves
+
+    def day(self, game: Dict) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+        """(player, message) chat lines and (player, target) votes for the day."""
+        players = game['players']
+        alive = self._alive(game)
+        villagers = [pid for pid in alive if players[pid]['role'] != 'werewolf']
+        chat = []
+        accused = None
+        if self.strategy == 'seer-informed':
+            exposed = self._exposed(game)
+            seer = next((pid for pid in alive if players[pid]['role'] == 'seer'), None)
+            if exposed and seer:
+                accused = exposed[0]
+                chat.append((seer, f"I saw {players[accused]['name']} at night. Werewolf!"))
+        if not chat and alive:
+            speaker = self.rng.choice(alive)
+            chat.append((speaker, 'Who do we trust?'))
+
+        wolf_target = self.rng.choice(villagers) if villagers else None
+        votes = []
+        for pid in alive:
+            others = [other for other in alive if other != pid]
+            if not others:
+                continue
+            if players[pid]['role'] == 'werewolf':
+                target = wolf_target if self.strategy != 'random' and wolf_target != pid else self.rng.choice(others)
+            elif accused is not None and accused != pid:
+                target = accused
+            else:
+                target = self.rng.choice(others)
+            votes.append((pid, target))
+        return chat, votes
+
+
+class Metrics:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.winners: Counter = Counter()
+        self.phases = 0
+        self.failures: Counter = Counter()
+
+    def timed(self, name: str, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.latencies[name].append(time.perf_counter() - start)
+        return result
+
+    def merge(self, other: 'Metrics'):
+        for name, values in other.latencies.items():
+            self.latencies[name].extend(values)
+        self.winners.update(other.winners)
+        self.failures.update(other.failures)
+        self.phases += other.phases
+
+
+def worker(worker_no: int, games: int, options: argparse.Namespace, results):
+    # The engine prints every phase change; thousands of games would drown the report
+    sys.stdout = open(os.devnull, 'w')
+    logging.getLogger().setLevel(logging.ERROR)
+
+    # Imported here so each process builds its own state manager after the fork
+    from game.game_state import GameStateManager
+    from game.game_logic import GameLogic
+    from game.phase_timer import PhaseTimer
+
+    class SimulatedPhaseTimer(PhaseTimer):
+        """Phase logic without threads: the simulator decides when a phase is over."""
+
+        def __init__(self):
+            PhaseTimer.__init__(self)
+            self.due: Dict[str, str] = {}
+
+        def _schedule(self, game_id: str, phase: str, duration: float):
+            self.due[game_id] = phase
+
+    rng = random.Random(options.seed + worker_no)
+    bots = Bots(options.strategy, rng)
+    metrics = Metrics()
+    state_manager = GameStateManager()
+    logic = GameLogic()
+    timer = SimulatedPhaseTimer()
+
+    live = []
+    for _ in range(games):
+        game_id = metrics.timed('create_game', state_manager.create_game)
+        for i in range(options.players):
+            metrics.timed('add_player', state_manager.add_player, game_id, f"Bot {i}")
+        metrics.timed('start_game', logic.assign_roles, game_id, options.role_set)
+        metrics.timed('start_phase', timer.start_night_phase, game_id)
+        live.append(game_id)
+
+    # One phase of every live game per round, so all games stay in play together
+    max_phases = options.players * 2 + 2
+    phases_played: Counter = Counter()
+    while live:
+        still_live = []
+        for game_id in live:
+            game = metrics.timed('load_game', state_manager.get_game_state, game_id)
+            phase = game['phase']
+            if phase == 'night':
+                for player_id, action_type, target_id in bots.night(game):
+                    valid, _, recorded = metrics.timed('action', logic.perform_action,
+                                                       game_id, player_id, action_type, target_id)
+                    if not recorded:
+                        metrics.failures['action'] += 1
+            else:
+                chat, votes = bots.day(game)
+                for player_id, message in chat:
+                    metrics.timed('chat', logic.perform_action, game_id, player_id, 'chat', message=message)
+                for player_id, target_id in votes:
+                    valid, _, recorded = metrics.timed('vote', logic.perform_action,
+                                                       game_id, player_id, 'day_vote', target_id)
+                    if not recorded:
+                        metrics.failures['vote'] += 1
+
+            # What a polling client sees between moves
+            metrics.timed('poll_state', logic.render_game_summary, game_id, rng.choice(list(game['players'])))
+
+            timer.due.pop(game_id, None)
+            metrics.timed('end_phase', timer.end_phase, game_id, phase)
+            metrics.phases += 1
+            phases_played[game_id] += 1
+
+            if game_id in timer.due and phases_played[game_id] < max_phases:
+                still_live.append(game_id)
+                continue
+            header = state_manager.get_game_header(game_id)
+            if header and header['ended']:
+                metrics.winners[header['winner']] += 1
+            else:
+                metrics.failures['unfinished'] += 1
+        live = still_live
+
+    state_manager.shutdown_flusher()
+    results.put(metrics)
+
+
+def replay_worker(worker_no: int, recorded: Dict[str, List], options: argparse.Namespace, results):
+    sys.stdout = open(os.devnull, 'w')
+    logging.getLogger().setLevel(logging.ERROR)
+
+    from game.game_state import GameStateManager
+
+    def commit(events: List[Dict]):
+        def work(uow):
+            for event in events:
+                uow.emit(event)
+        return work
+
+    metrics = Metrics()
+    state_manager = GameStateManager()
+    remaining = {}
+    for game_id, commits in recorded.items():
+        _, created_at, _ = commits[0]
+        metrics.timed('create_game', state_manager.create_game, game_id, created_at)
+        remaining[game_id] = iter(commits[1:])
+
+    # One commit of every game per round, so the recorded games overlap as they did live
+    live = list(recorded)
+    while live:
+        still_live = []
+        for game_id in live:
+            entry = next(remaining[game_id], None)
+            if entry is None:
+                header = state_manager.get_game_header(game_id)
+                if header['version'] != recorded[game_id][-1][0]:
+                    metrics.failures['diverged'] += 1
+                elif header['ended']:
+                    metrics.winners[header['winner']] += 1
+                continue
+            metrics.timed('commit', state_manager.run, game_id, commit(entry[2]))
+            metrics.phases += 1
+            still_live.append(game_id)
+        live = still_live
+
+    state_manager.shutdown_flusher()
+    results.put(metrics)
+
+
+def recorded_games(path: str) -> Dict[str, List]:
+    """Commits per game from an event log, for the games that can be replayed from the start."""
+    from game.event_log import GameEventLog
+    games = {}
+    for game_id, commits in GameEventLog(path).read_all().items():
+        # Compaction drops commits covered by a snapshot; only an unbroken run from creation replays
+        run = []
+        for commit in commits:
+            if commit[0] != len(run) + 1:
+                break
+            run.append(commit)
+        if run and run[0][2] and run[0][2][0]['type'] == 'created':
+            games[game_id] = run
+    return games
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def report(options: argparse.Namespace, metrics: Metrics, elapsed: float, storage: Dict, disk_bytes: int):
+    finished = sum(metrics.winners.values())
+    if options.replay:
+        print(f"\nReplayed {options.games} recorded games from {options.replay} "
+              f"({options.processes} processes, {options.backend})")
+        print(f"  {elapsed:.2f}s, {options.games / elapsed:.1f} games/s, {metrics.phases / elapsed:.1f} commits/s, "
+              f"{finished} games ended")
+    else:
+        print(f"\nSimulated {options.games} games of {options.players} players with {options.strategy} bots "
+              f"({options.processes} processes, {options.backend})")
+        print(f"  {elapsed:.2f}s, {finished / elapsed:.1f} games/s, {metrics.phases / elapsed:.1f} phases/s, "
+              f"{metrics.phases / max(finished, 1):.1f} phases/game")
+    for winner, count in metrics.winners.most_common():
+        print(f"  {winner} won {count / max(finished, 1):.0%}")
+    if metrics.failures:
+        print(f"  failures: {dict(metrics.failures)}")
+
+    print(f"\n  {'operation':<13}{'count':>9}{'ops/s':>11}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for name, values in metrics.latencies.items():
+        print(f"  {name:<13}{len(values):>9}{len(values) / elapsed:>11.0f}"
+              f"{percentile(values, 0.5) * 1000:>9.3f}{percentile(values, 0.95) * 1000:>9.3f}"
+              f"{percentile(values, 0.99) * 1000:>9.3f}{max(values) * 1000:>9.3f}")
+
+    print(f"\n  storage: {storage}")
+    print(f"  files on disk (journal, snapshot, archives): {disk_bytes / 1024:.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless Werewolf game simulator')
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--players', type=int, default=8)
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--strategy', choices=STRATEGIES, default='seer-informed')
+    parser.add_argument('--role-set', default='classic', help="Role set from game/roles.py, e.g. 'scaled' for large lobbies")
+    parser.add_argument('--backend', choices=('shared_memory', 'sqlite', 'remote'), default='shared_memory')
+    parser.add_argument('--service', default='127.0.0.1:7000', help='State service address for --backend remote')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch directory')
+    parser.add_argument('--replay', help='Replay the recorded games of an event log instead of playing bots')
+    options = parser.parse_args()
+    if options.players < 3:
+        parser.error('--players must be at least 3')
+    recorded = {}
+    if options.replay:
+        options.replay = os.path.abspath(options.replay)
+        recorded = recorded_games(options.replay)
+        if not recorded:
+            parser.error(f"No replayable games in {options.replay}")
+        options.games = len(recorded)
+
+    workdir = tempfile.mkdtemp(prefix='wwsim_')
+    os.chdir(workdir)
+
+    # Configured before any process builds its state manager
+    from game.game_state import GameStateManager
+    host, port = options.service.rsplit(':', 1)
+    GameStateManager._storage_backend = options.backend
+    GameStateManager._shared_memory_name = f"wwsim_{os.getpid()}"
+    GameStateManager._shared_memory_size = max(16 * 1024 * 1024, options.games * options.players * 2048)
+    GameStateManager._shared_memory_max_games = options.games + 64
+    GameStateManager._sqlite_path = os.path.join(workdir, 'game_states.db')
+    GameStateManager._state_service_address = (host, int(port))
+
+    results = multiprocessing.Queue()
+    shares = [options.games // options.processes + (i < options.games % options.processes)
+              for i in range(options.processes)]
+    if options.replay:
+        game_ids = sorted(recorded)
+        workers = [multiprocessing.Process(target=replay_worker, args=(
+                       i, {game_id: recorded[game_id] for game_id in game_ids[i::options.processes]}, options, results))
+                   for i in range(options.processes)]
+    else:
+        workers = [multiprocessing.Process(target=worker, args=(i, share, options, results))
+                   for i, share in enumerate(shares)]
+    start = time.perf_counter()
+    for p in workers:
+        p.start()
+    metrics = Metrics()
+    for _ in workers:
+        metrics.merge(results.get())
+    for p in workers:
+        p.join()
+    elapsed = time.perf_counter() - start
+
+    state_manager = GameStateManager()
+    try:
+        storage = state_manager.store.stats()
+    finally:
+        state_manager.shutdown_flusher()
+        state_manager.cleanup_shared_memory()
+    report(options, metrics, elapsed, storage, directory_size(workdir))
+
+    os.chdir(os.path.dirname(workdir))
+    if options.keep:
+        print(f"  scratch directory kept at {workdir}")
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import socket
+import time
+import uuid
+
+import pytest
+
+from game import events
+from game.game_state import GameStateManager
+from game.remote_store import RemoteGameStore
+from game.shared_store import SharedGameStore
+from game.sqlite_store import SQLiteGameStore
+from server.state_service import StateService
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_listening(port: int, timeout: float = 5.0):
+    deadline = time.time() + timeout
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port)).close()
+            return
+        except ConnectionRefusedError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.02)
+
+
+def started_game(manager, players=('ann', 'bob', 'cat', 'dan'), phase_end=None) -> str:
+    """Create a game, seat ``players``, deal the classic roles and start the night."""
+    game_id = manager.create_game()
+    for name in players:
+        manager.add_player(game_id, name)
+    manager.run(game_id, lambda uow: uow.emit(events.roles_assigned('classic', 1)))
+    manager.run(game_id, lambda uow: uow.emit(events.phase_started('night', phase_end or time.time() + 30)))
+    return game_id
+
+
+@pytest.fixture
+def shared_store():
+    store = SharedGameStore(f"wwtest_{uuid.uuid4().hex[:12]}", 64 * 1024, max_games=64)
+    yield store
+    store.unlink()
+
+
+@pytest.fixture
+def sqlite_store(tmp_path):
+    store = SQLiteGameStore(str(tmp_path / 'games.db'))
+    yield store
+    store.unlink()
+
+
+@pytest.fixture
+def state_service(tmp_path):
+    """A state service on a free port over its own SQLite store. Yields the port."""
+    storage = SQLiteGameStore(str(tmp_path / 'service.db'))
+    service = StateService(storage, free_port(), host='127.0.0.1')
+    service.daemon = True
+    service.start()
+    wait_listening(service.port)
+    yield service.port
+    storage.unlink()
+
+
+@pytest.fixture
+def remote_store(state_service):
+    store = RemoteGameStore('127.0.0.1', state_service)
+    yield store
+    store.close()
+
+
+@pytest.fixture(params=['shared', 'sqlite', 'remote'])
+def store(request):
+    """Each GameStorage backend in turn."""
+    return request.getfixturevalue(f"{request.param}_store")
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    """A state manager of its own over SQLite, with its files in tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(GameStateManager, '_storage_backend', 'sqlite')
+    monkeypatch.setattr(GameStateManager, '_sqlite_path', str(tmp_path / 'game_states.db'))
+    monkeypatch.setattr(GameStateManager, '_instance', None)
+    state_manager = GameStateManager()
+    yield state_manager
+    state_manager.shutdown_flusher()
+    state_manager.store.unlink()
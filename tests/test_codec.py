@@ -0,0 +1,93 @@
+import pickle
+import random
+
+import pytest
+
+from game import rules
+from game.roster import index_roles
+from game.codec import decode_game, encode_game, is_compact, peek_alive, peek_header
+
+
+def started_game():
+    game = rules.new_game(1000.0)
+    for i in range(5):
+        rules.add_player(game, f"p{i}", f"Player {i}", 1000.0 + i)
+    rules.apply_roles(game, 'classic', random.Random(7))
+    rules.start_phase(game, 'night', 1090.0)
+    werewolf = next(pid for pid, player in game['players'].items() if player['role'] == 'werewolf')
+    target = next(pid for pid in game['players'] if pid != werewolf)
+    rules.apply_action(game, 'werewolf_vote', werewolf, target)
+    rules.apply_action(game, 'seer_investigate', 'p0', target)
+    return game
+
+
+def test_round_trip():
+    game = started_game()
+    data = encode_game(game)
+    assert is_compact(data)
+    assert decode_game(data) == game
+
+
+def test_round_trip_keeps_chat_sequence_after_eviction():
+    game = started_game()
+    for i in range(5):
+        rules.post_chat(game, 'p1', f"message {i}", 1010.0 + i, 2.0, 2 if i == 4 else 0)
+    rules.post_chat(game, 'p2', 'ünïcode ✓', 1020.0, 1.0, 0)
+
+    decoded = decode_game(encode_game(game))
+    assert decoded == game
+    assert [message['seq'] for message in decoded['chat']] == [2, 3, 4, 5]
+    assert decoded['chat_seq'] == 6
+
+
+def test_round_trip_of_new_game_rebuilds_role_index():
+    game = rules.new_game(1000.0)
+    index_roles(game)
+    assert decode_game(encode_game(game)) == game
+
+
+def test_peek_header_matches_game():
+    game = started_game()
+    game['version'] = 12
+    assert peek_header(encode_game(game)) == {
+        'phase': 'night',
+        'phase_end': 1090.0,
+        'started': True,
+        'ended': False,
+        'winner': None,
+        'version': 12,
+        'created_at': 1000.0,
+        'updated_at': 1000.0,
+        'player_count': 5
+    }
+
+
+def test_peek_alive_reads_player_rows():
+    game = started_game()
+    game['players']['p3']['alive'] = False
+    assert peek_alive(encode_game(game)) == {'p0': True, 'p1': True, 'p2': True, 'p3': False, 'p4': True}
+
+
+def test_records_outside_schema_are_stored_as_json():
+    game = started_game()
+    game['players']['p1']['role'] = 'hunter'  # Not a role the schema interns
+    data = encode_game(game)
+    assert is_compact(data)
+    assert decode_game(data) == game
+    assert peek_header(data)['player_count'] == 5
+    assert peek_alive(data)['p1']
+
+
+@pytest.mark.parametrize('data', [
+    pickle.dumps({'phase': 'setup'}),
+    b'',
+    b'WR\xff' + bytes(64),
+])
+def test_rejects_data_that_isnt_a_record(data):
+    assert not is_compact(data)
+    with pytest.raises(ValueError):
+        decode_game(data)
+    with pytest.raises(ValueError):
+        peek_header(data)
+    with pytest.raises(ValueError):
+        peek_alive(data)
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from game import events
+from conftest import started_game
+
+
+@pytest.fixture
+def app(manager):
+    # Imported late: the module's global timer builds the state manager it finds
+    from game.controller import WerewolfApp
+    return WerewolfApp().get_app()
+
+
+def call(app, method, path, body=None):
+    response = app.proses({'method': method, 'path': path, 'headers': {},
+                           'body': json.dumps(body) if body is not None else ''})
+    head, payload = response.split(b'\r\n\r\n', 1)
+    return int(head.split(b' ')[1]), json.loads(payload)
+
+
+def test_chat_needs_a_string_message(app, manager):
+    game_id = started_game(manager)
+    manager.run(game_id, lambda uow: uow.emit(events.phase_started('day', None)))
+    player_id = next(iter(manager.get_game_state(game_id)['players']))
+
+    status, _ = call(app, 'POST', f"/games/{game_id}/action", {'player_id': player_id, 'action_type': 'chat'})
+    assert status == 400
+    status, _ = call(app, 'POST', f"/games/{game_id}/chat", {'player_id': player_id, 'message': 5})
+    assert status == 400
+    status, _ = call(app, 'POST', f"/games/{game_id}/action",
+                     {'player_id': player_id, 'action_type': 'chat', 'message': 'hello'})
+    assert status == 200
+    assert [m['message'] for m in manager.get_chat_history(game_id)] == ['hello']
+
+
+def test_get_chat_history(app, manager):
+    game_id = manager.create_game()
+    for i in range(3):
+        manager.add_chat_message(game_id, f"p{i}", f"m{i}")
+
+    status, body = call(app, 'GET', f"/games/{game_id}/chat?since=1")
+    assert status == 200
+    assert [m['message'] for m in body['messages']] == ['m1', 'm2']
+    assert body['next_since'] == 3
+    status, body = call(app, 'GET', f"/games/{game_id}/chat?since=3")
+    assert (status, body) == (200, {'messages': [], 'next_since': 3})
+    assert call(app, 'GET', f"/games/{game_id}/chat?since=x")[0] == 400
+    assert call(app, 'GET', '/games/missing/chat')[0] == 404
+
+
+def test_start_with_an_unknown_role_set(app, manager):
+    game_id = manager.create_game()
+    for name in ('ann', 'bob', 'cat'):
+        manager.add_player(game_id, name)
+    status, body = call(app, 'POST', f"/games/{game_id}/start", {'role_set': 'chaos'})
+    assert status == 400 and 'classic' in body['error']
+    assert not manager.get_game_state(game_id)['started']
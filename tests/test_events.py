@@ -0,0 +1,52 @@
+import random
+
+from game import events, rules
+from game.events import replay
+
+
+def commits():
+    """Version 1 to 5 of a game: created, three joins and roles dealt."""
+    return [
+        (1, 100.0, [events.created(100.0)]),
+        (2, 101.0, [events.joined('p1', 'Ann', 101.0)]),
+        (3, 102.0, [events.joined('p2', 'Bo', 102.0)]),
+        (4, 103.0, [events.joined('p3', 'Cy', 103.0)]),
+        (5, 104.0, [events.roles_assigned('classic', 42), events.phase_started('night', 194.0)]),
+    ]
+
+
+def test_replay_from_created():
+    game, applied = replay(None, commits())
+    assert applied == 5
+    assert game['version'] == 5
+    assert game['updated_at'] == 104.0
+    assert game['phase'] == 'night'
+    assert game['phase_end'] == 194.0
+    assert list(game['players']) == ['p1', 'p2', 'p3']
+
+    expected = rules.new_game(100.0)
+    for pid, name, joined_at in (('p1', 'Ann', 101.0), ('p2', 'Bo', 102.0), ('p3', 'Cy', 103.0)):
+        rules.add_player(expected, pid, name, joined_at)
+    rules.apply_roles(expected, 'classic', random.Random(42))
+    assert {pid: p['role'] for pid, p in game['players'].items()} == \
+        {pid: p['role'] for pid, p in expected['players'].items()}
+
+
+def test_replay_skips_commits_already_applied():
+    game, _ = replay(None, commits()[:3])
+    game, applied = replay(game, commits())
+    assert applied == 2
+    assert game['version'] == 5
+
+
+def test_replay_stops_at_gap():
+    history = commits()
+    del history[2]  # Version 3 was never recorded
+    game, applied = replay(None, history)
+    assert applied == 2
+    assert game['version'] == 2
+    assert list(game['players']) == ['p1']
+
+
+def test_replay_needs_created_event():
+    assert replay(None, commits()[1:]) == (None, 0)
@@ -0,0 +1,83 @@
+import threading
+
+from game.game_index import GameIndex
+
+
+def header(version=1, phase='setup', phase_end=None, started=False, ended=False, created_at=100.0):
+    return {'phase': phase, 'phase_end': phase_end, 'started': started, 'ended': ended, 'winner': None,
+            'version': version, 'created_at': created_at, 'updated_at': created_at, 'player_count': 4}
+
+
+def test_lifecycle_sets_follow_updates():
+    index = GameIndex()
+    index.update('lobby', header())
+    index.update('live', header(phase='night', phase_end=50.0, started=True))
+    index.update('done', header(phase='ended', started=True, ended=True))
+    assert index.lobbies() == {'lobby'}
+    assert index.live_games() == {'lobby', 'live'}
+    assert index.live_games('night') == {'live'}
+    assert index.ended_games() == {'done'}
+    assert index.is_live('live') and not index.is_live('done') and not index.is_live('missing')
+
+    index.update('live', header(2, phase='ended', started=True, ended=True))
+    index.update('live', header(1, phase='night', phase_end=50.0, started=True))  # Stale, ignored
+    assert index.ended_games() == {'done', 'live'}
+    assert index.live_games('night') == set()
+
+    index.remove('lobby')
+    assert index.header('lobby') is None
+    assert index.counts()['games'] == 2
+
+
+def test_deadlines_and_creation_times():
+    index = GameIndex()
+    index.update('a', header(phase='night', phase_end=30.0, started=True, created_at=3.0))
+    index.update('b', header(phase='night', phase_end=10.0, started=True, created_at=1.0))
+    index.update('c', header(phase='day', phase_end=20.0, started=True, created_at=2.0))
+    assert index.deadlines_until() == [(10.0, 'b'), (20.0, 'c'), (30.0, 'a')]
+    assert index.deadlines_until(20.0) == [(10.0, 'b'), (20.0, 'c')]
+
+    # Moved deadlines and ended games drop out; their old entries expire lazily
+    index.update('b', header(2, phase='day', phase_end=40.0, started=True, created_at=1.0))
+    index.update('c', header(2, phase='ended', started=True, ended=True, created_at=2.0))
+    assert index.deadlines_until() == [(30.0, 'a'), (40.0, 'b')]
+
+    index.remove('b')
+    assert index.created_before(3.5) == ['c', 'a']
+    assert index.created_before(2.5) == ['c']
+
+
+def test_rebuild_replaces_the_index():
+    index = GameIndex()
+    index.update('gone', header(phase='night', phase_end=10.0, started=True))
+    index.update('kept', header(3, phase='day', phase_end=20.0, started=True))
+    index.rebuild({
+        'kept': header(2, phase='night', phase_end=15.0, started=True),  # Read before our last commit
+        'new': header(phase='night', phase_end=5.0, started=True)
+    })
+    assert index.header('gone') is None
+    assert index.header('kept')['version'] == 3
+    assert index.deadlines_until() == [(5.0, 'new'), (20.0, 'kept')]
+    assert index.live_games() == {'kept', 'new'}
+
+
+def test_rebuild_is_never_seen_half_done():
+    index = GameIndex()
+    headers = {f"g{i}": header(phase='night', phase_end=float(i), started=True) for i in range(2000)}
+    index.rebuild(headers)
+    stop = threading.Event()
+    sizes = []
+
+    def watch():
+        while not stop.is_set():
+            sizes.append(len(index.live_games()))
+
+    watcher = threading.Thread(target=watch)
+    watcher.start()
+    try:
+        for _ in range(20):
+            index.rebuild(headers)
+    finally:
+        stop.set()
+        watcher.join()
+    assert sizes and set(sizes) == {2000}
@@ -0,0 +1,130 @@
+import time
+
+from game import events
+from conftest import started_game
+
+
+def test_run_retries_on_a_newer_version(manager):
+    game_id = manager.create_game()
+    attempts = []
+    committed = []
+
+    def work(uow):
+        attempts.append(uow.version)
+        if len(attempts) == 1:
+            # Another writer commits after this load, so the swap below loses
+            manager.run(game_id, lambda other: other.emit(events.joined('p1', 'ann', 1.0)))
+        uow.emit(events.joined('p2', 'bob', 2.0))
+        uow.on_commit(lambda: committed.append(uow.version))
+        return 'done'
+
+    assert manager.run(game_id, work) == 'done'
+    assert attempts == [1, 2]
+    assert committed == [2]  # Callbacks of the lost attempt never run
+    game = manager.get_game_state(game_id)
+    assert set(game['players']) == {'p1', 'p2'}
+    assert game['version'] == 3
+
+
+def test_run_gives_up_after_max_retries(manager, monkeypatch):
+    monkeypatch.setattr(manager, '_max_update_retries', 3)
+    game_id = manager.create_game()
+    attempts = []
+
+    def work(uow):
+        attempts.append(uow.version)
+        manager.run(game_id, lambda other: other.emit(events.joined(f"p{len(attempts)}", 'ann', 1.0)))
+        uow.emit(events.joined('loser', 'bob', 2.0))
+
+    assert manager.run(game_id, work, default='gave up') == 'gave up'
+    assert len(attempts) == 3
+    assert 'loser' not in manager.get_game_state(game_id)['players']
+
+
+def test_run_without_changes_commits_nothing(manager):
+    game_id = manager.create_game()
+    assert manager.run(game_id, lambda uow: len(uow.game['players'])) == 0
+    assert manager.get_game_version(game_id) == 1
+    assert manager.run('missing', lambda uow: 1, default='none') == 'none'
+
+
+def test_run_many_retries_lost_games_alone(manager):
+    first, second = manager.create_game(), manager.create_game()
+    calls = []
+
+    def work(uow):
+        calls.append(uow.game_id)
+        if calls == [first, second]:
+            # Lands between the batch's read and its commit
+            manager.run(first, lambda other: other.emit(events.joined('p1', 'ann', 1.0)))
+        uow.emit(events.joined(f"x{len(calls)}", 'bob', 2.0))
+        return uow.version
+
+    assert manager.run_many([first, second, 'missing'], work) == {first: 2, second: 1}
+    assert calls[2:] == [first]
+    assert len(manager.get_game_state(first)['players']) == 2
+    assert manager.get_game_version(second) == 2
+
+
+def test_chat_token_bucket(manager, monkeypatch):
+    monkeypatch.setattr(manager, '_chat_rate_window', 0.3)  # A token every 0.1s
+    game_id = manager.create_game()
+    assert [manager.add_chat_message(game_id, 'p1', f"m{i}") for i in range(4)] == [True, True, True, False]
+    assert manager.add_chat_message(game_id, 'p2', 'own bucket')
+    assert not manager.add_chat_message(game_id, 'p1', '   ')  # Empty once stripped
+
+    time.sleep(0.15)
+    assert manager.add_chat_message(game_id, 'p1', 'refilled')
+    assert not manager.add_chat_message(game_id, 'p1', 'too soon')
+
+
+def test_chat_history_reaches_into_the_archive(manager, monkeypatch):
+    monkeypatch.setattr(manager, '_chat_buffer_size', 2)
+    game_id = manager.create_game()
+    for i in range(5):
+        assert manager.add_chat_message(game_id, f"p{i}", f"m{i}")
+
+    assert [m['seq'] for m in manager.get_game_state(game_id)['chat']] == [3, 4]
+    assert [m['message'] for m in manager.get_chat_history(game_id)] == ['m0', 'm1', 'm2', 'm3', 'm4']
+    assert [m['seq'] for m in manager.get_chat_history(game_id, 1)] == [1, 2, 3, 4]
+    assert [m['seq'] for m in manager.get_chat_history(game_id, 4)] == [4]
+    assert manager.get_chat_history(game_id, 5) == []
+    assert manager.get_chat_history('missing') is None
+
+
+def end_game(manager, game_id):
+    manager.run(game_id, lambda uow: uow.emit(events.state_updated(
+        {'phase': 'ended', 'ended': True, 'winner': 'villagers', 'phase_end': None})))
+
+
+def test_reaper_archives_by_ttl(manager, monkeypatch):
+    live = started_game(manager)
+    ended = started_game(manager)
+    end_game(manager, ended)
+    lobby = manager.create_game()
+
+    monkeypatch.setattr(manager, '_ended_game_ttl', 60.0)
+    assert manager.reap_games() == 0
+    monkeypatch.setattr(manager, '_ended_game_ttl', 0.0)
+    assert manager.reap_games() == 1
+    monkeypatch.setattr(manager, '_idle_lobby_ttl', 0.0)
+    assert manager.reap_games() == 1
+
+    assert manager.store.game_ids() == [live]
+    assert sorted(manager.archive.game_ids()) == sorted([ended, lobby])
+    assert manager.index.ended_games() == set() and manager.index.lobbies() == set()
+
+
+def test_archived_games_come_back_on_access(manager):
+    game_id = started_game(manager)
+    end_game(manager, game_id)
+    version = manager.get_game_version(game_id)
+    assert not manager.archive_game(game_id, expected_version=version - 1)  # Changed since
+    assert manager.archive_game(game_id, expected_version=version)
+    assert manager.get_game_version(game_id) is None
+
+    game = manager.get_game_state(game_id)
+    assert game['winner'] == 'villagers' and game['version'] == version
+    assert not manager.archive.contains(game_id)
+    assert manager.index.ended_games() == {game_id}
+    assert manager.get_game_state('never-existed') is None
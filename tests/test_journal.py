@@ -0,0 +1,82 @@
+import json
+
+from game import journal
+from game.journal import GameJournal, apply_entry
+
+
+def put(version, **fields):
+    return {'op': 'put', 'id': 'g1', 'game': dict(fields, version=version)}
+
+
+def test_apply_entry_keeps_newer_version():
+    game = apply_entry(None, put(2, phase='night'))
+    game = apply_entry(game, put(3, phase='day'))
+    # A flusher in another process appended an older state late
+    game = apply_entry(game, put(2, phase='night'))
+    assert game == {'phase': 'day', 'version': 3}
+
+
+def test_apply_entry_delete_and_unknown_op():
+    game = apply_entry(None, put(1))
+    assert apply_entry(game, {'op': 'noop', 'id': 'g1'}) is game
+    assert apply_entry(game, {'op': 'delete', 'id': 'g1'}) is None
+
+
+def test_read_tail_groups_entries_in_order(tmp_path):
+    path = str(tmp_path / 'game_states.json')
+    writer = GameJournal(path, fsync_policy='never')
+    writer.write_batch({'g1': {'version': 1}, 'g2': {'version': 1}})
+    writer.write_batch({'g1': {'version': 3}})
+    writer.write_batch({'g1': {'version': 2}}, deletes=['g2'])
+    writer.close()
+
+    reader = GameJournal(path)
+    tail = reader.read_tail()
+    assert [entry['game']['version'] for entry in tail['g1']] == [1, 3, 2]
+    assert [entry['op'] for entry in tail['g2']] == ['put', 'delete']
+    assert reader.entries_since_snapshot == 5
+
+
+def test_read_tail_skips_torn_line(tmp_path):
+    path = str(tmp_path / 'game_states.json')
+    writer = GameJournal(path, fsync_policy='never')
+    writer.write_batch({'g1': {'version': 1}})
+    writer.close()
+    with open(path + '.journal', 'a') as f:
+        f.write('{"op":"put","id":"g1","ga')
+
+    assert GameJournal(path).read_tail() == {'g1': [{'op': 'put', 'id': 'g1', 'game': {'version': 1}}]}
+
+
+def test_compact_folds_journal_into_snapshot(tmp_path):
+    path = str(tmp_path / 'game_states.json')
+    writer = GameJournal(path, fsync_policy='never')
+    writer.write_batch({'g1': {'version': 1}, 'g2': {'version': 4}, 'g3': {'version': 1}})
+    assert writer.compact() == 3
+    writer.write_batch({'g1': {'version': 2}, 'g2': {'version': 3}}, deletes=['g3'])
+    assert writer.compact() == 2
+    writer.close()
+
+    with open(path) as f:
+        assert json.load(f) == {'g1': {'version': 2}, 'g2': {'version': 4}}
+    assert GameJournal(path).read_tail() == {}
+    assert writer.snapshot_versions == {'g1': 2, 'g2': 4}
+
+
+def test_compact_streams_the_snapshot(monkeypatch, tmp_path):
+    path = str(tmp_path / 'game_states.json')
+    writer = GameJournal(path, fsync_policy='never')
+    writer.write_batch({f"g{i}": {'version': 1, 'name': f"Zoë {i}"} for i in range(50)})
+    writer.compact()
+    monkeypatch.setattr(journal, 'SNAPSHOT_CHUNK', 64)
+    monkeypatch.setattr(json, 'load', None)  # The snapshot is never loaded whole
+    writer.write_batch({'g7': {'version': 2, 'name': 'Renée'}, 'new': {'version': 1}}, deletes=['g3'])
+    assert writer.compact() == 50
+    writer.close()
+
+    with open(path, 'rb') as f:
+        games = {game_id: game for game_id, game, _, _ in journal.iter_snapshot(f)}
+    assert len(games) == 50 and 'g3' not in games
+    assert games['g7'] == {'version': 2, 'name': 'Renée'}
+    assert games['g8'] == {'version': 1, 'name': 'Zoë 8'}
+    assert games['new'] == {'version': 1}
@@ -0,0 +1,83 @@
+import time
+
+from game import rules
+from game.codec import encode_game
+from game.sqlite_store import SQLiteGameStore
+from game.storage import TimerLeases
+
+TTL = 0.2
+
+
+def add_games(store, *game_ids):
+    for game_id in game_ids:
+        with store.lock(game_id):
+            store.write(game_id, encode_game(rules.new_game(time.time())), 1)
+
+
+def test_timer_leases_claim_expiry_release():
+    leases = TimerLeases()
+    assert leases.claim('a', ['g1', 'g2'], TTL) == ['g1', 'g2']
+    assert leases.claim('b', ['g1', 'g3'], TTL) == ['g3']
+    assert leases.claim('a', ['g1'], TTL) == ['g1']  # Own lease, renewed
+
+    time.sleep(TTL * 1.5)
+    leases.heartbeat('b')
+    # a stopped heartbeating: b takes its games over
+    assert leases.claim('b', ['g1', 'g2'], TTL) == ['g1', 'g2']
+    assert leases.listing()['b']['games'] == 3
+
+    leases.release('a', ['g3'])  # Not a's any more
+    leases.release('b', ['g1'])
+    assert leases.owners == {'g2': 'b', 'g3': 'b'}
+    assert leases.claim('a', ['g1'], TTL) == ['g1']
+
+
+def test_store_claim_expiry_release(store):
+    add_games(store, 'g1', 'g2', 'g3')
+    assert sorted(store.claim_timers('a', ['g1', 'g2'], TTL)) == ['g1', 'g2']
+    assert store.claim_timers('b', ['g1', 'g2', 'g3'], TTL) == ['g3']
+    assert store.timer_owners()['a']['games'] == 2
+
+    time.sleep(TTL * 1.5)
+    store.heartbeat('b')
+    assert sorted(store.claim_timers('b', ['g1', 'g2'], TTL)) == ['g1', 'g2']
+    assert store.timer_owners()['b']['games'] == 3
+
+    store.release_timers('a', ['g3'])
+    assert store.claim_timers('a', ['g3'], TTL) == []
+    store.release_timers('b', ['g3'])
+    assert store.claim_timers('a', ['g3'], TTL) == ['g3']
+
+
+def test_live_owner_keeps_games(store):
+    add_games(store, 'g1')
+    assert store.claim_timers('a', ['g1'], TTL) == ['g1']
+    for _ in range(3):
+        time.sleep(TTL / 2)
+        store.heartbeat('a')
+        assert store.claim_timers('b', ['g1'], TTL) == []
+
+
+def test_delete_drops_lease(store):
+    add_games(store, 'g1')
+    assert store.claim_timers('a', ['g1'], 60) == ['g1']
+    with store.lock('g1'):
+        assert store.delete('g1')
+    assert store.timer_owners()['a']['games'] == 0
+
+    # A new game under the same ID starts without an owner
+    add_games(store, 'g1')
+    assert store.claim_timers('b', ['g1'], 60) == ['g1']
+
+
+def test_sqlite_leases_shared_between_handles(sqlite_store):
+    other = SQLiteGameStore(sqlite_store.path)
+    try:
+        add_games(sqlite_store, 'g1')
+        assert sqlite_store.claim_timers('a', ['g1'], TTL) == ['g1']
+        assert other.claim_timers('b', ['g1'], TTL) == []
+        time.sleep(TTL * 1.5)
+        assert other.claim_timers('b', ['g1'], TTL) == ['g1']
+        assert set(other.timer_owners()) == {'a', 'b'}
+    finally:
+        other.close()
@@ -0,0 +1,79 @@
+import time
+
+from game import events
+from conftest import started_game
+
+TTL = 0.2
+
+
+def phase_timer(monkeypatch):
+    # Imported late: the module's global timer builds the state manager it finds
+    from game.phase_timer import PhaseTimer
+    monkeypatch.setattr(PhaseTimer, '_lease_ttl', TTL)
+    return PhaseTimer()
+
+
+def test_keeper_takes_over_a_dead_owners_games(manager, monkeypatch):
+    waiting = started_game(manager)
+    overdue = started_game(manager, phase_end=time.time() + TTL)
+    assert manager.store.claim_timers('gone:1', [waiting, overdue], TTL) == [waiting, overdue]
+    timer = phase_timer(monkeypatch)
+    try:
+        assert timer.keep_leases() == 0  # Its owner heartbeated just now
+        assert not timer.scheduler.pending()
+
+        time.sleep(TTL * 1.5)
+        assert timer.keep_leases() == 2
+        assert timer.scheduler.pending()[waiting][0] == 'night'
+        assert timer.scheduler.pending()[overdue][0] == 'day'  # Resolved on takeover, then timed
+        assert timer.leased == {waiting, overdue}
+        assert manager.get_game_header(overdue)['phase'] == 'day'
+    finally:
+        timer.release_timers()
+    assert not manager.store.timer_owners().get(timer.owner, {}).get('games')
+
+
+def test_phase_ends_early_once_everyone_acted(manager, monkeypatch):
+    from game.game_logic import GameLogic
+    monkeypatch.setattr(manager, '_phase_grace', 0.1)
+    game_id = started_game(manager)
+    game = manager.get_game_state(game_id)
+    werewolf = game['role_players']['werewolf'][0]
+    seer = game['role_players']['seer'][0]
+    villager = game['role_players']['villager'][0]
+    shortened = []
+    manager.phase_listeners.append(lambda *args: shortened.append(args))
+    timer = phase_timer(monkeypatch)
+    logic = GameLogic()
+    try:
+        timer._schedule(game_id, 'night', 30)
+        assert logic.perform_action(game_id, werewolf, 'werewolf_vote', villager)[0]
+        assert not shortened  # The seer hasn't investigated yet
+        assert logic.perform_action(game_id, seer, 'seer_investigate', werewolf)[0]
+        assert [args[:2] for args in shortened] == [(game_id, 'night')]
+        phase_end = shortened[0][2]
+        assert manager.get_game_header(game_id)['phase_end'] == phase_end < time.time() + 1
+
+        # The timer was moved up to the new phase_end and the night ends on its own
+        deadline = time.time() + 5
+        while timer.scheduler.pending().get(game_id, ('night',))[0] != 'day' and time.time() < deadline:
+            time.sleep(0.02)
+        assert manager.get_game_header(game_id)['phase'] == 'day'
+        assert not manager.get_game_state(game_id)['players'][villager]['alive']
+    finally:
+        timer.release_timers()
+
+
+def test_changing_a_vote_keeps_the_shortened_end(manager, monkeypatch):
+    monkeypatch.setattr(manager, '_phase_grace', 5.0)
+    game_id = started_game(manager, players=('ann', 'bob', 'cat'))
+    manager.run(game_id, lambda uow: uow.emit(events.phase_started('day', time.time() + 30)))
+    alive = list(manager.get_game_state(game_id)['players'])
+    for i, player_id in enumerate(alive):
+        assert manager.record_action(game_id, 'day_vote', player_id, alive[(i + 1) % len(alive)])
+    phase_end = manager.get_game_header(game_id)['phase_end']
+    assert phase_end < time.time() + 5.0
+
+    time.sleep(0.05)
+    assert manager.record_action(game_id, 'day_vote', alive[0], alive[2])
+    assert manager.get_game_header(game_id)['phase_end'] == phase_end
@@ -0,0 +1,64 @@
+import json
+
+from game import events
+from game.game_logic import GameLogic
+from game.render_cache import ENDED, PUBLIC, RenderCache, RenderedGame
+from conftest import started_game
+
+
+def entry(version, ended=False, players=('p1', 'p2'), phase_end=None):
+    return RenderedGame(version, ended, frozenset(players), phase_end)
+
+
+def test_viewer_classes():
+    assert entry(1).viewer('p1') == 'p1'
+    assert entry(1).viewer('stranger') == PUBLIC
+    assert entry(1).viewer(None) == PUBLIC
+    assert entry(1, ended=True).viewer('p1') == ENDED
+
+
+def test_entries_belong_to_one_version():
+    cache = RenderCache()
+    cache.put('g1', entry(1), PUBLIC, b'public v1')
+    cache.put('g1', entry(1), 'p1', b'p1 v1')
+    assert cache.get('g1', 1, None) == (b'public v1', None)
+    assert cache.get('g1', 1, 'p1') == (b'p1 v1', None)
+    assert cache.get('g1', 1, 'p2') is None  # Not rendered for p2 yet
+    assert cache.get('g1', 2, None) is None
+
+    cache.put('g1', entry(2, phase_end=50.0), PUBLIC, b'public v2')
+    assert cache.get('g1', 1, 'p1') is None  # The new version replaced every render
+    cache.put('g1', entry(1), PUBLIC, b'late v1')  # Rendered from an older read
+    assert cache.get('g1', 2, None) == (b'public v2', 50.0)
+    assert cache.stats() == {'games': 1, 'renders': 1, 'hits': 3, 'misses': 3}
+
+
+def test_least_recently_used_game_is_evicted():
+    cache = RenderCache(max_games=2)
+    cache.put('g1', entry(1), PUBLIC, b'1')
+    cache.put('g2', entry(1), PUBLIC, b'2')
+    cache.get('g1', 1, None)
+    cache.put('g3', entry(1), PUBLIC, b'3')
+    assert cache.get('g2', 1, None) is None
+    assert cache.get('g1', 1, None) is not None and cache.get('g3', 1, None) is not None
+
+
+def test_summaries_are_cached_per_viewer_and_version(manager):
+    logic = GameLogic()
+    game_id = started_game(manager)
+    players = manager.get_game_state(game_id)['players']
+    player_id = next(iter(players))
+
+    public = json.loads(logic.render_game_summary(game_id))
+    own = json.loads(logic.render_game_summary(game_id, player_id))
+    assert 0 < public['time_remaining'] <= 30
+    assert all('role' not in player for player in public['players'])
+    assert [player['role'] for player in own['players'] if 'role' in player] == [players[player_id]['role']]
+
+    logic.render_game_summary(game_id)
+    logic.render_game_summary(game_id, 'stranger')  # Shares the public render
+    assert logic.render_cache.stats()['hits'] == 2
+
+    manager.run(game_id, lambda uow: uow.emit(events.phase_started('day', None)))
+    assert json.loads(logic.render_game_summary(game_id))['phase'] == 'day'
+    assert logic.render_game_summary('missing') is None
@@ -0,0 +1,46 @@
+import random
+
+import pytest
+
+from game.game_logic import GameLogic
+from game.roles import deal_roles, role_counts
+from game.roster import role_players
+
+
+@pytest.mark.parametrize('players, role_set, werewolves', [
+    (3, 'classic', 1), (20, 'classic', 1),
+    (3, 'scaled', 1), (9, 'scaled', 1), (10, 'scaled', 2), (50, 'scaled', 10)
+])
+def test_role_counts(players, role_set, werewolves):
+    counts = role_counts(players, role_set)
+    assert counts == {'werewolf': werewolves, 'seer': 1, 'villager': players - werewolves - 1}
+    assert counts['werewolf'] < players - counts['werewolf']  # Never starts already won
+
+
+def test_unknown_role_set():
+    with pytest.raises(ValueError):
+        role_counts(5, 'chaos')
+
+
+def test_deal_roles_follows_the_rng():
+    player_ids = [f"p{i}" for i in range(12)]
+    dealt = deal_roles(player_ids, 'scaled', random.Random(1))
+    assert dealt == deal_roles(player_ids, 'scaled', random.Random(1))
+    assert sorted(dealt) == sorted(player_ids)
+    assert sorted(dealt.values()).count('werewolf') == 2
+
+
+def test_assign_roles_with_a_role_set(manager):
+    logic = GameLogic()
+    small, large = manager.create_game(), manager.create_game()
+    for i in range(20):
+        manager.add_player(large, f"Player {i}")
+    manager.add_player(small, 'ann')
+    manager.add_player(small, 'bob')
+
+    assert not logic.assign_roles(small, 'scaled')  # Fewer than 3 players
+    assert logic.assign_roles(large, 'scaled')
+    game = manager.get_game_state(large)
+    assert game['started'] and game['phase'] == 'night'
+    assert len(role_players(game, 'werewolf')) == 4
+    assert game['alive_by_role']['werewolf'] == 4
@@ -0,0 +1,46 @@
+from game import events, rules
+from game.codec import decode_game, encode_game
+from game.roster import (
+    alive_count, alive_villagers, alive_werewolves, dead_count, join_player, kill_player, role_players, tally_alive
+)
+
+
+def dealt_game(players=6):
+    game = rules.new_game(1000.0)
+    for i in range(players):
+        events.apply_event(game, events.joined(f"p{i}", f"Player {i}", 1000.0))
+    events.apply_event(game, events.roles_assigned('classic', 3))
+    return game
+
+
+def test_counts_follow_joins_deaths_and_roles():
+    game = rules.new_game(1000.0)
+    join_player(game, 'p0', {'name': 'ann', 'role': None, 'alive': True})
+    join_player(game, 'p1', {'name': 'bob', 'role': None, 'alive': True})
+    assert (alive_count(game), dead_count(game)) == (2, 0)
+
+    game = dealt_game()
+    werewolf = role_players(game, 'werewolf')[0]
+    seer = role_players(game, 'seer')[0]
+    assert (alive_count(game), alive_werewolves(game), alive_villagers(game)) == (6, 1, 5)
+
+    assert kill_player(game, seer)
+    assert not kill_player(game, seer)  # Already dead
+    kill_player(game, werewolf)
+    assert (alive_count(game), dead_count(game), alive_werewolves(game), alive_villagers(game)) == (4, 2, 0, 4)
+    assert (game['alive_count'], game['alive_by_role']) == tally_alive(game['players'])
+    assert role_players(game, 'werewolf') == [werewolf]  # Dead players keep their role
+
+
+def test_counts_survive_encoding_and_old_records():
+    game = dealt_game()
+    kill_player(game, role_players(game, 'villager')[0])
+    decoded = decode_game(encode_game(game))
+    assert (decoded['alive_count'], decoded['alive_by_role']) == (game['alive_count'], game['alive_by_role'])
+    assert decoded['role_players'] == game['role_players']
+
+    # Records from before the counts were kept get them recounted on first use
+    del game['alive_count'], game['alive_by_role'], game['role_players']
+    assert alive_count(game) == 5
+    assert alive_werewolves(game) == 1
+    assert len(role_players(game, 'villager')) == 4
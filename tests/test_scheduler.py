@@ -0,0 +1,93 @@
+import threading
+import time
+
+from game.scheduler import PhaseScheduler
+from game.timer_metrics import PhaseTimerMetrics
+
+
+class Recorder:
+    def __init__(self):
+        self.batches = []
+        self.fired = threading.Event()
+
+    def __call__(self, due):
+        self.batches.append((time.time(), due))
+        self.fired.set()
+
+
+def test_fires_due_games_in_one_batch():
+    fire = Recorder()
+    scheduler = PhaseScheduler(fire, batch_window=0.05)
+    now = time.time()
+    scheduler.schedule('g1', 'night', now + 0.2)
+    scheduler.schedule('g2', 'day', now + 0.22)
+    scheduler.schedule('g3', 'night', now + 5)
+
+    assert fire.fired.wait(2)
+    assert fire.batches[0][1] == {'g1': 'night', 'g2': 'day'}
+    assert scheduler.pending() == {'g3': ('night', now + 5)}
+
+
+def test_cancel_drops_deadline():
+    fire = Recorder()
+    scheduler = PhaseScheduler(fire)
+    scheduler.schedule('g1', 'night', time.time() + 0.1)
+    assert scheduler.cancel('g1') == 'night'
+    assert scheduler.cancel('g1') is None
+    assert 'g1' not in scheduler
+    assert not fire.fired.wait(0.3)
+
+
+def test_schedule_replaces_pending_deadline():
+    fire = Recorder()
+    scheduler = PhaseScheduler(fire)
+    scheduler.schedule('g1', 'night', time.time() + 5)
+    scheduler.schedule('g1', 'day', time.time() + 0.05)
+    assert len(scheduler) == 1
+    assert fire.fired.wait(2)
+    assert fire.batches == [(fire.batches[0][0], {'g1': 'day'})]
+
+
+def test_advance_moves_deadline_earlier_only():
+    fire = Recorder()
+    scheduler = PhaseScheduler(fire)
+    due = time.time() + 5
+    scheduler.schedule('g1', 'night', due)
+
+    assert not scheduler.advance('g1', 'day', time.time())  # Other phase
+    assert not scheduler.advance('g1', 'night', due + 1)    # Later
+    assert not scheduler.advance('g2', 'night', time.time())  # Nothing pending
+
+    started = time.time()
+    assert scheduler.advance('g1', 'night', started + 0.05)
+    assert fire.fired.wait(2)
+    assert fire.batches[0][1] == {'g1': 'night'}
+    assert fire.batches[0][0] - started < 1
+
+
+def test_dead_entries_are_compacted():
+    scheduler = PhaseScheduler(Recorder())
+    for i in range(200):
+        scheduler.schedule(f"g{i}", 'night', time.time() + 60)
+    for i in range(150):
+        scheduler.cancel(f"g{i}")
+    assert len(scheduler) == 50
+    assert len(scheduler.heap) < 200
+
+
+def test_errors_reach_on_error():
+    class Closed:
+        def submit(self, fn, *args):
+            raise RuntimeError('executor shut down')
+
+    metrics = PhaseTimerMetrics()
+    reported = threading.Event()
+
+    def on_error(e):
+        metrics.error('scheduler', e)
+        reported.set()
+
+    scheduler = PhaseScheduler(Recorder(), Closed(), on_error=on_error)
+    scheduler.schedule('g1', 'night', time.time())
+    assert reported.wait(2)
+    assert metrics.snapshot()['errors'] == {'scheduler': 1}
@@ -0,0 +1,104 @@
+import random
+
+import pytest
+
+from game.shared_store import MIN_EXTENT, SharedGameStore
+
+
+def test_reuses_and_merges_free_extents(shared_store):
+    for i in range(4):
+        assert shared_store.write(f"g{i}", bytes(100), 1)
+    heap_used = shared_store.stats()['heap_used']
+
+    for game_id in ('g1', 'g2'):
+        with shared_store.lock(game_id):
+            shared_store.delete(game_id)
+    stats = shared_store.stats()
+    # Neighbours merge into one extent that takes no directory slot
+    assert stats['free_extents'] == 1
+    assert stats['free_bytes'] == stats['largest_free_extent'] == 2 * MIN_EXTENT
+    assert stats['free_extent_slots'] == 0
+    assert stats['headroom_games'] == shared_store.max_games - 2
+
+    # Both halves of the merged extent are reused before the heap grows
+    assert shared_store.write('g4', bytes(100), 1)
+    assert shared_store.write('g5', bytes(100), 1)
+    stats = shared_store.stats()
+    assert stats['free_extents'] == 0
+    assert stats['heap_used'] == heap_used
+
+    # Freeing the extents at the top of the heap gives the space back
+    for game_id in ('g0', 'g3', 'g4', 'g5'):
+        with shared_store.lock(game_id):
+            shared_store.delete(game_id)
+    stats = shared_store.stats()
+    assert stats['heap_used'] == 0
+    assert stats['free_extents'] == 0
+
+
+def test_grown_record_moves_extent(shared_store):
+    small = bytes(100)
+    large = bytes(range(256)) * 4
+    assert shared_store.write('g1', small, 1)
+    assert shared_store.write('g2', small, 1)
+    assert shared_store.write('g1', large, 2)
+    assert shared_store.read('g1') == (2, large)
+    assert shared_store.read('g2') == (1, small)
+    assert shared_store.stats()['free_extents'] == 1
+
+
+def test_adds_overflow_segments(shared_store):
+    records = {f"g{i}": bytes([i]) * 4000 for i in range(40)}
+    for game_id, data in records.items():
+        assert shared_store.write(game_id, data, 1)
+
+    stats = shared_store.stats()
+    assert len(stats['segments']) > 1
+    assert stats['games'] == 40
+
+    # Another handle attaches the overflow segments lazily
+    other = SharedGameStore(shared_store.name, shared_store.size, shared_store.max_games)
+    try:
+        assert not other.created
+        assert {game_id: other.read(game_id)[1] for game_id in records} == records
+    finally:
+        other.close()
+
+    for game_id in records:
+        with shared_store.lock(game_id):
+            shared_store.delete(game_id)
+    assert shared_store.stats()['heap_used'] == 0
+
+
+def test_churn_keeps_records_intact(shared_store):
+    rng = random.Random(3)
+    live = {}
+    for step in range(3000):
+        game_id = f"g{rng.randrange(40)}"
+        with shared_store.lock(game_id):
+            if game_id in live and rng.random() < 0.3:
+                assert shared_store.delete(game_id)
+                del live[game_id]
+            else:
+                data = bytes([step % 256]) * rng.choice([50, 300, 1500, 5000])
+                assert shared_store.write(game_id, data, step)
+                live[game_id] = (step, data)
+
+    assert {game_id: shared_store.read(game_id) for game_id in live} == live
+    assert sorted(shared_store.game_ids()) == sorted(live)
+    assert shared_store.stats()['free_extents'] < 40
+
+
+def test_rejects_long_ids(shared_store):
+    with pytest.raises(ValueError):
+        shared_store.write('x' * 17, b'data', 1)
+
+
+def test_long_ids_are_not_found(shared_store):
+    game_id = 'x' * 20
+    with shared_store.lock(game_id):
+        assert shared_store.read(game_id) is None
+        assert shared_store.version(game_id) is None
+        assert not shared_store.delete(game_id)
+    assert shared_store.read_many([game_id]) == {}
+    assert shared_store.claim_timers('a', [game_id], 1.0) == []
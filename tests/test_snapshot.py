@@ -0,0 +1,45 @@
+import io
+import json
+
+import pytest
+
+from game import journal
+from game.journal import iter_snapshot, read_snapshot_game
+
+
+@pytest.mark.parametrize('chunk', [7, 64, 1024 * 1024])
+def test_iter_snapshot_streams_games(monkeypatch, tmp_path, chunk):
+    monkeypatch.setattr(journal, 'SNAPSHOT_CHUNK', chunk)
+    games = {
+        'g1': {'phase': 'night', 'players': {'p1': {'name': 'Ann'}}, 'version': 3},
+        'g2': {'phase': 'day', 'chat': [{'message': 'héllo, wörld ✓'}], 'version': 9},
+        'g3': {},
+    }
+    data = json.dumps(games, ensure_ascii=False, indent=1).encode('utf-8')
+    path = tmp_path / 'snapshot.json'
+    path.write_bytes(data)
+
+    seen = {}
+    with open(path, 'rb') as f:
+        for game_id, game, offset, length in iter_snapshot(f):
+            assert json.loads(data[offset:offset + length]) == game
+            seen[game_id] = game
+    assert seen == games
+
+
+def test_iter_snapshot_spans_read_back(tmp_path):
+    path = tmp_path / 'snapshot.json'
+    games = {'g1': {'name': 'Zoë'}, 'g2': {'name': 'Bo'}}
+    path.write_text(json.dumps(games, ensure_ascii=False), encoding='utf-8')
+
+    with open(path, 'rb') as f:
+        spans = {game_id: (offset, length) for game_id, _, offset, length in iter_snapshot(f)}
+        assert {game_id: read_snapshot_game(f, *span) for game_id, span in spans.items()} == games
+
+
+def test_iter_snapshot_empty_and_malformed():
+    assert list(iter_snapshot(io.BytesIO(b' {} '))) == []
+    with pytest.raises(ValueError):
+        list(iter_snapshot(io.BytesIO(b'[]')))
+    with pytest.raises(ValueError):
+        list(iter_snapshot(io.BytesIO(b'{"g1": {"version": 1}')))
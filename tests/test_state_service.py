@@ -0,0 +1,138 @@
+import json
+import socket
+
+import pytest
+
+from game import rules
+from game.codec import encode_game
+from game.remote_store import RemoteGameStore
+from game.sqlite_store import SQLiteGameStore
+from game.state_protocol import (
+    CAS_BODY, KIND_REQUEST, KIND_RESPONSE, OP_AUTH, OP_CAS, OP_CLAIM_TIMERS, OP_GET, OP_LOCK, OP_PUT,
+    OP_UNLOCK, OP_VERSION, STATUS_BUSY, STATUS_CONFLICT, STATUS_ERROR, STATUS_NOT_FOUND, STATUS_OK, U64,
+    pack_frame, read_frame
+)
+from server.state_service import StateService
+from conftest import free_port, wait_listening
+
+
+def test_frame_round_trip():
+    left, right = socket.socketpair()
+    with left, right:
+        left.sendall(pack_frame(KIND_REQUEST, OP_PUT, 7, 'gämé', b'\x00' * 70000))
+        left.sendall(pack_frame(KIND_RESPONSE, STATUS_OK, 8))
+        assert read_frame(right) == (KIND_REQUEST, OP_PUT, 7, 'gämé', b'\x00' * 70000)
+        assert read_frame(right) == (KIND_RESPONSE, STATUS_OK, 8, '', b'')
+
+
+def test_read_frame_on_closed_connection():
+    left, right = socket.socketpair()
+    with right:
+        left.sendall(pack_frame(KIND_REQUEST, OP_GET, 1, 'g1')[:5])
+        left.close()
+        with pytest.raises(ConnectionError):
+            read_frame(right)
+
+
+def caller(sock):
+    def call(op, request_id, game_id='', body=b''):
+        sock.sendall(pack_frame(KIND_REQUEST, op, request_id, game_id, body))
+        kind, status, response_id, _, response = read_frame(sock)
+        assert (kind, response_id) == (KIND_RESPONSE, request_id)
+        return status, response
+    return call
+
+
+def test_service_requests(state_service):
+    first = encode_game(rules.new_game(1000.0))
+    second = encode_game(dict(rules.new_game(1000.0), phase='night', version=2))
+    with socket.create_connection(('127.0.0.1', state_service)) as sock:
+        call = caller(sock)
+        assert call(OP_GET, 1, 'g1')[0] == STATUS_NOT_FOUND
+        assert call(OP_PUT, 2, 'g1', U64.pack(1) + first) == (STATUS_OK, b'')
+        assert call(OP_CAS, 3, 'g1', CAS_BODY.pack(0, 1) + second)[0] == STATUS_CONFLICT
+        assert call(OP_CAS, 4, 'g1', CAS_BODY.pack(1, 2) + second)[0] == STATUS_OK
+        assert call(OP_GET, 5, 'g1') == (STATUS_OK, U64.pack(2) + second)
+        assert call(OP_VERSION, 6, 'g1') == (STATUS_OK, U64.pack(2))
+
+        status, body = call(OP_CLAIM_TIMERS, 7, body=json.dumps({'owner': 'a', 'games': ['g1'], 'ttl': 5}).encode())
+        assert status == STATUS_OK
+        assert json.loads(body) == ['g1']
+
+
+def test_service_lock_is_per_connection(state_service):
+    data = encode_game(rules.new_game(1000.0))
+    with socket.create_connection(('127.0.0.1', state_service)) as owner, \
+            socket.create_connection(('127.0.0.1', state_service)) as other:
+        assert caller(owner)(OP_LOCK, 1, 'g1')[0] == STATUS_OK
+        assert caller(other)(OP_PUT, 1, 'g1', U64.pack(1) + data)[0] == STATUS_BUSY
+        assert caller(owner)(OP_PUT, 2, 'g1', U64.pack(1) + data)[0] == STATUS_OK
+        assert caller(owner)(OP_UNLOCK, 3, 'g1')[0] == STATUS_OK
+        assert caller(other)(OP_PUT, 2, 'g1', U64.pack(2) + data)[0] == STATUS_OK
+
+
+def test_remote_reads_see_other_clients_writes(state_service, remote_store):
+    first = encode_game(rules.new_game(1000.0))
+    second = encode_game(dict(rules.new_game(1000.0), version=2))
+    other = RemoteGameStore('127.0.0.1', state_service)
+    try:
+        with remote_store.lock('g1'):
+            assert remote_store.write('g1', first, 1)
+        assert other.read('g1') == (1, first)  # Cached by the other client from here on
+        assert remote_store.compare_and_swap('g1', 1, second, 2)
+        assert not other.compare_and_swap('g1', 1, second, 2)
+        assert other.read('g1') == (2, second)
+    finally:
+        other.close()
+
+
+def test_service_rejects_non_records(state_service):
+    with socket.create_connection(('127.0.0.1', state_service)) as sock:
+        call = caller(sock)
+        assert call(OP_PUT, 1, 'g1', U64.pack(1) + b'\x80\x04anything') == (STATUS_ERROR, b'Not a game record')
+        assert call(OP_CAS, 2, 'g1', CAS_BODY.pack(0, 1) + b'{}') == (STATUS_ERROR, b'Not a game record')
+        assert call(OP_GET, 3, 'g1')[0] == STATUS_NOT_FOUND
+
+
+def test_remote_store_rejects_non_records(remote_store):
+    with pytest.raises(ValueError):
+        remote_store.write('g1', b'\x80\x04anything', 1)
+    with pytest.raises(ValueError):
+        remote_store.compare_and_swap_many([('g1', 0, b'{}', 1)])
+
+
+def test_service_needs_a_secret_off_loopback(tmp_path):
+    storage = SQLiteGameStore(str(tmp_path / 'service.db'))
+    try:
+        with pytest.raises(ValueError):
+            StateService(storage, free_port(), host='0.0.0.0')
+        StateService(storage, free_port(), host='localhost')
+    finally:
+        storage.unlink()
+
+
+def test_service_with_secret(tmp_path):
+    storage = SQLiteGameStore(str(tmp_path / 'service.db'))
+    service = StateService(storage, free_port(), host='127.0.0.1', secret='s3cret')
+    service.daemon = True
+    service.start()
+    wait_listening(service.port)
+    data = encode_game(rules.new_game(1000.0))
+    try:
+        with socket.create_connection(('127.0.0.1', service.port)) as sock:
+            assert caller(sock)(OP_GET, 1, 'g1') == (STATUS_ERROR, b'Not authenticated')
+            assert sock.recv(1) == b''  # Dropped after the refusal
+        with socket.create_connection(('127.0.0.1', service.port)) as sock:
+            assert caller(sock)(OP_AUTH, 1, body=b'wrong')[0] == STATUS_ERROR
+        with pytest.raises(ConnectionError):
+            RemoteGameStore('127.0.0.1', service.port, secret='wrong')
+
+        remote = RemoteGameStore('127.0.0.1', service.port, secret='s3cret')
+        try:
+            with remote.lock('g1'):
+                assert remote.write('g1', data, 1)
+            assert remote.read('g1') == (1, data)
+        finally:
+            remote.close()
+    finally:
+        storage.unlink()
@@ -0,0 +1,83 @@
+import pytest
+
+from game import rules
+from game.codec import encode_game
+from game.sqlite_store import SQLiteGameStore
+
+
+def record(version, **fields):
+    game = rules.new_game(1000.0)
+    game.update(fields, version=version)
+    return encode_game(game)
+
+
+def create(store, game_id, data=None):
+    with store.lock(game_id):
+        assert store.write(game_id, data or record(1), 1)
+
+
+def test_cas_conflicts(store):
+    first = record(1)
+    create(store, 'g1', first)
+    assert store.read('g1') == (1, first)
+
+    second = record(2, phase='night')
+    assert store.compare_and_swap('g1', 1, second, 2)
+    # Someone still holding version 1 loses
+    assert not store.compare_and_swap('g1', 1, record(2, phase='day'), 2)
+    assert store.read('g1') == (2, second)
+    assert store.version('g1') == 2
+
+
+def test_cas_after_delete(store):
+    create(store, 'g1')
+    with store.lock('g1'):
+        assert store.delete('g1')
+        assert not store.delete('g1')
+    assert store.read('g1') is None
+    assert store.version('g1') is None
+    # A writer that loaded the game before it was deleted can't bring it back
+    assert not store.compare_and_swap('g1', 1, record(2), 2)
+    assert store.read('g1') is None
+
+
+def test_headers_and_listing(store):
+    create(store, 'g1')
+    with store.lock('g2'):
+        store.write('g2', record(3, phase='day', phase_end=1200.0, started=True), 3)
+    assert sorted(store.game_ids()) == ['g1', 'g2']
+    headers = store.headers()
+    assert headers['g1']['phase'] == 'setup'
+    assert headers['g2']['version'] == 3
+    assert headers['g2']['phase_end'] == 1200.0
+    assert headers['g2']['started']
+    assert store.header('g3') is None
+    assert store.stats()['games'] == 2
+
+
+def test_cas_many_succeeds_or_fails_per_game(store):
+    for game_id in ('g1', 'g2', 'g3'):
+        create(store, game_id)
+
+    results = store.compare_and_swap_many([
+        ('g1', 1, record(2), 2),
+        ('g2', 5, record(6), 6),  # Stale
+        ('g3', 1, record(2), 2),
+        ('g4', 1, record(2), 2),  # Missing
+    ])
+    assert results == [True, False, True, False]
+    assert {game_id: version for game_id, (version, _) in store.read_many(['g1', 'g2', 'g3', 'g4']).items()} == \
+        {'g1': 2, 'g2': 1, 'g3': 2}
+
+
+def test_sqlite_store_refuses_use_after_close(tmp_path):
+    store = SQLiteGameStore(str(tmp_path / 'closed.db'))
+    create(store, 'g1')
+    store.close()
+    store.close()  # Closing twice is fine
+    with pytest.raises(ValueError):
+        store.read('g1')
+    with pytest.raises(ValueError):
+        with store.lock('g1'):
+            pass
+    store.unlink()
@@ -0,0 +1,44 @@
+from game.timer_metrics import Histogram, PhaseTimerMetrics
+
+
+def test_histogram_buckets_and_percentiles():
+    histogram = Histogram()
+    assert histogram.percentile(0.5) == 0.0
+    for ms in (0.05, 0.3, 0.3, 3, 40, 40, 40, 40, 700, 20000):
+        histogram.record(ms / 1000)
+
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 10
+    assert snapshot['buckets']['0.1'] == 1 and snapshot['buckets']['0.5'] == 2
+    assert snapshot['buckets']['50'] == 4 and snapshot['buckets']['inf'] == 1
+    assert snapshot['p50_ms'] == 50.0  # Bucket upper bound
+    assert snapshot['p95_ms'] == snapshot['p99_ms'] == snapshot['max_ms'] == 20000.0  # Past the last bucket
+    assert round(snapshot['mean_ms'], 3) == round(sum((0.05, 0.3, 0.3, 3, 160, 700, 20000)) / 10, 3)
+
+
+def test_histogram_percentile_never_exceeds_max():
+    histogram = Histogram()
+    histogram.record(0.003)  # In the 5 ms bucket
+    histogram.record(-1.0)   # Clock went backwards: counted as zero
+    assert histogram.percentile(0.99) == 3.0
+    assert histogram.snapshot()['buckets']['0.1'] == 1
+
+
+def test_phase_timer_metrics():
+    metrics = PhaseTimerMetrics(late_after=1.0, kept_errors=2)
+    metrics.transition(0.1, 0.2, {'resolve': 0.001, 'win_check': 0.0001})
+    metrics.transition(1.5, 2.0, {'resolve': 0.001})
+    metrics.transition(None, None, {'next_phase': 0.001})  # Ended ahead of its deadline
+    metrics.record('batch', 0.01)
+    for i in range(3):
+        metrics.error('keeper', ValueError(f"boom {i}"))
+    metrics.error('callback', RuntimeError('late'))
+
+    snapshot = metrics.snapshot()
+    assert (snapshot['transitions'], snapshot['late']) == (3, 1)
+    histograms = snapshot['histograms']
+    assert histograms['lag']['count'] == histograms['wait']['count'] == 2
+    assert histograms['resolve']['count'] == 2 and histograms['next_phase']['count'] == 1
+    assert histograms['batch']['count'] == 1
+    assert snapshot['errors'] == {'keeper': 3, 'callback': 1}
+    assert [error['error'] for error in snapshot['recent_errors']] == ['boom 2', 'late']
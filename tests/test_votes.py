@@ -0,0 +1,67 @@
+import random
+
+from game.votes import (
+    as_vote_book, cast_vote, new_vote_book, rebuild_vote_book, retract_vote, vote_count, vote_leaders
+)
+
+
+def test_cast_change_and_retract():
+    book = new_vote_book()
+    assert vote_leaders(book) == ([], 0)
+    assert cast_vote(book, 'a', 'x') is None
+    assert cast_vote(book, 'b', 'y') is None
+    assert vote_leaders(book) == (['x', 'y'], 1)  # In the order they got there
+
+    assert cast_vote(book, 'c', 'y') is None
+    assert vote_leaders(book) == (['y'], 2)
+    assert cast_vote(book, 'c', 'x') == 'y'
+    assert vote_leaders(book) == (['x'], 2)
+    assert cast_vote(book, 'c', 'x') == 'x'  # Same vote again changes nothing
+    assert vote_count(book, 'x') == 2
+
+    assert retract_vote(book, 'a') == 'x'
+    assert retract_vote(book, 'a') is None
+    assert vote_leaders(book) == (['y', 'x'], 1)
+    retract_vote(book, 'b')
+    retract_vote(book, 'c')
+    assert book == new_vote_book()
+
+
+def test_leaders_match_a_recount():
+    rng = random.Random(7)
+    book = new_vote_book()
+    voters = {}
+    for _ in range(2000):
+        voter = f"v{rng.randrange(30)}"
+        if rng.random() < 0.2:
+            retract_vote(book, voter)
+            voters.pop(voter, None)
+        else:
+            target = f"t{rng.randrange(6)}"
+            cast_vote(book, voter, target)
+            voters[voter] = target
+
+        tally = {}
+        for target in voters.values():
+            tally[target] = tally.get(target, 0) + 1
+        top = max(tally.values(), default=0)
+        leaders, count = vote_leaders(book)
+        assert count == top
+        assert set(leaders) == {target for target, n in tally.items() if n == top}
+        assert book['tally'] == tally
+
+
+def test_older_layouts_convert():
+    day = as_vote_book({'x': ['a', 'b'], 'y': ['c']})
+    assert day['voters'] == {'a': 'x', 'b': 'x', 'c': 'y'}
+    assert vote_leaders(day) == (['x'], 2)
+
+    werewolf = as_vote_book({'x': 1, 'y': 0})
+    assert werewolf['voters'] == {}
+    assert vote_leaders(werewolf) == (['x'], 1)
+
+    book = new_vote_book()
+    cast_vote(book, 'a', 'x')
+    assert as_vote_book(book) is book
+    assert as_vote_book({'voters': book['voters'], 'tally': book['tally']}) == book
+    assert rebuild_vote_book({}, {}) == new_vote_book()